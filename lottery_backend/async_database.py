@@ -0,0 +1,283 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Implementation of the asynchronous Database functionalities used by the API endpoints.
+Each function runs its counterpart in database.py on an AsyncSession (aiosqlite driver),
+so waiting for the DB does not block the event loop.
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import datetime
+import typing
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from lottery_backend import database
+from lottery_backend.db_models.draw_result import DrawResult
+from lottery_backend.db_models.user import User
+from lottery_backend.db_models.user_ballot import UserBallot
+from lottery_backend.settings import settings
+
+T = typing.TypeVar("T")
+
+async_engine = create_async_engine(
+    database.get_async_database_url(settings),
+    **database.get_engine_options(settings, AsyncAdaptedQueuePool),
+)
+database.register_sqlite_pragmas(async_engine.sync_engine, settings)
+
+
+async def get_async_session() -> typing.AsyncIterator[AsyncSession]:
+    # objects are not expired on commit since their attributes cannot be lazy loaded outside the DB calls
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def _run(
+    session: AsyncSession,
+    func: typing.Callable[..., T],
+    *args: typing.Any,
+    **kwargs: typing.Any,
+) -> T:
+    """
+    Runs the synchronous DB function on the synchronous facade of the AsyncSession
+
+    Args:
+        session: asynchronous session for DB connection
+        func: function from database.py accepting the session as keyword argument
+        args: positional arguments of the function
+        kwargs: keyword arguments of the function
+
+    Returns:
+        return value of the function
+    """
+    return await session.run_sync(lambda sync_session: func(*args, session=sync_session, **kwargs))
+
+
+async def add_new_user(  # noqa: WPS211
+    username: str,
+    password_hash: str,
+    full_name: str,
+    email_address: typing.Optional[str],
+    phone_number: typing.Optional[str],
+    session: AsyncSession,
+) -> User:
+    """
+    Adds a new user into the database, see database.add_new_user
+
+    Args:
+        username: a unique username
+        password_hash: bcrypt hash of the password to be used when logging in
+        full_name: name and surname of the user
+        email_address: optional communication detail
+        phone_number: optional communication detail
+        session: asynchronous session for DB connection
+
+    Returns:
+         a newly created User object
+    """
+    return await _run(session, database.add_new_user, username, password_hash, full_name, email_address, phone_number)
+
+
+async def fetch_user_from_db(username: str, session: AsyncSession) -> typing.Optional[User]:
+    """
+    Fetches the User object from the database, see database.fetch_user_from_db
+
+    Args:
+        username: used as an identifier for User object
+        session: asynchronous session for DB connection
+
+    Returns:
+        User object if it exists, None otherwise
+    """
+    return await _run(session, database.fetch_user_from_db, username)
+
+
+async def save_user(user: User, session: AsyncSession) -> User:
+    """
+    Persists the changes on the User object, see database.save_user
+
+    Args:
+        user: User object fetched from the database
+        session: asynchronous session for DB connection
+
+    Returns:
+         the updated User object
+    """
+    return await _run(session, database.save_user, user)
+
+
+async def add_ballot_for_user(
+    user_id: int,
+    ballot: str,
+    date: datetime.date,
+    session: AsyncSession,
+) -> UserBallot:
+    """
+    Adds a new ballot on the user for a specific day of lottery, see database.add_ballot_for_user
+
+    Args:
+        user_id: a unique id of a username in User table
+        ballot: a 16-digit string
+        date: day of the lottery for which the ballot is added
+        session: asynchronous session for DB connection
+
+    Returns:
+         a newly created UserBallot object
+    """
+    return await _run(session, database.add_ballot_for_user, user_id, ballot, date)
+
+
+async def add_ballots_for_user(
+    user_id: int,
+    ballots: typing.Sequence[typing.Tuple[str, datetime.date]],
+    session: AsyncSession,
+) -> int:
+    """
+    Adds the given ballots on the user in a single transaction, see database.add_ballots_for_user
+
+    Args:
+        user_id: a unique id of a username in User table
+        ballots: pairs of 16-digit string and the day of the lottery for which the ballot is added
+        session: asynchronous session for DB connection
+
+    Returns:
+         number of the inserted ballots
+    """
+    return await _run(session, database.add_ballots_for_user, user_id, ballots)
+
+
+async def get_existing_ballots(
+    ballots: typing.Sequence[typing.Tuple[str, datetime.date]],
+    session: AsyncSession,
+    use_filter: bool = False,
+) -> typing.Set[typing.Tuple[str, datetime.date]]:
+    """
+    Finds out which of the given ballots already exist, see database.get_existing_ballots
+
+    Args:
+        ballots: pairs of 16-digit string and the day of the lottery
+        session: asynchronous session for DB connection
+        use_filter: whether the ballots of the tracked days are looked up in their ballot filters first
+
+    Returns:
+        the subset of the given pairs which are already stored in the DB
+    """
+    return await _run(session, database.get_existing_ballots, ballots, use_filter=use_filter)
+
+
+async def get_ballots_for_date(date: datetime.date, session: AsyncSession) -> typing.List[str]:
+    """
+    Fetches all the submitted ballots for the provided lottery day, see database.get_ballots_for_date
+
+    Args:
+         date: a day to query the ballots
+         session: asynchronous session for DB connection
+
+    Returns:
+        list of ballots in this provided lottery day
+    """
+    return await _run(session, database.get_ballots_for_date, date)
+
+
+async def get_ballot_page(
+    date: datetime.date,
+    after: typing.Optional[str],
+    limit: int,
+    session: AsyncSession,
+) -> typing.List[str]:
+    """
+    Fetches a page of the submitted ballots for the provided lottery day, see database.get_ballot_page
+
+    Args:
+         date: a day to query the ballots
+         after: last ballot of the previous page, None for the first page
+         limit: max number of ballots in the page
+         session: asynchronous session for DB connection
+
+    Returns:
+        ballots of the page in ascending order
+    """
+    return await _run(session, database.get_ballot_page, date, after, limit)
+
+
+async def get_user_ballot_page(
+    user_id: int,
+    date: datetime.date,
+    after: typing.Optional[str],
+    limit: int,
+    session: AsyncSession,
+) -> typing.List[str]:
+    """
+    Fetches a page of the ballots of the user for the provided lottery day, see database.get_user_ballot_page
+
+    Args:
+         user_id: a unique id of a username in User table
+         date: a day to query the ballots
+         after: last ballot of the previous page, None for the first page
+         limit: max number of ballots in the page
+         session: asynchronous session for DB connection
+
+    Returns:
+        ballots of the page in ascending order
+    """
+    return await _run(session, database.get_user_ballot_page, user_id, date, after, limit)
+
+
+async def check_ballot_existence(ballot: str, date: datetime.date, session: AsyncSession) -> bool:
+    """
+    Checks if the ballot exists for the given lottery day, see database.check_ballot_existence
+
+    Args:
+        ballot: 16-digit string representing a ballot for lottery
+        date: a day to query the ballots
+        session: asynchronous session for DB connection
+
+    Returns:
+        True if the ballot exists for the day, False otherwise
+    """
+    return await _run(session, database.check_ballot_existence, ballot, date)
+
+
+async def get_draw_result(date: datetime.date, session: AsyncSession) -> typing.Optional[DrawResult]:
+    """
+    Fetches the result of the lottery draw, see database.get_draw_result
+
+    Args:
+        date: the lottery day
+        session: asynchronous session for DB connection
+
+    Returns:
+        DrawResult object if the day is drawn, None otherwise
+    """
+    return await _run(session, database.get_draw_result, date)
+
+
+async def clear_ballots_on_date(
+    date: datetime.date,
+    exception_ballot: typing.Optional[str],
+    session: AsyncSession,
+) -> int:
+    """
+    Deletes the ballots on a given day except the exception ballot, see database.clear_ballots_on_date
+
+    Args:
+        date: a day to query the ballots
+        exception_ballot: 16-digit string representing a ballot for lottery
+        session: asynchronous session for DB connection
+
+    Returns:
+        number of the deleted ballots
+    """
+    return await _run(session, database.clear_ballots_on_date, date, exception_ballot)
@@ -0,0 +1,261 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Implementation of the write-behind buffer of the ballot submissions (group commit).
+Submissions are queued in memory and a writer thread inserts them in batches, one transaction per batch,
+instead of one commit per submission. A submission is acknowledged only once its batch is committed.
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import asyncio
+import concurrent.futures
+import datetime
+import queue
+import threading
+import time
+import typing
+
+import structlog
+from sqlmodel import Session
+
+from lottery_backend.database import add_ballots
+from lottery_backend.database import get_existing_ballots
+from lottery_backend.database import session_scope
+from lottery_backend.exceptions import BallotAlreadyExistsException
+from lottery_backend.exceptions import ConcurrentSubmissionException
+from lottery_backend.settings import settings
+
+LOGGER = structlog.get_logger()
+MAX_BATCH_INSERT_ATTEMPTS = 3  # a batch is retried when it races with the submissions of other processes
+
+
+class _PendingBallot(typing.NamedTuple):
+    """A queued submission and the future resolved once it is written"""
+
+    user_id: int
+    ballot: str
+    date: datetime.date
+    future: "concurrent.futures.Future[None]"
+
+
+class _FlushRequest(typing.NamedTuple):
+    """A marker in the queue resolved once every submission queued before it is written"""
+
+    future: "concurrent.futures.Future[None]"
+
+
+class BallotBuffer:
+    """Queue of the ballot submissions flushed by a writer thread every flush interval or max batch size"""
+
+    def __init__(self, flush_interval: float, max_batch_size: int) -> None:
+        """
+        Initializes the BallotBuffer object
+
+        Args:
+            flush_interval: max seconds a submission waits in the queue for others to join its batch
+            max_batch_size: max number of submissions written in a single transaction
+        """
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue[typing.Union[_PendingBallot, _FlushRequest, None]]" = queue.Queue()
+        self._writer: typing.Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the writer thread is accepting submissions"""
+        return self._writer is not None
+
+    def start(self) -> None:
+        """Starts the writer thread"""
+        if self._writer:
+            return
+        self._writer = threading.Thread(target=self._run, name="ballot-buffer-writer", daemon=True)
+        self._writer.start()
+        LOGGER.info(
+            f"Ballot buffer is started, flushing every {self.flush_interval}s or {self.max_batch_size} ballots",
+        )
+
+    def stop(self) -> None:
+        """Writes the queued submissions and stops the writer thread"""
+        if not self._writer:
+            return
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+        LOGGER.info("Ballot buffer is stopped")
+
+    def enqueue(self, user_id: int, ballot: str, date: datetime.date) -> "concurrent.futures.Future[None]":
+        """
+        Queues the ballot submission
+
+        Args:
+            user_id: a unique id of a username in User table
+            ballot: a 16-digit string
+            date: day of the lottery for which the ballot is added
+
+        Returns:
+            future resolved once the ballot is committed, or failed with BallotAlreadyExistsException
+            or ConcurrentSubmissionException
+        """
+        future: "concurrent.futures.Future[None]" = concurrent.futures.Future()
+        self._queue.put(_PendingBallot(user_id, ballot, date, future))
+        return future
+
+    async def submit(self, user_id: int, ballot: str, date: datetime.date) -> None:
+        """
+        Queues the ballot submission and waits until it is committed without blocking the event loop
+
+        Args:
+            user_id: a unique id of a username in User table
+            ballot: a 16-digit string
+            date: day of the lottery for which the ballot is added
+
+        Raises:
+            BallotAlreadyExistsException if the ballot is already submitted for the day
+            ConcurrentSubmissionException if its batch keeps colliding with concurrent submissions
+        """
+        await asyncio.wrap_future(self.enqueue(user_id, ballot, date))
+
+    def flush(self) -> None:
+        """
+        Waits until every submission queued so far is written, e.g. before a lottery day is drawn
+        """
+        if not self._writer:
+            return
+        future: "concurrent.futures.Future[None]" = concurrent.futures.Future()
+        self._queue.put(_FlushRequest(future))
+        future.result()
+
+    def _run(self) -> None:
+        """
+        Collects the queued submissions into batches and writes them until the buffer is stopped
+        """
+        is_stopped = False
+        while not is_stopped:
+            batch: typing.List[_PendingBallot] = []
+            flush_requests: typing.List[_FlushRequest] = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    is_stopped = True
+                elif isinstance(item, _FlushRequest):
+                    flush_requests.append(item)
+                else:
+                    batch.append(item)
+                if is_stopped or flush_requests or len(batch) >= self.max_batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+            if is_stopped:  # submissions racing with the stop are written as well
+                for remaining in _drain(self._queue):
+                    if isinstance(remaining, _FlushRequest):
+                        flush_requests.append(remaining)
+                    else:
+                        batch.append(remaining)
+            self._write(batch)
+            for flush_request in flush_requests:
+                flush_request.future.set_result(None)
+
+    def _write(self, batch: typing.List[_PendingBallot]) -> None:
+        """
+        Inserts the batch in a single transaction and resolves the futures of its submissions.
+        Already existing ballots, or the ones submitted more than once within the batch, are rejected one by one.
+
+        Args:
+            batch: queued submissions
+        """
+        if not batch:
+            return
+        try:
+            with session_scope() as session:
+                accepted, rejected = _insert_batch(batch, session)
+        except Exception as exc:  # noqa: B902 the submitters are notified of any failure
+            LOGGER.error(f"{len(batch)} buffered ballots could not be written: {exc}")
+            for pending in batch:
+                pending.future.set_exception(exc)
+            return
+        LOGGER.info(f"{len(accepted)} buffered ballots are written in a single transaction")
+        for pending in accepted:
+            pending.future.set_result(None)
+        for pending in rejected:
+            error_message = f"There is already a ballot:'{pending.ballot}' for the day:'{pending.date}'"
+            pending.future.set_exception(BallotAlreadyExistsException(error_message))
+
+
+def _insert_batch(
+    batch: typing.List[_PendingBallot],
+    session: Session,
+) -> typing.Tuple[typing.List[_PendingBallot], typing.List[_PendingBallot]]:
+    """
+    Drops the already existing ballots from the batch and inserts the rest in one transaction,
+    repeating the procedure if other processes win the race in between
+
+    Args:
+        batch: queued submissions
+        session: session for DB connection
+
+    Returns:
+        the inserted and the rejected submissions
+
+    Raises:
+        ConcurrentSubmissionException if the ballots cannot be inserted due to continuous concurrent submissions
+    """
+    candidates: typing.Dict[typing.Tuple[str, datetime.date], _PendingBallot] = {}
+    rejected: typing.List[_PendingBallot] = []
+    for pending in batch:
+        key = (pending.ballot, pending.date)
+        if key in candidates:
+            rejected.append(pending)
+        else:
+            candidates[key] = pending
+
+    for attempt in range(MAX_BATCH_INSERT_ATTEMPTS):
+        # the ballot filters miss the ballots inserted by other processes, a retry checks all of them via the DB
+        for key in get_existing_ballots(list(candidates), use_filter=attempt == 0, session=session):
+            rejected.append(candidates.pop(key))
+        try:
+            add_ballots([(pending.user_id, *key) for key, pending in candidates.items()], session=session)
+        except BallotAlreadyExistsException:
+            LOGGER.warning("Buffered ballots collided with concurrent submissions, retrying...")
+        else:
+            return list(candidates.values()), rejected
+    raise ConcurrentSubmissionException("Buffered ballots could not be written due to concurrent submissions")
+
+
+def _drain(pending_queue: "queue.Queue[typing.Any]") -> typing.List[typing.Union[_PendingBallot, _FlushRequest]]:
+    """
+    Takes the items left in the queue after the buffer is stopped
+
+    Args:
+        pending_queue: queue of the buffer
+
+    Returns:
+        the remaining submissions & flush requests
+    """
+    remaining: typing.List[typing.Union[_PendingBallot, _FlushRequest]] = []
+    while True:
+        try:
+            item = pending_queue.get_nowait()
+        except queue.Empty:
+            return remaining
+        if item is not None:
+            remaining.append(item)
+
+
+# started on the application startup when the buffered ingestion is enabled, flushed before each draw
+ballot_buffer = BallotBuffer(
+    flush_interval=settings.ballot_buffer_flush_interval,
+    max_batch_size=settings.ballot_buffer_max_batch_size,
+)
@@ -0,0 +1,246 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Implementation of the in-process Bloom filters of the ballots of the open lottery days.
+A negative lookup proves that a ballot is not submitted yet without querying the DB,
+a positive one is confirmed via the DB. The unique (date, ballot) index stays the authority,
+so a ballot missed by a filter (e.g. submitted by another process) is still rejected on insert.
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import datetime
+import hashlib
+import math
+import threading
+import typing
+
+import structlog
+
+from lottery_backend.settings import settings
+
+LOGGER = structlog.get_logger()
+BallotKey = typing.Tuple[str, datetime.date]
+
+
+class BloomFilter:
+    """Bloom filter of 16-digit ballots sized for a capacity and a false positive rate"""
+
+    def __init__(self, capacity: int, false_positive_rate: float) -> None:
+        """
+        Initializes the BloomFilter object
+
+        Args:
+            capacity: number of ballots the false positive rate is targeted for, it degrades beyond it
+            false_positive_rate: probability that a lookup of an absent ballot is positive at full capacity
+        """
+        self.bit_count = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.bit_count / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray(math.ceil(self.bit_count / 8))
+
+    @property
+    def size_in_bytes(self) -> int:
+        """Memory used by the bits of the filter"""
+        return len(self._bits)
+
+    def add(self, ballot: str) -> None:
+        """
+        Adds the ballot into the filter, it is not thread-safe
+
+        Args:
+            ballot: 16-digit string
+        """
+        for position in self._get_positions(ballot):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, ballot: str) -> bool:
+        """
+        Checks if the ballot may have been added
+
+        Args:
+            ballot: 16-digit string
+
+        Returns:
+            False if the ballot is certainly not added, True if it probably is
+        """
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._get_positions(ballot))
+
+    def estimate_false_positive_rate(self) -> float:
+        """
+        Estimates the false positive rate of the filter with its current number of ballots
+
+        Returns:
+            probability that a lookup of an absent ballot is positive
+        """
+        return (1 - math.exp(-self.hash_count * self.count / self.bit_count)) ** self.hash_count
+
+    def _get_positions(self, ballot: str) -> typing.Iterator[int]:
+        """
+        Derives the bit positions of the ballot from a single hash by double hashing
+
+        Args:
+            ballot: 16-digit string
+
+        Yields:
+            bit positions of the ballot
+        """
+        digest = hashlib.blake2b(int(ballot).to_bytes(8, "little"), digest_size=16).digest()
+        first_hash = int.from_bytes(digest[:8], "little")
+        second_hash = int.from_bytes(digest[8:], "little") | 1
+        for index in range(self.hash_count):
+            yield (first_hash + index * second_hash) % self.bit_count
+
+
+class DailyBallotFilters:
+    """Thread-safe Bloom filters of the tracked lottery days together with their lookup counters"""
+
+    def __init__(self, capacity: int, false_positive_rate: float) -> None:
+        """
+        Initializes the DailyBallotFilters object
+
+        Args:
+            capacity: number of ballots per day the false positive rate is targeted for
+            false_positive_rate: targeted false positive rate of each day
+        """
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self._filters: typing.Dict[datetime.date, BloomFilter] = {}
+        self._lock = threading.Lock()
+        self.negatives = 0
+        self.positives = 0
+        self.false_positives = 0
+
+    def is_tracked(self, date: datetime.date) -> bool:
+        """
+        Checks if the ballots of the day are tracked
+
+        Args:
+            date: lottery day
+
+        Returns:
+            True if the day has a filter
+        """
+        return date in self._filters
+
+    def track(self, date: datetime.date, ballots: typing.Iterable[str]) -> None:
+        """
+        Creates the filter of the day and fills it with the stored ballots of the day.
+        The filter is registered first, so the ballots inserted while it is being filled are not missed.
+
+        Args:
+            date: lottery day
+            ballots: ballots of the day stored in the DB
+        """
+        bloom_filter = BloomFilter(self.capacity, self.false_positive_rate)
+        with self._lock:
+            self._filters[date] = bloom_filter
+        for ballot in ballots:
+            with self._lock:
+                bloom_filter.add(ballot)
+        LOGGER.info(f"Ballot filter of the day:'{date}' is loaded with {bloom_filter.count} ballots")
+
+    def drop(self, date: datetime.date) -> None:
+        """
+        Removes the filter of the day, e.g. once the day is drawn
+
+        Args:
+            date: lottery day
+        """
+        with self._lock:
+            self._filters.pop(date, None)
+
+    def clear(self) -> None:
+        """Removes all the filters"""
+        with self._lock:
+            self._filters.clear()
+
+    def add(self, ballots: typing.Iterable[BallotKey]) -> None:
+        """
+        Adds the inserted ballots into the filters of their days, the ones of the untracked days are ignored
+
+        Args:
+            ballots: pairs of 16-digit string and the lottery day
+        """
+        with self._lock:
+            for ballot, date in ballots:
+                bloom_filter = self._filters.get(date)
+                if bloom_filter:
+                    bloom_filter.add(ballot)
+
+    def lookup(
+        self,
+        ballots: typing.Iterable[BallotKey],
+    ) -> typing.Tuple[typing.List[BallotKey], typing.List[BallotKey]]:
+        """
+        Looks the ballots up in the filters of their days and drops the certainly absent ones
+
+        Args:
+            ballots: pairs of 16-digit string and the lottery day
+
+        Returns:
+            ballots of the untracked days and the positive ones, both to be checked via the DB
+        """
+        untracked: typing.List[BallotKey] = []
+        positives: typing.List[BallotKey] = []
+        with self._lock:
+            for ballot, date in ballots:
+                bloom_filter = self._filters.get(date)
+                if bloom_filter is None:
+                    untracked.append((ballot, date))
+                elif ballot in bloom_filter:
+                    positives.append((ballot, date))
+                else:
+                    self.negatives += 1
+            self.positives += len(positives)
+        return untracked, positives
+
+    def record_false_positives(self, count: int) -> None:
+        """
+        Counts the positive lookups which turn out to be absent in the DB
+
+        Args:
+            count: number of false positives
+        """
+        with self._lock:
+            self.false_positives += count
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        """
+        Returns the memory footprint and the false positive rates of the filters
+
+        Returns:
+            lookup counters, the observed false positive rate and the details of each tracked day
+        """
+        with self._lock:
+            return {
+                "negatives": self.negatives,
+                "positives": self.positives,
+                "false_positives": self.false_positives,
+                "false_positive_rate": self.false_positives / max(self.false_positives + self.negatives, 1),
+                "size_in_bytes": sum(bloom_filter.size_in_bytes for bloom_filter in self._filters.values()),
+                "days": {
+                    str(date): {
+                        "ballots": bloom_filter.count,
+                        "size_in_bytes": bloom_filter.size_in_bytes,
+                        "estimated_false_positive_rate": bloom_filter.estimate_false_positive_rate(),
+                    }
+                    for date, bloom_filter in sorted(self._filters.items())
+                },
+            }
+
+
+# filters of the open lottery days, loaded by the LotteryProcessor and fed by the inserts of database.py
+ballot_filters = DailyBallotFilters(
+    capacity=settings.ballot_filter_capacity,
+    false_positive_rate=settings.ballot_filter_false_positive_rate,
+)
@@ -0,0 +1,243 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Implementation of an in-process LRU cache with TTL, used to serve the winners of the closed lottery days
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import asyncio
+import collections
+import threading
+import time
+import typing
+
+import structlog
+
+from lottery_backend.settings import settings
+
+LOGGER = structlog.get_logger()
+
+
+class _Flight:
+    """A load of a key in progress which concurrent callers wait for instead of loading the key themselves"""
+
+    def __init__(self) -> None:
+        """
+        Initializes the _Flight object
+        """
+        self.done = threading.Event()
+        self.value: typing.Any = None
+        self.error: typing.Optional[BaseException] = None
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a size limit, a TTL per entry and single-flight loading of missing keys"""
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Initializes the LRUCache object
+
+        Args:
+            max_size: max number of entries, the least recently used entry is evicted beyond it
+            ttl: seconds an entry stays valid after it is stored
+            clock: monotonic time source in seconds
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "collections.OrderedDict[typing.Hashable, typing.Tuple[float, typing.Any]]" = (
+            collections.OrderedDict()
+        )
+        self._flights: typing.Dict[typing.Hashable, _Flight] = {}
+        self._async_flights: typing.Dict[typing.Hashable, "asyncio.Future[typing.Any]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get_or_load(self, key: typing.Hashable, loader: typing.Callable[[], typing.Any]) -> typing.Any:
+        """
+        Returns the cached value of the key, loads and caches it on a miss.
+        Concurrent misses of the same key are coalesced into a single call of the loader.
+
+        Args:
+            key: key of the entry
+            loader: function returning the value of the key, its exceptions are propagated and not cached
+
+        Returns:
+            value of the key
+        """
+        with self._lock:
+            is_hit, value = self._lookup(key)
+            if is_hit:
+                return value
+            flight = self._flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not is_leader:
+            return self._wait_for(flight)
+        try:
+            flight.value = loader()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        else:
+            self.put(key, flight.value)
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+        return flight.value
+
+    async def get_or_load_async(
+        self,
+        key: typing.Hashable,
+        loader: typing.Callable[[], typing.Awaitable[typing.Any]],
+    ) -> typing.Any:
+        """
+        Coroutine version of get_or_load, concurrent misses of the same key within the event loop await
+        a single call of the loader
+
+        Args:
+            key: key of the entry
+            loader: coroutine function returning the value of the key, its exceptions are propagated and not cached
+
+        Returns:
+            value of the key
+        """
+        with self._lock:
+            is_hit, value = self._lookup(key)
+            if is_hit:
+                return value
+            flight = self._async_flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = self._async_flights[key] = asyncio.get_running_loop().create_future()
+            else:
+                self.coalesced += 1
+
+        if not is_leader:
+            return await asyncio.shield(flight)
+        try:
+            value = await loader()
+        except BaseException as exc:
+            if isinstance(exc, asyncio.CancelledError):
+                flight.cancel()
+            else:
+                flight.set_exception(exc)
+                flight.exception()  # marks the exception as retrieved when nobody else is waiting
+            raise
+        else:
+            self.put(key, value)
+            flight.set_result(value)
+        finally:
+            with self._lock:
+                self._async_flights.pop(key, None)
+        return value
+
+    def put(self, key: typing.Hashable, value: typing.Any) -> None:
+        """
+        Stores the value of the key, evicting the least recently used entries beyond the size limit
+
+        Args:
+            key: key of the entry
+            value: value of the entry
+        """
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: typing.Hashable) -> None:
+        """
+        Removes the entry of the key if it is cached
+
+        Args:
+            key: key of the entry
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Removes all the entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> typing.Dict[str, int]:
+        """
+        Returns the counters of the cache
+
+        Returns:
+            hit, miss, coalesced miss and eviction counters together with the current size
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+            }
+
+    def _lookup(self, key: typing.Hashable) -> typing.Tuple[bool, typing.Any]:
+        """
+        Looks up the key and updates the counters, must be called with the lock held
+
+        Args:
+            key: key of the entry
+
+        Returns:
+            whether the key is cached and not expired, together with its value
+        """
+        entry = self._entries.get(key)
+        if entry and entry[0] > self._clock():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+        self.misses += 1
+        return False, None
+
+    @staticmethod
+    def _wait_for(flight: _Flight) -> typing.Any:
+        """
+        Waits for the load in progress and returns its outcome
+
+        Args:
+            flight: load in progress
+
+        Returns:
+            value loaded by the leading caller
+
+        Raises:
+            the exception raised by the loader of the leading caller
+        """
+        flight.done.wait()
+        if flight.error:
+            raise flight.error
+        return flight.value
+
+
+# winners of the closed lottery days keyed by date, warmed by the LotteryProcessor right after a draw
+winner_cache = LRUCache(max_size=settings.winner_cache_size, ttl=settings.winner_cache_ttl)
@@ -14,26 +14,127 @@ Implementation of Database related functionalities
 #                                                                              #
 # -----------------------------------------------------------------------------#
 """
+import contextlib
 import datetime
+import time
 import typing
-from pathlib import Path
 
 import structlog
+from sqlalchemy import delete
+from sqlalchemy import event
+from sqlalchemy import func
+from sqlalchemy import insert
+from sqlalchemy import or_
+from sqlalchemy import text
+from sqlalchemy import tuple_
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import Pool
+from sqlalchemy.pool import QueuePool
 from sqlmodel import Session
 from sqlmodel import create_engine
 from sqlmodel import select
 
+from lottery_backend.ballot_filter import ballot_filters
+from lottery_backend.db_models.draw_lease import DrawLease
+from lottery_backend.db_models.draw_result import DrawResult
 from lottery_backend.db_models.user import User
 from lottery_backend.db_models.user_ballot import UserBallot
+from lottery_backend.exceptions import BallotAlreadyExistsException
+from lottery_backend.exceptions import LotteryAlreadyDrawnException
+from lottery_backend.settings import Settings
+from lottery_backend.settings import settings
 
 LOGGER = structlog.get_logger()
-DB_PATH = Path(__file__).parents[0] / "lottery.db"
+BALLOT_QUERY_CHUNK_SIZE = 5000  # keeps the bound parameters of a query below SQLite's limit
+BALLOT_STREAM_BATCH_SIZE = 10000  # number of rows fetched from the DB cursor at once while streaming ballots
 
-engine = create_engine(
-    f"sqlite:///{DB_PATH}",
-    connect_args={"check_same_thread": False},  # Needed for SQLite
-    echo=True,  # Log generated SQL
-)
+
+def get_engine_options(
+    profile: Settings,
+    pool_class: typing.Type[Pool] = QueuePool,
+) -> typing.Dict[str, typing.Any]:
+    """
+    Builds the keyword arguments of create_engine from the DB settings
+
+    Args:
+        profile: settings to connect the DB with
+        pool_class: connection pool used unless pooling is disabled
+
+    Returns:
+        keyword arguments of create_engine/create_async_engine
+    """
+    options: typing.Dict[str, typing.Any] = {
+        "connect_args": {"check_same_thread": False},  # Needed for SQLite
+        "echo": profile.database_echo,
+    }
+    if profile.database_pool_size:
+        options.update(
+            poolclass=pool_class,
+            pool_size=profile.database_pool_size,
+            max_overflow=profile.database_max_overflow,
+        )
+    else:
+        options.update(poolclass=NullPool)
+    return options
+
+
+def register_sqlite_pragmas(db_engine: Engine, profile: Settings) -> None:
+    """
+    Makes the engine run the configured PRAGMAs on each new DB connection
+
+    Args:
+        db_engine: synchronous engine, i.e. AsyncEngine.sync_engine for the asynchronous ones
+        profile: settings holding the PRAGMA values
+    """
+    pragmas = (
+        f"PRAGMA busy_timeout = {profile.sqlite_busy_timeout}",  # set first, switching to WAL may wait for a lock
+        f"PRAGMA journal_mode = {profile.sqlite_journal_mode}",
+        f"PRAGMA synchronous = {profile.sqlite_synchronous}",
+        f"PRAGMA cache_size = {profile.sqlite_cache_size}",
+        f"PRAGMA mmap_size = {profile.sqlite_mmap_size}",
+    )
+
+    @event.listens_for(db_engine, "connect")
+    def set_pragmas(dbapi_connection: typing.Any, connection_record: typing.Any) -> None:  # noqa: WPS430
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def create_database_engine(profile: Settings = settings) -> Engine:
+    """
+    Creates the synchronous DB engine of the given settings
+
+    Args:
+        profile: settings to connect the DB with
+
+    Returns:
+        a new engine with pooled connections on which the PRAGMAs are set
+    """
+    db_engine = create_engine(profile.database_url, **get_engine_options(profile))
+    register_sqlite_pragmas(db_engine, profile)
+    return db_engine
+
+
+def get_async_database_url(profile: Settings = settings) -> str:
+    """
+    Converts the configured DB URL to the one of the asynchronous (aiosqlite) driver
+
+    Args:
+        profile: settings to connect the DB with
+
+    Returns:
+        URL of the same DB with the aiosqlite driver
+    """
+    return str(make_url(profile.database_url).set(drivername="sqlite+aiosqlite"))
+
+
+engine = create_database_engine()
 
 
 def get_session():
@@ -41,146 +142,674 @@ def get_session():
         yield session
 
 
+@contextlib.contextmanager
+def session_scope(session: typing.Optional[Session] = None) -> typing.Iterator[Session]:
+    """
+    Provides the session of the caller as is, or a new session which is closed on exit.
+    Callers outside of a request (e.g. the LotteryProcessor thread) use it to scope a unit of work,
+    so that no session is shared among threads or kept open with a growing identity map.
+
+    Args:
+        session: session of the caller, if any
+
+    Yields:
+        session for DB connection
+    """
+    if session is not None:
+        yield session
+        return
+    with Session(engine) as new_session:
+        yield new_session
+
+
 def add_new_user(  # noqa: WPS211
     username: str,
-    password: str,
+    password_hash: str,
     full_name: str,
     email_address: typing.Optional[str] = None,
     phone_number: typing.Optional[str] = None,
-    session: Session = next(get_session()),
+    session: typing.Optional[Session] = None,
 ) -> User:
     """
     Adds a new user into the database
 
     Args:
         username: a unique username
-        password: to be used when logging in
+        password_hash: bcrypt hash of the password to be used when logging in
         full_name: name and surname of the user
         email_address: optional communication detail
         phone_number: optional communication detail
-        session: session for DB connection
+        session: session for DB connection, a short-lived one is used if omitted
 
     Returns:
          a newly created User object
     """
-    new_user = User(
-        username=username,
-        full_name=full_name,
-        email_address=email_address,
-        phone_number=phone_number,
-    )
-    new_user.set_password(password)
-    session.add(new_user)
-    session.commit()
-    session.refresh(new_user)
-    return new_user
+    with session_scope(session) as session:
+        new_user = User(
+            username=username,
+            full_name=full_name,
+            email_address=email_address,
+            phone_number=phone_number,
+            password_hash=password_hash,
+        )
+        session.add(new_user)
+        session.commit()
+        session.refresh(new_user)
+        return new_user
 
 
-def fetch_user_from_db(username: str, session: Session = next(get_session())) -> typing.Optional[User]:
+def fetch_user_from_db(username: str, session: typing.Optional[Session] = None) -> typing.Optional[User]:
     """
     Fetches the User object from the database
 
     Args:
         username: used as an identifier for User object
-        session: session for DB connection
+        session: session for DB connection, a short-lived one is used if omitted
 
     Returns:
         User object if it exists, None otherwise
     """
-    query = select(User).where(User.username == username)
-    user = session.exec(query).first()
-    if user:
-        LOGGER.info(f"There exists a user object in DB with the username '{username}'")
-    else:
-        LOGGER.info(f"There is no user object in DB with the username '{username}'")
-    return user
+    with session_scope(session) as session:
+        query = select(User).where(User.username == username)
+        user = session.exec(query).first()
+        if user:
+            LOGGER.info(f"There exists a user object in DB with the username '{username}'")
+        else:
+            LOGGER.info(f"There is no user object in DB with the username '{username}'")
+        return user
+
+
+def save_user(user: User, session: typing.Optional[Session] = None) -> User:
+    """
+    Persists the changes on the User object, e.g. a rehashed password
+
+    Args:
+        user: User object fetched from the database
+        session: session for DB connection, a short-lived one is used if omitted
+
+    Returns:
+         the updated User object
+    """
+    with session_scope(session) as session:
+        session.add(user)
+        session.commit()
+        session.refresh(user)
+        return user
 
 
 def add_ballot_for_user(
         user_id: int,
         ballot: str,
         date: datetime.date,
-        session: Session = next(get_session()),
+        session: typing.Optional[Session] = None,
 ) -> UserBallot:
     """
-    Adds a new ballot on the user for a specific day of lottery
+    Adds a new ballot on the user for a specific day of lottery.
+    Uniqueness is guaranteed by the (date, ballot) index, so no existence check is needed beforehand.
 
     Args:
         user_id: a unique id of a username in User table
         ballot: a 16-digit string
         date: day of the lottery for which the ballot is added
-        session: session for DB connection
+        session: session for DB connection, a short-lived one is used if omitted
 
     Returns:
          a newly created UserBallot object
+
+    Raises:
+        BallotAlreadyExistsException if the ballot is already submitted for the day
     """
-    new_user_ballot = UserBallot(user_id=user_id, ballot=ballot, date=date)
-    session.add(new_user_ballot)
-    session.commit()
-    session.refresh(new_user_ballot)
-    return new_user_ballot
+    with session_scope(session) as session:
+        new_user_ballot = UserBallot(user_id=user_id, ballot=ballot, date=date)
+        session.add(new_user_ballot)
+        try:
+            session.commit()
+        except IntegrityError as exc:
+            session.rollback()
+            LOGGER.info(f"Ballot:'{ballot}' exists for the day:'{date}'")
+            raise BallotAlreadyExistsException(f"There is already a ballot:'{ballot}' for the day:'{date}'") from exc
+        ballot_filters.add([(ballot, date)])
+        session.refresh(new_user_ballot)
+        return new_user_ballot
+
+
+def add_ballots_for_user(
+        user_id: int,
+        ballots: typing.Sequence[typing.Tuple[str, datetime.date]],
+        session: typing.Optional[Session] = None,
+) -> int:
+    """
+    Adds the given ballots on the user in a single transaction by using one executemany statement
+
+    Args:
+        user_id: a unique id of a username in User table
+        ballots: pairs of 16-digit string and the day of the lottery for which the ballot is added
+        session: session for DB connection, a short-lived one is used if omitted
+
+    Returns:
+         number of the inserted ballots
+
+    Raises:
+        BallotAlreadyExistsException if any of the ballots is already submitted for its day, nothing is inserted then
+    """
+    inserted_count = add_ballots([(user_id, ballot, date) for ballot, date in ballots], session=session)
+    LOGGER.info(f"{inserted_count} ballots are added for the user with id:'{user_id}'")
+    return inserted_count
+
+
+def add_ballots(
+        ballots: typing.Sequence[typing.Tuple[int, str, datetime.date]],
+        session: typing.Optional[Session] = None,
+) -> int:
+    """
+    Adds the given ballots of any users in a single transaction by using one executemany statement
+
+    Args:
+        ballots: triples of the user id, 16-digit string and the day of the lottery for which the ballot is added
+        session: session for DB connection, a short-lived one is used if omitted
+
+    Returns:
+         number of the inserted ballots
+
+    Raises:
+        BallotAlreadyExistsException if any of the ballots is already submitted for its day, nothing is inserted then
+    """
+    with session_scope(session) as session:
+        if not ballots:
+            return 0
+        try:
+            session.execute(
+                insert(UserBallot),
+                [{"user_id": user_id, "ballot": ballot, "date": date} for user_id, ballot, date in ballots],
+            )
+            session.commit()
+        except IntegrityError as exc:
+            session.rollback()
+            LOGGER.info(f"Some of the {len(ballots)} ballots are submitted concurrently by others")
+            raise BallotAlreadyExistsException("Some of the ballots are already submitted for their day") from exc
+        ballot_filters.add((ballot, date) for _, ballot, date in ballots)
+        return len(ballots)
+
+
+def get_existing_ballots(
+    ballots: typing.Sequence[typing.Tuple[str, datetime.date]],
+    use_filter: bool = False,
+    session: typing.Optional[Session] = None,
+) -> typing.Set[typing.Tuple[str, datetime.date]]:
+    """
+    Finds out which of the given ballots already exist with a set-based query instead of one query per ballot.
+    The ballot filters can drop the certainly absent ballots upfront, but they only know the ballots inserted
+    by this process, so a retry after a failed insert should query the DB for all the ballots.
+
+    Args:
+        ballots: pairs of 16-digit string and the day of the lottery
+        use_filter: whether the ballots of the tracked days are looked up in their ballot filters first
+        session: session for DB connection, a short-lived one is used if omitted
+
+    Returns:
+        the subset of the given pairs which are already stored in the DB
+    """
+    positives: typing.List[typing.Tuple[str, datetime.date]] = []
+    if use_filter:
+        untracked, positives = ballot_filters.lookup(ballots)
+        ballots = untracked + positives
+    with session_scope(session) as session:
+        existing_ballots: typing.Set[typing.Tuple[str, datetime.date]] = set()
+        for index in range(0, len(ballots), BALLOT_QUERY_CHUNK_SIZE):
+            chunk = ballots[index:index + BALLOT_QUERY_CHUNK_SIZE]
+            query = select(UserBallot.ballot, UserBallot.date).where(
+                tuple_(UserBallot.ballot, UserBallot.date).in_(chunk),
+            )
+            existing_ballots.update((ballot, date) for ballot, date in session.exec(query).all())
+        if positives:
+            ballot_filters.record_false_positives(len(set(positives) - existing_ballots))
+        LOGGER.info(f"{len(existing_ballots)} out of {len(ballots)} ballots already exist in DB")
+        return existing_ballots
 
 
-def get_ballots_for_date(date: datetime.date, session: Session = next(get_session())) -> typing.List[str]:
+def get_open_lottery_dates(
+    from_date: datetime.date,
+    session: typing.Optional[Session] = None,
+) -> typing.List[datetime.date]:
+    """
+    Fetches the lottery days having ballots from the given day on, by walking the (date, ballot) index
+
+    Args:
+        from_date: the first day to include, i.e. today
+        session: session for DB connection, a short-lived one is used if omitted
+
+    Returns:
+        the days in ascending order
+    """
+    with session_scope(session) as session:
+        query = select(UserBallot.date).where(UserBallot.date >= from_date).distinct().order_by(UserBallot.date)
+        return session.exec(query).all()
+
+
+def get_undrawn_lottery_dates(
+    before: datetime.date,
+    session: typing.Optional[Session] = None,
+) -> typing.List[datetime.date]:
+    """
+    Fetches the past lottery days having ballots but no draw result, e.g. the ones missed while the service was down
+
+    Args:
+        before: the first day to exclude, i.e. today
+        session: session for DB connection, a short-lived one is used if omitted
+
+    Returns:
+        the days in ascending order
+    """
+    with session_scope(session) as session:
+        query = (
+            select(UserBallot.date)
+            .where(UserBallot.date < before, UserBallot.date.not_in(select(DrawResult.date)))
+            .distinct()
+            .order_by(UserBallot.date)
+        )
+        return session.exec(query).all()
+
+
+def get_unpurged_lottery_dates(
+    before: datetime.date,
+    session: typing.Optional[Session] = None,
+) -> typing.List[datetime.date]:
+    """
+    Fetches the past lottery days having a draw result but still other ballots than the winner,
+    i.e. the ones whose draw is interrupted while purging the ballots
+
+    Args:
+        before: the first day to exclude, i.e. today
+        session: session for DB connection, a short-lived one is used if omitted
+
+    Returns:
+        the days in ascending order
+    """
+    with session_scope(session) as session:
+        query = (
+            select(UserBallot.date)
+            .where(UserBallot.date < before, UserBallot.date.in_(select(DrawResult.date)))
+            .group_by(UserBallot.date)
+            .having(func.count() > 1)
+            .order_by(UserBallot.date)
+        )
+        return session.exec(query).all()
+
+
+def get_ballots_for_date(date: datetime.date, session: typing.Optional[Session] = None) -> typing.List[str]:
     """
     Fetches all the submitted ballots for the provided lottery day
 
     Args:
          date: a day to query the ballots
-         session: session for DB connection
+         session: session for DB connection, a short-lived one is used if omitted
 
     Returns:
         list of ballots in this provided lottery day
     """
-    ballot_list: typing.List[str] = []
-    query = select(UserBallot).where(UserBallot.date == date)
-    user_ballot_list = session.exec(query).all()
-    for user_ballot in user_ballot_list:
-        ballot_list.append(user_ballot.ballot)
-    return ballot_list
+    with session_scope(session) as session:
+        query = select(UserBallot.ballot).where(UserBallot.date == date)  # no ORM object is built per ballot
+        return session.exec(query).all()
+
+
+def get_ballot_page(
+    date: datetime.date,
+    after: typing.Optional[str],
+    limit: int,
+    session: typing.Optional[Session] = None,
+) -> typing.List[str]:
+    """
+    Fetches a page of the submitted ballots for the provided lottery day with keyset pagination,
+    i.e. the page starts right after the given ballot within the (date, ballot) index instead of skipping rows
+
+    Args:
+         date: a day to query the ballots
+         after: last ballot of the previous page, None for the first page
+         limit: max number of ballots in the page
+         session: session for DB connection, a short-lived one is used if omitted
+
+    Returns:
+        ballots of the page in ascending order
+    """
+    with session_scope(session) as session:
+        query = select(UserBallot.ballot).where(*_get_ballot_range_conditions(date, after))
+        return session.exec(query.order_by(UserBallot.ballot).limit(limit)).all()
+
+
+def get_user_ballot_page(
+    user_id: int,
+    date: datetime.date,
+    after: typing.Optional[str],
+    limit: int,
+    session: typing.Optional[Session] = None,
+) -> typing.List[str]:
+    """
+    Fetches a page of the ballots of the user for the provided lottery day with keyset pagination.
+    The (user_id, date, ballot) index serves it regardless of the ballots of the other users on the day.
+
+    Args:
+         user_id: a unique id of a username in User table
+         date: a day to query the ballots
+         after: last ballot of the previous page, None for the first page
+         limit: max number of ballots in the page
+         session: session for DB connection, a short-lived one is used if omitted
+
+    Returns:
+        ballots of the page in ascending order
+    """
+    with session_scope(session) as session:
+        conditions = [UserBallot.user_id == user_id, *_get_ballot_range_conditions(date, after)]
+        query = select(UserBallot.ballot).where(*conditions).order_by(UserBallot.ballot).limit(limit)
+        return session.exec(query).all()
+
+
+def count_ballots_for_date(date: datetime.date, session: typing.Optional[Session] = None) -> int:
+    """
+    Counts the submitted ballots for the provided lottery day by using the (date, ballot) index
+
+    Args:
+         date: a day to count the ballots
+         session: session for DB connection, a short-lived one is used if omitted
+
+    Returns:
+        number of ballots in this provided lottery day
+    """
+    with session_scope(session) as session:
+        query = select(func.count()).select_from(UserBallot).where(UserBallot.date == date)
+        return session.exec(query).one()
+
+
+def get_ballot_at_offset(
+    date: datetime.date,
+    offset: int,
+    session: typing.Optional[Session] = None,
+) -> typing.Optional[str]:
+    """
+    Fetches the single ballot at the given position of the lottery day ordered by the (date, ballot) index
+
+    Args:
+         date: a day to query the ballot
+         offset: zero-based position of the ballot within the day
+         session: session for DB connection, a short-lived one is used if omitted
+
+    Returns:
+        the ballot at the position, None if there are fewer ballots on the day
+    """
+    with session_scope(session) as session:
+        query = (
+            select(UserBallot.ballot).where(UserBallot.date == date).order_by(UserBallot.ballot).offset(offset).limit(1)
+        )
+        return session.exec(query).first()
+
+
+def stream_ballots_for_date(
+    date: datetime.date,
+    batch_size: int = BALLOT_STREAM_BATCH_SIZE,
+    after: typing.Optional[str] = None,
+    session: typing.Optional[Session] = None,
+) -> typing.Iterator[str]:
+    """
+    Iterates over the submitted ballots for the provided lottery day without loading all of them into memory
+
+    Args:
+         date: a day to query the ballots
+         batch_size: number of ballots fetched from the DB cursor at once
+         after: ballot to start after, None to start from the first ballot
+         session: session for DB connection, a short-lived one is used if omitted
+
+    Yields:
+        ballots in this provided lottery day ordered by the (date, ballot) index
+    """
+    with session_scope(session) as session:
+        query = select(UserBallot.ballot).where(*_get_ballot_range_conditions(date, after)).order_by(UserBallot.ballot)
+        yield from session.exec(query.execution_options(yield_per=batch_size))
+
+
+def _get_ballot_range_conditions(date: datetime.date, after: typing.Optional[str]) -> typing.List[typing.Any]:
+    """
+    Builds the conditions selecting the ballots of the day after the given ballot, a range scan of the index
+
+    Args:
+         date: a day to query the ballots
+         after: ballot to start after, None to start from the first ballot
+
+    Returns:
+        conditions of the WHERE clause
+    """
+    conditions = [UserBallot.date == date]
+    if after is not None:
+        conditions.append(UserBallot.ballot > after)
+    return conditions
+
+
+def add_draw_result(
+    date: datetime.date,
+    ballot: str,
+    ballot_count: int,
+    session: typing.Optional[Session] = None,
+) -> DrawResult:
+    """
+    Records the winning ballot of the lottery day together with its owner and the number of ballots in the draw.
+    Everything is written in a single transaction and the date being the primary key prevents drawing a day twice.
+
+    Args:
+        date: the drawn lottery day
+        ballot: the winning 16-digit string
+        ballot_count: number of ballots the winner is drawn among, counted before the write lock is taken
+        session: session for DB connection, a short-lived one is used if omitted
+
+    Returns:
+        the newly created DrawResult object
+
+    Raises:
+        LotteryAlreadyDrawnException if there is already a draw result for the day
+    """
+    with session_scope(session) as session:
+        winner_query = select(UserBallot.user_id).where(UserBallot.date == date, UserBallot.ballot == ballot)
+        draw_result = DrawResult(
+            date=date,
+            ballot=ballot,
+            user_id=session.exec(winner_query).one(),
+            ballot_count=ballot_count,
+        )
+        session.add(draw_result)
+        try:
+            session.commit()
+        except IntegrityError as exc:
+            session.rollback()
+            raise LotteryAlreadyDrawnException(f"There is already a draw result for the day:'{date}'") from exc
+        session.refresh(draw_result)
+        LOGGER.info(f"Draw result of the day:'{date}' is stored with {draw_result.ballot_count} ballots")
+        return draw_result
+
+
+def get_draw_result(date: datetime.date, session: typing.Optional[Session] = None) -> typing.Optional[DrawResult]:
+    """
+    Fetches the result of the lottery draw with a primary key lookup
+
+    Args:
+        date: the lottery day
+        session: session for DB connection, a short-lived one is used if omitted
+
+    Returns:
+        DrawResult object if the day is drawn, None otherwise
+    """
+    with session_scope(session) as session:
+        return session.get(DrawResult, date)
+
+
+def acquire_draw_lease(
+    date: datetime.date,
+    owner: str,
+    ttl: float,
+    session: typing.Optional[Session] = None,
+) -> bool:
+    """
+    Takes the lease of the lottery day so that no other worker draws the day at the same time.
+    The lease is inserted, or taken over if it is expired or already held by the owner,
+    each with a single statement so that exactly one of the racing workers succeeds.
+
+    Args:
+        date: lottery day to draw
+        owner: id of the worker
+        ttl: seconds the lease is held unless it is released, a worker dying during the draw holds it until then
+        session: session for DB connection, a short-lived one is used if omitted
+
+    Returns:
+        True if the worker holds the lease, False if another worker does
+    """
+    now = datetime.datetime.now()
+    expires_at = now + datetime.timedelta(seconds=ttl)
+    with session_scope(session) as session:
+        try:
+            session.execute(insert(DrawLease).values(date=date, owner=owner, expires_at=expires_at))
+            session.commit()
+            return True
+        except IntegrityError:
+            session.rollback()
+        statement = (
+            update(DrawLease)
+            .where(DrawLease.date == date, or_(DrawLease.expires_at < now, DrawLease.owner == owner))
+            .values(owner=owner, expires_at=expires_at)
+            .execution_options(synchronize_session=False)
+        )
+        is_acquired = session.execute(statement).rowcount == 1
+        session.commit()
+        return is_acquired
+
+
+def release_draw_lease(date: datetime.date, owner: str, session: typing.Optional[Session] = None) -> None:
+    """
+    Releases the lease of the lottery day if it is still held by the worker
+
+    Args:
+        date: lottery day drawn
+        owner: id of the worker
+        session: session for DB connection, a short-lived one is used if omitted
+    """
+    with session_scope(session) as session:
+        statement = delete(DrawLease).where(DrawLease.date == date, DrawLease.owner == owner)
+        session.execute(statement.execution_options(synchronize_session=False))
+        session.commit()
 
 
 def clear_ballots_on_date(
     date: datetime.date,
     exception_ballot: typing.Optional[str] = None,
-    session: Session = next(get_session()),
-) -> None:
+    chunk_size: int = 0,
+    session: typing.Optional[Session] = None,
+) -> int:
     """
     Deletes the ballots on a given day. If an exception ballot is provided, it won't be removed!
+    Deletion is done with set-based DELETE statements without loading the ballots into memory.
+    When a chunk size is given, ballots are deleted chunk by chunk with a commit in between,
+    so the write lock of the DB is released and concurrent submissions are not stalled for long.
 
     Args:
         date: a day to query the ballots
         exception_ballot: 16-digit string representing a ballot for lottery
+        chunk_size: max number of ballots deleted per transaction, 0 deletes all in one statement
+        session: session for DB connection, a short-lived one is used if omitted
+
+    Returns:
+        number of the deleted ballots
+    """
+    with session_scope(session) as session:
+        conditions = [UserBallot.date == date]
+        if exception_ballot:
+            conditions.append(UserBallot.ballot != exception_ballot)
+            LOGGER.info(f"Ballot '{exception_ballot}' will not be removed!")
+
+        if chunk_size <= 0:
+            deleted_count = _delete_user_ballots(delete(UserBallot).where(*conditions), session)
+        else:
+            deleted_count = 0
+            while True:
+                chunk_deleted_count = delete_ballot_chunk(date, exception_ballot, chunk_size, session=session)
+                deleted_count += chunk_deleted_count
+                if chunk_deleted_count < chunk_size:
+                    break
+        LOGGER.info(f"{deleted_count} ballots on {date} are deleted from DB!")
+        return deleted_count
+
+
+def delete_ballot_chunk(
+    date: datetime.date,
+    exception_ballot: typing.Optional[str],
+    chunk_size: int,
+    session: Session,
+) -> int:
+    """
+    Deletes a chunk of the ballots on a given day in its own transaction, except the exception ballot
+
+    Args:
+        date: a day to delete the ballots of
+        exception_ballot: 16-digit string representing a ballot which won't be removed, e.g. the winner
+        chunk_size: max number of ballots to delete
         session: session for DB connection
+
+    Returns:
+        number of the deleted ballots, fewer than the chunk size once the day is cleared
     """
+    conditions = [UserBallot.date == date]
     if exception_ballot:
-        query = select(UserBallot).where(UserBallot.date == date, UserBallot.ballot != exception_ballot)
-        LOGGER.info(f"Ballot '{exception_ballot}' will not be removed!")
-    else:
-        query = select(UserBallot).where(UserBallot.date == date)
-    user_ballot_list = session.exec(query).all()
-    for user_ballot in user_ballot_list:
-        session.delete(user_ballot)
+        conditions.append(UserBallot.ballot != exception_ballot)
+    chunk_ids = select(UserBallot.id).where(*conditions).limit(chunk_size)
+    return _delete_user_ballots(delete(UserBallot).where(UserBallot.id.in_(chunk_ids)), session)
+
+
+def lock_for_write(session: Session) -> float:
+    """
+    Starts the transaction of the session by taking the write lock of the DB right away (BEGIN IMMEDIATE),
+    so the time spent waiting for the concurrent writers is measured apart from the statements run afterwards.
+    The transaction must be committed or rolled back by the caller.
+
+    Args:
+        session: session for DB connection, without a pending write
+
+    Returns:
+        seconds waited for the write lock, always 0 for the DBs other than SQLite
+    """
+    if session.get_bind().dialect.name != "sqlite":
+        return 0.0
+    start = time.perf_counter()
+    session.execute(text("BEGIN IMMEDIATE"))
+    return time.perf_counter() - start
+
+
+def _delete_user_ballots(statement: typing.Any, session: Session) -> int:
+    """
+    Executes the DELETE statement in its own transaction
+
+    Args:
+        statement: DELETE statement on UserBallot table
+        session: session for DB connection, committed once the statement is executed
+
+    Returns:
+        number of the deleted ballots
+    """
+    result = session.execute(statement.execution_options(synchronize_session=False))
     session.commit()
-    LOGGER.info(f"{len(user_ballot_list)} ballots on {date} are deleted from DB!")
+    return result.rowcount
 
 
-def check_ballot_existence(ballot: str, date: datetime.date, session: Session = next(get_session())) -> bool:
+def check_ballot_existence(ballot: str, date: datetime.date, session: typing.Optional[Session] = None) -> bool:
     """
     Checks if the ballot exists for the given lottery day
 
     Args:
         ballot: 16-digit string representing a ballot for lottery
         date: a day to query the ballots
-        session: session for DB connection
+        session: session for DB connection, a short-lived one is used if omitted
 
     Returns:
         list of ballots in this provided lottery day
     """
-    query = select(UserBallot).where(UserBallot.ballot == ballot, UserBallot.date == date)
-    user_ballot = session.exec(query).first()
-    if user_ballot:
-        LOGGER.info(f"Ballot:'{ballot}' exists for the day:'{date}'")
-        return True
-    LOGGER.info(f"Ballot:'{ballot}' does not exist for the day:'{date}'")
-    return False
+    with session_scope(session) as session:
+        query = select(UserBallot).where(UserBallot.ballot == ballot, UserBallot.date == date)
+        user_ballot = session.exec(query).first()
+        if user_ballot:
+            LOGGER.info(f"Ballot:'{ballot}' exists for the day:'{date}'")
+            return True
+        LOGGER.info(f"Ballot:'{ballot}' does not exist for the day:'{date}'")
+        return False
@@ -0,0 +1,28 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Implementation of Database Model class to keep the leases of the lottery draws among the workers
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import datetime
+
+from sqlmodel import Field
+from sqlmodel import SQLModel
+
+
+class DrawLease(SQLModel, table=True):
+    """Represents the right of a single worker to draw a lottery day, until it expires"""
+
+    date: datetime.date = Field(primary_key=True)  # a lottery day is drawn by a single worker at a time
+    owner: str = Field(nullable=False)  # id of the worker holding the lease
+    expires_at: datetime.datetime = Field(nullable=False)  # another worker may take the lease over afterwards
@@ -0,0 +1,31 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Implementation of Database Model class to keep the results of the lottery draws
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import datetime
+import typing
+
+from sqlmodel import Field
+from sqlmodel import SQLModel
+
+
+class DrawResult(SQLModel, table=True):
+    """Represents the winner of a lottery day, written once the day is drawn"""
+
+    date: datetime.date = Field(primary_key=True)  # a lottery day is drawn only once
+    ballot: str = Field(nullable=False)
+    user_id: int = Field(nullable=False)  # primary key of the User Table, owner of the winning ballot
+    ballot_count: typing.Optional[int] = None  # number of ballots in the draw, unknown for migrated legacy draws
+    drawn_at: datetime.datetime = Field(default_factory=datetime.datetime.now, nullable=False)
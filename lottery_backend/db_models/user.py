@@ -14,15 +14,44 @@ Implementation of Database Model class User
 #                                                                              #
 # -----------------------------------------------------------------------------#
 """
+import functools
 import typing
 
-from passlib.context import CryptContext
 from sqlalchemy import VARCHAR
 from sqlalchemy import Column
 from sqlmodel import Field
 from sqlmodel import SQLModel
 
-pwd_context = CryptContext(schemes=["bcrypt"])
+from lottery_backend.settings import settings
+
+if typing.TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+
+@functools.lru_cache(maxsize=1)
+def get_password_context() -> "CryptContext":
+    """
+    Creates the bcrypt context on its first use, so that importing the models does not load passlib & bcrypt
+
+    Returns:
+        the password hashing context with the configured cost
+    """
+    from passlib.context import CryptContext  # noqa: WPS433
+
+    return CryptContext(schemes=["bcrypt"], bcrypt__rounds=settings.bcrypt_rounds)
+
+
+def hash_password(password: str) -> str:
+    """
+    Hashes the password with bcrypt using the configured cost
+
+    Args:
+        password: a password to hash
+
+    Returns:
+        the password hash
+    """
+    return get_password_context().hash(password)
 
 
 class UserOutput(SQLModel):
@@ -50,11 +79,12 @@ class User(SQLModel, table=True):
         Args:
             password: a new password to set
         """
-        self.password_hash = pwd_context.hash(password)
+        self.password_hash = hash_password(password)
 
     def verify_password(self, password: str) -> bool:
         """
         Verify given password by hashing and comparing to password_hash.
+        If the password is correct but hashed with an outdated bcrypt cost, password_hash is replaced with a new hash.
 
         Args:
             password: a password to check if it is correct
@@ -62,4 +92,7 @@ class User(SQLModel, table=True):
         Returns:
             True if password is correct, False otherwise
         """
-        return pwd_context.verify(password, self.password_hash)
+        is_verified, new_hash = get_password_context().verify_and_update(password, self.password_hash)
+        if is_verified and new_hash:
+            self.password_hash = new_hash
+        return is_verified
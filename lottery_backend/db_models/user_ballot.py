@@ -17,14 +17,81 @@ Implementation of Database Model class to keep Users' ballots
 import datetime
 import typing
 
+from sqlalchemy import BigInteger
+from sqlalchemy import Column
+from sqlalchemy import Index
+from sqlalchemy.types import TypeDecorator
 from sqlmodel import Field
 from sqlmodel import SQLModel
 
+BALLOT_LENGTH = 16
+
+
+class BallotNumber(TypeDecorator):
+    """
+    Stores a 16-digit ballot string as a 64-bit integer, which halves the size of the rows & the (date, ballot) index
+    and makes the comparisons integer ones. It is read back as a zero-padded 16-digit string.
+    """
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value: typing.Optional[str], dialect: typing.Any) -> typing.Optional[int]:
+        """
+        Converts the ballot to the stored integer
+
+        Args:
+            value: 16-digit string
+            dialect: dialect of the DB
+
+        Returns:
+            the ballot as integer
+        """
+        return None if value is None else int(value)
+
+    def process_result_value(self, value: typing.Optional[int], dialect: typing.Any) -> typing.Optional[str]:
+        """
+        Converts the stored integer back to the ballot
+
+        Args:
+            value: the ballot as integer
+            dialect: dialect of the DB
+
+        Returns:
+            16-digit string
+        """
+        return None if value is None else format_ballot(value)
+
+
+def format_ballot(ballot: int) -> str:
+    """
+    Formats the ballot number as it is shown to the users
+
+    Args:
+        ballot: the ballot as integer
+
+    Returns:
+        zero-padded 16-digit string
+    """
+    return f"{ballot:0{BALLOT_LENGTH}d}"
+
 
 class UserBallot(SQLModel, table=True):
     """Represents users having ballots"""
 
+    __table_args__ = (
+        Index("ix_userballot_date_ballot", "date", "ballot", unique=True),  # a ballot is unique for a lottery day
+        Index("ix_userballot_user_id_date_ballot", "user_id", "date", "ballot"),  # ballots of a user, ordered
+    )
+
     id: typing.Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(nullable=False)  # primary key of the User Table
-    ballot: str = Field(nullable=False)  # will be checked to conform if 16-digit number!
+    ballot: str = Field(sa_column=Column(BallotNumber, nullable=False))  # checked to be a 16-digit number!
     date: datetime.date = Field(default_factory=datetime.date.today, nullable=False)
+
+
+class BallotSubmission(SQLModel):
+    """A single ballot & lottery day pair submitted within a batch request"""
+
+    ballot: str
+    date: datetime.date
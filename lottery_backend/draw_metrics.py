@@ -0,0 +1,96 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Implementation of the metrics of the phases of a lottery draw: duration, rows touched and time waited for
+the write lock of the DB. Each phase is logged as a structured event once it is completed.
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import contextlib
+import datetime
+import time
+import typing
+
+import structlog
+
+LOGGER = structlog.get_logger()
+
+
+class DrawPhase:
+    """Metrics of a single phase of a draw"""
+
+    def __init__(self, name: str) -> None:
+        """
+        Initializes the DrawPhase object
+
+        Args:
+            name: name of the phase, e.g. "purge"
+        """
+        self.name = name
+        self.duration = 0.0  # seconds
+        self.rows = 0  # rows read or written by the phase
+        self.lock_wait = 0.0  # seconds waited for the write lock of the DB, included in the duration
+
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        """Returns the metrics of the phase"""
+        return {"duration": self.duration, "rows": self.rows, "lock_wait": self.lock_wait}
+
+
+class DrawMetrics:
+    """Metrics of the phases of the draw of a lottery day"""
+
+    def __init__(self, date: datetime.date) -> None:
+        """
+        Initializes the DrawMetrics object
+
+        Args:
+            date: lottery day drawn
+        """
+        self.date = date
+        self.phases: typing.List[DrawPhase] = []
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> typing.Iterator[DrawPhase]:
+        """
+        Measures the duration of the phase run within the context, the rows & lock wait are set by the phase itself
+
+        Args:
+            name: name of the phase
+
+        Yields:
+            metrics of the phase
+        """
+        draw_phase = DrawPhase(name)
+        self.phases.append(draw_phase)
+        start = time.perf_counter()
+        try:
+            yield draw_phase
+        finally:
+            draw_phase.duration = time.perf_counter() - start
+            LOGGER.info(
+                f"Draw phase '{name}' of the day:'{self.date}' is completed",
+                phase=name,
+                **draw_phase.as_dict(),
+            )
+
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        """
+        Returns the metrics of the draw
+
+        Returns:
+            the day, the total duration and the metrics of each phase in the order they are run
+        """
+        return {
+            "date": str(self.date),
+            "duration": sum(draw_phase.duration for draw_phase in self.phases),
+            "phases": {draw_phase.name: draw_phase.as_dict() for draw_phase in self.phases},
+        }
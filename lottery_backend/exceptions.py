@@ -25,6 +25,26 @@ class BadRequestException(Exception):
     pass
 
 
+class BallotAlreadyExistsException(Exception):
+    """Raised when a ballot is already submitted for the same lottery day"""
+
+
+class ConcurrentSubmissionException(Exception):
+    """Raised when ballots cannot be inserted since concurrent submissions keep colliding with them"""
+
+
+class LotteryAlreadyDrawnException(Exception):
+    """Raised when a lottery day already has a draw result"""
+
+
+class InvalidTokenException(Exception):
+    """Raised when an access token is malformed, tampered, expired or revoked"""
+
+
+class SchemaMigrationException(Exception):
+    """Raised when the DB is left in a state its schema cannot be safely migrated from"""
+
+
 def catch_exceptions():
     def catch_exceptions_decorator(job_func):
         @functools.wraps(job_func)
@@ -14,20 +14,31 @@ Implementation of Lottery Backend application initialization
 #                                                                              #
 # -----------------------------------------------------------------------------#
 """
+import typing
+
 import structlog
 from fastapi import FastAPI
-from sqlmodel import SQLModel
 from starlette.middleware.cors import CORSMiddleware
 from starlette.requests import Request
 from starlette.responses import JSONResponse
+from starlette.responses import PlainTextResponse
 from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
 
-from lottery_backend.database import engine
+from lottery_backend import database
+from lottery_backend.async_database import async_engine
+from lottery_backend.ballot_buffer import ballot_buffer
+from lottery_backend.ballot_filter import ballot_filters
+from lottery_backend.cache import winner_cache
 from lottery_backend.exceptions import BadRequestException
 from lottery_backend.lottery_processor import LotteryProcessor
+from lottery_backend.metrics import MetricsMiddleware
+from lottery_backend.metrics import instrument_engine
+from lottery_backend.metrics import render_metrics
+from lottery_backend.migrations import initialize_database
 from lottery_backend.routers import auth
 from lottery_backend.routers import ballot
 from lottery_backend.routers import user
+from lottery_backend.settings import settings
 
 LOGGER = structlog.get_logger()
 app = FastAPI(title="Lottery Service")
@@ -49,13 +60,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)  # outermost, so the latency covers the other middlewares as well
+instrument_engine(database.engine)
+instrument_engine(async_engine.sync_engine)
 
 
 @app.on_event("startup")
 def on_startup() -> None:
     """Executed when application is starting."""
     LOGGER.info("Lottery Backend Service is starting up...")
-    SQLModel.metadata.create_all(engine)
+    initialize_database(database.engine)
+    if settings.ballot_buffer_enabled:
+        ballot_buffer.start()
     lottery_processor.start()
 
 
@@ -65,6 +81,7 @@ def on_shutdown() -> None:
     LOGGER.info("Lottery Backend Service is shutting down...")
     lottery_processor.stop()
     lottery_processor.join()  # wait for threads to finish their execution!
+    ballot_buffer.stop()  # writes the queued ballots
 
 
 @app.exception_handler(BadRequestException)
@@ -73,3 +90,35 @@ async def unicorn_exception_handler(request: Request, exc: BadRequestException):
         status_code=HTTP_422_UNPROCESSABLE_ENTITY,
         content={"message": "Bad Request"},
     )
+
+
+@app.get("/stats")
+async def stats() -> typing.Dict[str, typing.Any]:
+    """
+    Returns the counters of the in-process caches & ballot filters and the metrics of the last draw,
+    to be scraped by monitoring
+
+    Returns:
+
+        counters of each cache, memory footprint & false positive rates of the ballot filters,
+        duration, rows & lock wait of each phase of the last draw run by this process
+    """
+    last_draw_metrics = lottery_processor.last_draw_metrics
+    return {
+        "winner_cache": winner_cache.stats(),
+        "ballot_filter": ballot_filters.stats(),
+        "last_draw": last_draw_metrics.as_dict() if last_draw_metrics else None,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """
+    Returns the latency of each route and the DB queries run by its requests in the Prometheus text format
+
+    Returns:
+
+        histograms of the request latency, the number of DB queries & the DB time per request of each route,
+        and the counters of the requests & all the DB queries
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -14,68 +14,326 @@ Implementation of Lottery Processor class having a scheduled task to draw lotter
 #                                                                              #
 # -----------------------------------------------------------------------------#
 """
+import concurrent.futures
 import datetime
+import os
 import random
+import secrets
+import socket
 import threading
 import time
+import typing
+import uuid
 
-import schedule
 import structlog
+from sqlmodel import Session
 
+from lottery_backend.ballot_buffer import ballot_buffer
+from lottery_backend.ballot_filter import ballot_filters
+from lottery_backend.cache import winner_cache
+from lottery_backend.database import acquire_draw_lease
+from lottery_backend.database import add_draw_result
 from lottery_backend.database import clear_ballots_on_date
+from lottery_backend.database import count_ballots_for_date
+from lottery_backend.database import delete_ballot_chunk
+from lottery_backend.database import get_ballot_at_offset
 from lottery_backend.database import get_ballots_for_date
+from lottery_backend.database import get_draw_result
+from lottery_backend.database import get_open_lottery_dates
+from lottery_backend.database import get_undrawn_lottery_dates
+from lottery_backend.database import get_unpurged_lottery_dates
+from lottery_backend.database import lock_for_write
+from lottery_backend.database import release_draw_lease
+from lottery_backend.database import session_scope
+from lottery_backend.database import stream_ballots_for_date
+from lottery_backend.draw_metrics import DrawMetrics
+from lottery_backend.draw_metrics import DrawPhase
 from lottery_backend.exceptions import catch_exceptions
+from lottery_backend.scheduler import DailyScheduler
+from lottery_backend.settings import settings
 
 LOGGER = structlog.get_logger()
-THREAD_SLEEP_TIME = 1  # seconds
+DRAW_TIME = datetime.time(0, 0)  # lottery of a day is drawn at the following midnight
+INITIAL_PURGE_CHUNK_SIZE = 1000  # the purge starts small and grows its chunks while they stay under the ceiling
+MIN_PURGE_CHUNK_SIZE = 100
+
+
+def select_winner_from_list(date: datetime.date, ballot_count: int, session: Session) -> typing.Optional[str]:
+    """
+    Loads all the ballots of the day into memory and picks one of them randomly
+
+    Args:
+        date: lottery day to draw
+        ballot_count: number of ballots of the day, unused
+        session: session for DB connection
+
+    Returns:
+        the winning ballot, None if there is no ballot on the day
+    """
+    ballots = get_ballots_for_date(date=date, session=session)
+    if not ballots:
+        return None
+    return random.choice(ballots)
+
+
+def select_winner_by_offset(date: datetime.date, ballot_count: int, session: Session) -> typing.Optional[str]:
+    """
+    Fetches only the ballot at a uniformly random position among the counted ones through the index,
+    so memory usage is constant regardless of the number of ballots
+
+    Args:
+        date: lottery day to draw
+        ballot_count: number of ballots of the day
+        session: session for DB connection
+
+    Returns:
+        the winning ballot, None if there is no ballot on the day
+    """
+    if not ballot_count:
+        return None
+    return get_ballot_at_offset(date=date, offset=secrets.randbelow(ballot_count), session=session)
+
+
+def select_winner_by_reservoir(date: datetime.date, ballot_count: int, session: Session) -> typing.Optional[str]:
+    """
+    Streams the ballots of the day and keeps a single one by reservoir sampling.
+    Fallback for DB backends where skipping to an offset is not cheap.
+
+    Args:
+        date: lottery day to draw
+        ballot_count: number of ballots of the day, unused
+        session: session for DB connection
+
+    Returns:
+        the winning ballot, None if there is no ballot on the day
+    """
+    winning_ballot = None
+    for index, ballot in enumerate(stream_ballots_for_date(date=date, session=session)):
+        if secrets.randbelow(index + 1) == 0:  # the ballot replaces the current pick with probability 1/(index+1)
+            winning_ballot = ballot
+    return winning_ballot
+
+
+DRAW_STRATEGIES: typing.Dict[str, typing.Callable[[datetime.date, int, Session], typing.Optional[str]]] = {
+    "list": select_winner_from_list,
+    "offset": select_winner_by_offset,
+    "reservoir": select_winner_by_reservoir,
+}
 
 
 class LotteryProcessor(threading.Thread):
     """Thread-based class to executed a scheduled task in the background."""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        draw_strategy: typing.Optional[str] = None,
+        clock: typing.Callable[[], datetime.datetime] = datetime.datetime.now,
+        draw_enabled: typing.Optional[bool] = None,
+    ) -> None:
         """
         Initializes the LotteryProcessor object
+
+        Args:
+            draw_strategy: name of the winner selection strategy in DRAW_STRATEGIES, taken from settings if omitted
+            clock: wall-clock time source, replaced by the tests to drive the time deterministically
+            draw_enabled: whether the processor draws the lottery days, taken from settings if omitted.
+                Otherwise it only maintains the ballot filters, e.g. in the workers of the production server.
         """
-        super().__init__()
-        self.stop_requested = False
-        schedule.every(1).day.at("00:00").do(self._draw_lottery)
+        super().__init__(name="lottery-processor")
+        self.clock = clock
+        self.draw_enabled = settings.draw_enabled if draw_enabled is None else draw_enabled
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"  # owner of the draw leases
+        self.select_winner = DRAW_STRATEGIES[draw_strategy or settings.draw_strategy]
+        self.last_draw_metrics: typing.Optional[DrawMetrics] = None
+        self.scheduler = DailyScheduler(clock)
+        self.scheduler.every_day_at(DRAW_TIME, self._draw_lottery)
+
+    @property
+    def stop_requested(self) -> bool:
+        """Whether the processor is asked to stop its execution"""
+        return self.scheduler.stop_requested
 
     def stop(self) -> None:
-        """Sets the member variable flag to stop execution"""
-        self.stop_requested = True
+        """Asks the scheduler to exit, the thread stops without waiting for the next draw"""
+        self.scheduler.stop()
         LOGGER.info("Lottery Processor is asked to stop its execution!")
 
     def run(self) -> None:
         """
-        Periodically executes the pending scheduled tasks
+        Sleeps until the next draw is due and runs it, until the processor is stopped
         """
-        LOGGER.info(
-            "Starting thread to periodically run the pending scheduled tasks in the background."
-        )
-        while not self.stop_requested:
-            schedule.run_pending()
-            time.sleep(THREAD_SLEEP_TIME)
-
-        LOGGER.info(
-            "Thread existed from the while loop! Cancelling te scheduled task..."
-        )
-        schedule.clear()  # cancels/removes any scheduled task
+        if self.draw_enabled:
+            LOGGER.info(f"Starting thread to draw the lottery at {DRAW_TIME} every day in the background.")
+            self.catch_up_missed_draws()
+            self.resume_interrupted_purges()
+        else:
+            LOGGER.info("Starting thread to maintain the ballot filters, the lottery is drawn by another process.")
+        self.track_open_lottery_days()
+        self.scheduler.run()
+        LOGGER.info("Thread exited from the scheduler, the scheduled draw is cancelled.")
 
-    @classmethod
     @catch_exceptions()
-    def _draw_lottery(cls) -> None:
+    def _draw_lottery(self) -> None:
         """
         Performs lottery draw for the completed day since lottery is drawn at midnight
         """
-        previous_day = datetime.datetime.now().date() - datetime.timedelta(days=1)
-        ballots = get_ballots_for_date(date=previous_day)
-        if not ballots:
-            LOGGER.warning(
-                "For a lottery to be drawn, at least one ballot should exist!"
-            )
+        previous_day = self.clock().date() - datetime.timedelta(days=1)
+        if self.draw_enabled:
+            self.draw_lottery_for_date(previous_day)
+            self.resume_interrupted_purges()  # e.g. the lease of a day was still held by a dead worker on startup
+        else:
+            ballot_filters.drop(previous_day)  # no ballot is accepted for the day anymore
+        self.track_open_lottery_days()  # e.g. a day getting its first ballot after the startup
+
+    def catch_up_missed_draws(self) -> typing.List[datetime.date]:
+        """
+        Draws the past lottery days which still have ballots but no draw result, e.g. the service was down at midnight.
+        The days are independent, so they are drawn concurrently by a bounded number of threads.
+
+        Returns:
+            the days drawn successfully
+        """
+        missed_dates = get_undrawn_lottery_dates(before=self.clock().date())
+        if not missed_dates:
+            return []
+        LOGGER.warning(
+            f"{len(missed_dates)} missed lottery days are found from {missed_dates[0]} to {missed_dates[-1]}",
+        )
+        drawn_dates: typing.List[datetime.date] = []
+        max_workers = max(1, min(settings.draw_catch_up_workers, len(missed_dates)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="draw-catch-up") as executor:
+            futures = {executor.submit(self.draw_lottery_for_date, date): date for date in missed_dates}
+            for completed, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+                date = futures[future]
+                try:
+                    future.result()
+                except Exception as exc:  # noqa: B902 the other days are still drawn, the failed one on next startup
+                    LOGGER.exception(f"Missed draw of the day:'{date}' failed: {exc}")
+                else:
+                    drawn_dates.append(date)
+                LOGGER.info(f"Catching up the missed draws: {completed}/{len(missed_dates)} days are processed")
+        return sorted(drawn_dates)
+
+    def resume_interrupted_purges(self) -> typing.List[datetime.date]:
+        """
+        Deletes the losing ballots left on the drawn days whose purge is interrupted, e.g. the service stopped
+        while purging. The lease of a day is taken first, so a purge still running in another worker is skipped.
+
+        Returns:
+            the days purged successfully
+        """
+        purged_dates: typing.List[datetime.date] = []
+        for date in get_unpurged_lottery_dates(before=self.clock().date()):
+            if not acquire_draw_lease(date=date, owner=self.worker_id, ttl=settings.draw_lease_ttl):
+                LOGGER.info(f"Ballots of the day:'{date}' are being purged by another worker, skipping it")
+                continue
+            LOGGER.warning(f"Resuming the interrupted purge of the ballots of the day:'{date}'")
+            try:
+                with session_scope() as session:
+                    draw_result = get_draw_result(date=date, session=session)
+                    with DrawMetrics(date).phase("purge") as phase:
+                        self._purge_ballots(date, draw_result.ballot, session, phase)
+            except Exception as exc:  # noqa: B902 the other days are still purged, the failed one later
+                LOGGER.exception(f"Resumed purge of the day:'{date}' failed: {exc}")
+            else:
+                purged_dates.append(date)
+            finally:
+                release_draw_lease(date=date, owner=self.worker_id)
+        return purged_dates
+
+    def track_open_lottery_days(self) -> None:
+        """
+        Loads the ballot filters of today and the following days having ballots, unless they are already tracked
+        """
+        if not settings.ballot_filter_enabled:
             return
-        winning_ballot = random.choice(ballots)
-        LOGGER.info(f"Winning ballot for the day:'{previous_day}' is {winning_ballot}")
-        clear_ballots_on_date(date=previous_day, exception_ballot=winning_ballot)
+        today = self.clock().date()
+        with session_scope() as session:
+            for date in sorted({today, *get_open_lottery_dates(from_date=today, session=session)}):
+                if not ballot_filters.is_tracked(date):
+                    ballot_filters.track(date, stream_ballots_for_date(date=date, session=session))
+
+    @staticmethod
+    def _purge_ballots(date: datetime.date, winning_ballot: str, session: Session, phase: DrawPhase) -> None:
+        """
+        Deletes the ballots of the drawn day except the winning one, chunk by chunk in separate transactions.
+        The chunk size adapts so that a chunk holds the write lock of the DB shorter than the latency ceiling,
+        and the purge pauses between the chunks so that the submissions waiting for the lock get it.
+
+        Args:
+            date: lottery day drawn
+            winning_ballot: 16-digit string, it is not deleted
+            session: session for DB connection
+            phase: metrics of the purge phase
+        """
+        max_chunk_size = settings.purge_chunk_size
+        ceiling = settings.draw_purge_latency_ceiling
+        if max_chunk_size <= 0:  # a single statement
+            phase.lock_wait = lock_for_write(session)
+            phase.rows = clear_ballots_on_date(date=date, exception_ballot=winning_ballot, session=session)
+            return
+        chunk_size = min(max_chunk_size, INITIAL_PURGE_CHUNK_SIZE) if ceiling > 0 else max_chunk_size
+        while True:
+            phase.lock_wait += lock_for_write(session)
+            start = time.perf_counter()
+            deleted_count = delete_ballot_chunk(date, winning_ballot, chunk_size, session=session)
+            lock_time = time.perf_counter() - start
+            phase.rows += deleted_count
+            if deleted_count < chunk_size:
+                break
+            if ceiling > 0 and lock_time > ceiling:
+                chunk_size = max(chunk_size // 2, MIN_PURGE_CHUNK_SIZE)
+            elif ceiling > 0 and lock_time < ceiling / 2:
+                chunk_size = min(chunk_size * 2, max_chunk_size)
+            time.sleep(settings.draw_purge_pause)  # yields the write lock to the waiting submissions
+        LOGGER.info(f"{phase.rows} ballots on {date} are deleted from DB!")
+
+    def draw_lottery_for_date(self, date: datetime.date) -> typing.Optional[str]:
+        """
+        Picks the winning ballot of the lottery day, records it as the draw result and removes the other ballots.
+        The draw uses its own session which is closed afterwards, nothing is kept in memory among draws.
+        Each worker process runs a processor, the lease of the day makes sure that only one of them draws it.
+
+        Args:
+            date: lottery day to draw
+
+        Returns:
+            the winning ballot if the day is drawn by this processor, None otherwise
+        """
+        ballot_buffer.flush()  # ballots submitted right before midnight may still be queued
+        ballot_filters.drop(date)  # no ballot is accepted for the day anymore
+        if get_draw_result(date=date):  # cheap check before competing for the lease
+            LOGGER.warning(f"Lottery for the day:'{date}' is already drawn!")
+            return None
+        if not acquire_draw_lease(date=date, owner=self.worker_id, ttl=settings.draw_lease_ttl):
+            LOGGER.info(f"Lottery for the day:'{date}' is being drawn by another worker, skipping it")
+            return None
+        metrics = DrawMetrics(date)
+        try:
+            with session_scope() as session:
+                if get_draw_result(date=date, session=session):  # drawn by another worker before the lease is taken
+                    LOGGER.warning(f"Lottery for the day:'{date}' is already drawn!")
+                    return None
+                with metrics.phase("snapshot") as phase:
+                    ballot_count = phase.rows = count_ballots_for_date(date=date, session=session)
+                with metrics.phase("select") as phase:
+                    winning_ballot = self.select_winner(date, ballot_count, session) if ballot_count else None
+                    phase.rows = int(winning_ballot is not None)
+                if not winning_ballot:
+                    LOGGER.warning(
+                        "For a lottery to be drawn, at least one ballot should exist!"
+                    )
+                    return None
+                LOGGER.info(f"Winning ballot for the day:'{date}' is {winning_ballot}")
+                with metrics.phase("persist") as phase:
+                    phase.lock_wait = lock_for_write(session)
+                    add_draw_result(date=date, ballot=winning_ballot, ballot_count=ballot_count, session=session)
+                    phase.rows = 1
+                winner_cache.put(date, winning_ballot)  # warm the cache for the clients polling the winner
+                with metrics.phase("purge") as phase:
+                    self._purge_ballots(date, winning_ballot, session, phase)
+        finally:
+            release_draw_lease(date=date, owner=self.worker_id)
+        self.last_draw_metrics = metrics
         LOGGER.info("Lottery draw is completed successfully...")
+        return winning_ballot
@@ -6,6 +6,10 @@
 # -----------------------------------------------------------------------------#
 Description  :
 Entry point for Lottery Backend application.
+By default, the service runs as a single development process restarted on code changes.
+"--production" (or "--workers") runs a production server of a worker process per CPU core sharing the listening
+socket instead, the daily draw is scheduled in its main process only and the workers just serve the requests.
+"--profile-startup" measures the cold start of a worker step by step and exits.
 
 # -----------------------------------------------------------------------------#
 #                                                                              #
@@ -14,16 +18,193 @@ Entry point for Lottery Backend application.
 #                                                                              #
 # -----------------------------------------------------------------------------#
 """
+import argparse
+import asyncio
+import importlib
+import importlib.util
+import os
 import sys
+import time
+import typing
 
+import structlog
 import uvicorn
 
+APP = "lottery_backend.lottery:app"
+# modules imported one after another by the startup profile, each is timed without the ones imported before it
+STARTUP_PROFILE_MODULES = (
+    "fastapi",
+    "sqlmodel",
+    "lottery_backend.settings",
+    "lottery_backend.db_models.user",
+    "lottery_backend.database",
+    "lottery_backend.routers.ballot",
+    "lottery_backend.lottery",
+)
+LOGGER = structlog.get_logger()
 
-def main() -> None:
+
+def parse_args(argv: typing.Optional[typing.List[str]] = None) -> argparse.Namespace:
+    """
+    Parses the command line arguments
+
+    Args:
+        argv: arguments, taken from sys.argv if omitted
+
+    Returns:
+        the parsed arguments
+    """
+    parser = argparse.ArgumentParser(prog="lottery_backend", description="Runs the Lottery Backend Service")
+    parser.add_argument("--host", default="0.0.0.0", help="address to bind (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8000, help="port to bind (default: %(default)s)")
+    parser.add_argument(
+        "--production",
+        action="store_true",
+        help="production server of several worker processes instead of the development one restarted on code changes",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help=f"worker processes of the production server, implies --production (default: CPU cores, {os.cpu_count()})",
+    )
+    parser.add_argument(
+        "--backlog", type=int, default=4096, help="max pending connections of the socket (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--timeout-keep-alive",
+        type=int,
+        default=65,
+        help="seconds an idle connection is kept open, longer than the idle timeout of a load balancer "
+        "in front of the service (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--timeout-graceful-shutdown",
+        type=int,
+        default=30,
+        help="seconds the in-flight requests are given to complete on shutdown (default: %(default)s)",
+    )
+    parser.add_argument("--no-access-log", action="store_true", help="disables the log line of each request")
+    parser.add_argument(
+        "--profile-startup", action="store_true", help="prints the duration of each cold start step of a worker",
+    )
+    return parser.parse_args(argv)
+
+
+def get_event_loop_and_http_parser() -> typing.Tuple[str, str]:
+    """
+    Picks the fastest event loop & HTTP parser installed
+
+    Returns:
+        "uvloop" if it is installed ("asyncio" otherwise) and "httptools" if it is installed ("h11" otherwise)
+    """
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    return loop, http
+
+
+def run_server(args: argparse.Namespace) -> None:
+    """
+    Runs the production server. A single worker serves the requests and draws the lottery in the same process.
+    Otherwise the workers serve the requests and the main process draws the lottery. The workers are spawned
+    processes importing the application, so they are configured via environment variables.
+
+    Args:
+        args: command line arguments
     """
-    Main function, prints the version of the library. Can be called from the terminal.
+    workers = args.workers or os.cpu_count() or 1
+    loop, http = get_event_loop_and_http_parser()
+    LOGGER.info(f"Starting {workers} workers on {args.host}:{args.port} with the {loop} loop & {http} parser")
+    options = {
+        "host": args.host,
+        "port": args.port,
+        "workers": workers,
+        "loop": loop,
+        "http": http,
+        "backlog": args.backlog,
+        "timeout_keep_alive": args.timeout_keep_alive,
+        "timeout_graceful_shutdown": args.timeout_graceful_shutdown,
+        "access_log": not args.no_access_log,
+    }
+    if workers <= 1:
+        uvicorn.run(APP, **options)
+        return
+
+    # imported here, only the main process drawing the lottery among several workers needs the DB layer
+    from lottery_backend import database
+    from lottery_backend.lottery_processor import LotteryProcessor
+    from lottery_backend.migrations import initialize_database
+    from lottery_backend.settings import settings
+
+    if "LOTTERY_SECRET_KEY" not in os.environ:
+        LOGGER.warning("LOTTERY_SECRET_KEY is not set, the access tokens are invalidated on restart")
+        os.environ["LOTTERY_SECRET_KEY"] = settings.secret_key  # a token issued by a worker is valid on the others
+    os.environ["LOTTERY_DRAW_ENABLED"] = "false"  # the workers only maintain their ballot filters
+    # the revoked tokens are kept in the memory of the worker handling the logout
+    LOGGER.warning("A logged out access token is still accepted by the other workers until its expiry")
+    if settings.ballot_buffer_enabled:
+        # the draw of the main process cannot flush the queues of the workers, a queued ballot would miss it
+        LOGGER.warning("The ballot buffer is disabled since the lottery is drawn outside of the workers")
+        os.environ["LOTTERY_BALLOT_BUFFER_ENABLED"] = "false"
+    settings.ballot_filter_enabled = False  # the main process accepts no ballot, its filters would never be used
+    initialize_database(database.engine)  # once, before the workers start
+    lottery_processor = LotteryProcessor()
+    lottery_processor.start()
+    try:
+        uvicorn.run(APP, **options)  # returns once the workers exit on SIGINT/SIGTERM
+    finally:
+        lottery_processor.stop()
+        lottery_processor.join()
+
+
+def profile_startup() -> typing.List[typing.Tuple[str, float]]:
+    """
+    Measures the cold start of a worker of the production server: the imports, the startup & shutdown of the
+    application, then the password hashing deferred to the first login. Nothing is drawn, as in a worker.
+    The modules imported already (e.g. by the caller) are measured as taking no time.
+
+    Returns:
+        name & duration in seconds of each step in the order they are run
+    """
+    os.environ["LOTTERY_DRAW_ENABLED"] = "false"
+    timings: typing.List[typing.Tuple[str, float]] = []
+    for module_name in STARTUP_PROFILE_MODULES:
+        start = time.perf_counter()
+        importlib.import_module(module_name)
+        timings.append((f"import {module_name}", time.perf_counter() - start))
+
+    from lottery_backend.db_models.user import get_password_context
+    from lottery_backend.lottery import app
+
+    async def run_lifespan() -> None:
+        for name, handler in (("startup", app.router.startup), ("shutdown", app.router.shutdown)):
+            start = time.perf_counter()
+            await handler()
+            timings.append((f"application {name}", time.perf_counter() - start))
+
+    asyncio.run(run_lifespan())
+    start = time.perf_counter()
+    get_password_context().handler().get_backend()  # loads bcrypt without hashing
+    timings.append(("password hashing (deferred to the first login)", time.perf_counter() - start))
+    return timings
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> None:
+    """
+    Main function, runs the service. Can be called from the terminal.
+
+    Args:
+        argv: command line arguments, taken from sys.argv if omitted
     """
-    uvicorn.run("lottery_backend.lottery:app", reload=True, host="0.0.0.0")
+    args = parse_args(argv)
+    if args.profile_startup:
+        timings = profile_startup()
+        for name, duration in timings:
+            print(f"{name:<45}{duration * 1000:10.1f} ms")
+        print(f"{'total':<45}{sum(duration for _, duration in timings) * 1000:10.1f} ms")
+    elif args.production or args.workers is not None:
+        run_server(args)
+    else:
+        uvicorn.run(APP, reload=True, host=args.host, port=args.port)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,328 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Implementation of the in-process request metrics exposed in the Prometheus text format:
+latency of each route, and the number & duration of the DB queries run by each request.
+The queries are attributed to the request running them via a context variable, which follows the request
+into the threads & greenlets the DB calls run in.
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import bisect
+import contextvars
+import threading
+import time
+import typing
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 10, 20, 50, 100)
+UNMATCHED_ROUTE = "unmatched"  # requests not routed to an endpoint share a label, e.g. 404s
+Labels = typing.Tuple[typing.Tuple[str, str], ...]
+
+
+class _QueryStats:
+    """Number & duration of the DB queries run by a request"""
+
+    def __init__(self) -> None:
+        """
+        Initializes the _QueryStats object
+        """
+        self.count = 0
+        self.duration = 0.0
+
+
+_request_query_stats: "contextvars.ContextVar[typing.Optional[_QueryStats]]" = contextvars.ContextVar(
+    "request_query_stats", default=None,
+)
+
+
+class Histogram:
+    """Thread-safe cumulative histogram of a metric per label set, as Prometheus expects it"""
+
+    def __init__(self, name: str, description: str, buckets: typing.Sequence[float]) -> None:
+        """
+        Initializes the Histogram object
+
+        Args:
+            name: metric name
+            description: help text of the metric
+            buckets: upper bounds of the buckets in ascending order, +Inf is implicit
+        """
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._series: typing.Dict[Labels, typing.List[float]] = {}  # bucket counts incl. +Inf, the sum & the count
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Labels, value: float) -> None:
+        """
+        Records a value
+
+        Args:
+            labels: label names & values of the series
+            value: observed value
+        """
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 3)
+            series[bisect.bisect_left(self.buckets, value)] += 1  # the bucket of the largest bound is +Inf
+            series[-2] += value
+            series[-1] += 1
+
+    def get_count(self, labels: Labels) -> int:
+        """
+        Returns the number of the values recorded for the series, 0 if there is none
+        """
+        with self._lock:
+            series = self._series.get(labels)
+            return int(series[-1]) if series else 0
+
+    def get_sum(self, labels: Labels) -> float:
+        """
+        Returns the sum of the values recorded for the series, 0 if there is none
+        """
+        with self._lock:
+            series = self._series.get(labels)
+            return series[-2] if series else 0
+
+    def clear(self) -> None:
+        """Removes all the series"""
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> typing.List[str]:
+        """
+        Renders the histogram in the Prometheus text format
+
+        Returns:
+            lines of the metric
+        """
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series_items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in series_items:
+            cumulative_count = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), series):
+                cumulative_count += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels((*labels, ('le', str(bound))))} {cumulative_count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {int(series[-1])}")
+        return lines
+
+
+class Counter:
+    """Thread-safe counter of a metric per label set"""
+
+    def __init__(self, name: str, description: str) -> None:
+        """
+        Initializes the Counter object
+
+        Args:
+            name: metric name, ending with "_total"
+            description: help text of the metric
+        """
+        self.name = name
+        self.description = description
+        self._values: typing.Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Labels, amount: float = 1) -> None:
+        """
+        Increments the counter
+
+        Args:
+            labels: label names & values of the series
+            amount: increment
+        """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, labels: Labels) -> float:
+        """
+        Returns the value of the series, 0 if there is none
+        """
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def clear(self) -> None:
+        """Removes all the series"""
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> typing.List[str]:
+        """
+        Renders the counter in the Prometheus text format
+
+        Returns:
+            lines of the metric
+        """
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_format_labels(labels)} {value}" for labels, value in values)
+        return lines
+
+
+request_duration = Histogram(
+    "lottery_http_request_duration_seconds", "Latency of the HTTP requests per route", LATENCY_BUCKETS,
+)
+requests_total = Counter("lottery_http_requests_total", "Number of the HTTP requests per route and status code")
+request_queries = Histogram(
+    "lottery_http_request_db_queries", "Number of the DB queries run by an HTTP request per route", QUERY_COUNT_BUCKETS,
+)
+request_query_duration = Histogram(
+    "lottery_http_request_db_query_duration_seconds",
+    "Time spent in the DB queries by an HTTP request per route",
+    LATENCY_BUCKETS,
+)
+queries_total = Counter("lottery_db_queries_total", "Number of the DB queries, including the background ones")
+query_seconds_total = Counter(
+    "lottery_db_query_duration_seconds_total", "Time spent in the DB queries, including the background ones",
+)
+METRICS = (
+    request_duration, requests_total, request_queries, request_query_duration, queries_total, query_seconds_total,
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency and the DB queries of each HTTP request per route"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        """
+        Initializes the MetricsMiddleware object
+
+        Args:
+            app: the wrapped ASGI application
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Serves the request and records its metrics once the response is sent
+
+        Args:
+            scope: ASGI connection scope
+            receive: ASGI receive channel
+            send: ASGI send channel
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500  # unless the application starts a response
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        query_stats = _QueryStats()
+        token = _request_query_stats.set(query_stats)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            _request_query_stats.reset(token)
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)  # the route is set into the scope by routing
+            labels = (("method", scope["method"]), ("route", route))
+            request_duration.observe(labels, duration)
+            requests_total.inc((*labels, ("status", str(status_code))))
+            request_queries.observe(labels, query_stats.count)
+            request_query_duration.observe(labels, query_stats.duration)
+
+
+def instrument_engine(db_engine: Engine) -> None:
+    """
+    Counts & times the queries run on the engine, attributing them to the HTTP request running them if any
+
+    Args:
+        db_engine: engine to instrument, the sync_engine of an async engine
+    """
+    if event.contains(db_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(db_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(db_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def render_metrics() -> str:
+    """
+    Renders all the metrics in the Prometheus text format
+
+    Returns:
+        the exposition text
+    """
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+def clear_metrics() -> None:
+    """Removes all the recorded series, e.g. between tests"""
+    for metric in METRICS:
+        metric.clear()
+
+
+def _before_cursor_execute(  # noqa: WPS211
+    connection: typing.Any,
+    cursor: typing.Any,
+    statement: str,
+    parameters: typing.Any,
+    context: typing.Any,
+    executemany: bool,
+) -> None:
+    """Records the start time of the query on the connection"""
+    connection.info.setdefault("query_start_times", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(  # noqa: WPS211
+    connection: typing.Any,
+    cursor: typing.Any,
+    statement: str,
+    parameters: typing.Any,
+    context: typing.Any,
+    executemany: bool,
+) -> None:
+    """Records the query into the global counters and the stats of the running request"""
+    duration = time.perf_counter() - connection.info["query_start_times"].pop()
+    queries_total.inc(())
+    query_seconds_total.inc((), duration)
+    query_stats = _request_query_stats.get()
+    if query_stats:
+        query_stats.count += 1
+        query_stats.duration += duration
+
+
+def _format_labels(labels: Labels) -> str:
+    """
+    Formats the labels of a series, e.g. {method="GET",route="/stats"}
+
+    Args:
+        labels: label names & values
+
+    Returns:
+        the formatted labels, an empty string if there is none
+    """
+    if not labels:
+        return ""
+    formatted = (
+        '{0}="{1}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(formatted) + "}"
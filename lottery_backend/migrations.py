@@ -0,0 +1,167 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Implementation of the DB schema creation and the migrations of already existing DB files.
+The applied schema version is kept in SQLite's "user_version" pragma.
+The schema creation & all the migrations run in a single transaction, so an interrupted run leaves the DB as it was.
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import typing
+
+import structlog
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.engine import Engine
+from sqlmodel import SQLModel
+
+from lottery_backend.exceptions import SchemaMigrationException
+
+LOGGER = structlog.get_logger()
+
+
+def _add_unique_ballot_index(connection: Connection) -> None:
+    """
+    Removes the duplicated ballots of a day (keeping the first submission) and adds the unique (date, ballot) index
+
+    Args:
+        connection: DB connection within the migration transaction
+    """
+    removed = connection.exec_driver_sql(
+        "DELETE FROM userballot WHERE id NOT IN (SELECT MIN(id) FROM userballot GROUP BY date, ballot)",
+    ).rowcount
+    LOGGER.info(f"{removed} duplicated ballots are removed before adding the unique index")
+    connection.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_userballot_date_ballot ON userballot (date, ballot)",
+    )
+
+
+def _backfill_draw_results(connection: Connection) -> None:
+    """
+    Records the draw results of the days drawn before the DrawResult table existed.
+    Those are the past days having a single ballot left, the ballot count of such draws is unknown.
+
+    Args:
+        connection: DB connection within the migration transaction
+    """
+    backfilled = connection.exec_driver_sql(
+        "INSERT OR IGNORE INTO drawresult (date, ballot, user_id, ballot_count, drawn_at) "
+        "SELECT date, MIN(ballot), MIN(user_id), NULL, DATETIME(date, '+1 day') FROM userballot "
+        "WHERE date < DATE('now', 'localtime') GROUP BY date HAVING COUNT(*) = 1",
+    ).rowcount
+    LOGGER.info(f"{backfilled} draw results are backfilled from the already drawn days")
+
+
+def _store_ballots_as_integers(connection: Connection) -> None:
+    """
+    Rebuilds the UserBallot table with the ballots stored as 64-bit integers instead of 16-digit strings.
+    SQLite cannot change the type of a column, so the rows are copied into a new table.
+
+    Args:
+        connection: DB connection within the migration transaction
+    """
+    connection.exec_driver_sql("DROP INDEX IF EXISTS ix_userballot_date_ballot")
+    connection.exec_driver_sql("ALTER TABLE userballot RENAME TO userballot_legacy")
+    connection.exec_driver_sql(
+        "CREATE TABLE userballot (id INTEGER NOT NULL, user_id INTEGER NOT NULL, ballot BIGINT NOT NULL, "
+        "date DATE NOT NULL, PRIMARY KEY (id))",
+    )
+    converted = connection.exec_driver_sql(
+        "INSERT INTO userballot (id, user_id, ballot, date) "
+        "SELECT id, user_id, CAST(ballot AS INTEGER), date FROM userballot_legacy",
+    ).rowcount
+    connection.exec_driver_sql("DROP TABLE userballot_legacy")
+    connection.exec_driver_sql("CREATE UNIQUE INDEX ix_userballot_date_ballot ON userballot (date, ballot)")
+    LOGGER.info(f"{converted} ballots are converted to integers")
+
+
+def _add_user_ballot_index(connection: Connection) -> None:
+    """
+    Adds the (user_id, date, ballot) index to list the ballots of a user on a day without scanning the day
+
+    Args:
+        connection: DB connection within the migration transaction
+    """
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_userballot_user_id_date_ballot ON userballot (user_id, date, ballot)",
+    )
+
+
+def _add_draw_lease_table(connection: Connection) -> None:
+    """
+    Adds the DrawLease table, the DBs at the latest schema version are not checked for missing tables on startup
+
+    Args:
+        connection: DB connection within the migration transaction
+    """
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS drawlease (date DATE NOT NULL, owner VARCHAR NOT NULL, "
+        "expires_at DATETIME NOT NULL, PRIMARY KEY (date))",
+    )
+
+
+# Migrations are applied in order, the schema version of a DB is the number of migrations applied on it.
+# A new table needs a migration as well, since the tables are created only for the DBs behind the latest version.
+MIGRATIONS: typing.List[typing.Callable[[Connection], None]] = [
+    _add_unique_ballot_index,
+    _backfill_draw_results,
+    _store_ballots_as_integers,
+    _add_user_ballot_index,
+    _add_draw_lease_table,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(connection: Connection) -> int:
+    """
+    Reads the schema version of the DB
+
+    Args:
+        connection: DB connection
+
+    Returns:
+        number of the migrations applied on the DB
+    """
+    return connection.exec_driver_sql("PRAGMA user_version").scalar() or 0
+
+
+def initialize_database(engine: Engine) -> None:
+    """
+    Creates the missing tables and brings an existing DB up to the latest schema version.
+    A DB already at the latest version is left as is after reading its version, so that a restart is cheap.
+
+    Args:
+        engine: DB engine to initialize
+    """
+    with engine.connect() as connection:
+        if inspect(connection).has_table("userballot_legacy"):
+            raise SchemaMigrationException(
+                "Table 'userballot_legacy' left by an interrupted migration holds the ballots, "
+                "restore the DB from a backup or rename the table back to 'userballot'",
+            )
+        if get_schema_version(connection) == SCHEMA_VERSION:
+            return
+    with engine.begin() as connection:
+        # pysqlite starts a transaction only before the first DML statement, so the DDL statements would be
+        # committed one by one. An explicit one commits the DDL, the data & the schema version together.
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        is_new_database = not inspect(connection).has_table("userballot")
+        SQLModel.metadata.create_all(connection)
+        if is_new_database:  # tables are created with the latest schema already
+            connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            LOGGER.info(f"DB is created with schema version {SCHEMA_VERSION}")
+            return
+        current_version = get_schema_version(connection)
+        for version in range(current_version, SCHEMA_VERSION):
+            LOGGER.info(f"Migrating DB schema from version {version} to {version + 1}...")
+            MIGRATIONS[version](connection)
+            connection.exec_driver_sql(f"PRAGMA user_version = {version + 1}")
@@ -0,0 +1,47 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Implementation of a size-limited thread pool running the CPU-heavy bcrypt operations,
+so that a login or a registration does not block the event loop serving the other requests
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import asyncio
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from lottery_backend.settings import settings
+
+T = typing.TypeVar("T")
+
+_executor: typing.Optional[ThreadPoolExecutor] = None
+if settings.password_hashing_workers > 0:
+    _executor = ThreadPoolExecutor(
+        max_workers=settings.password_hashing_workers, thread_name_prefix="password-hashing",
+    )
+
+
+async def run_password_task(func: typing.Callable[..., T], *args: typing.Any) -> T:
+    """
+    Runs the password hashing/verification function in the dedicated thread pool.
+    When the pool is full, the callers wait for a free thread instead of occupying the event loop.
+
+    Args:
+        func: function hashing or verifying a password
+        args: arguments of the function
+
+    Returns:
+        return value of the function
+    """
+    if _executor is None:
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
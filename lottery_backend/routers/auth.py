@@ -22,12 +22,19 @@ from fastapi import Depends
 from fastapi import HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette import status
 
-from lottery_backend.database import fetch_user_from_db
-from lottery_backend.database import get_session
+from lottery_backend.async_database import fetch_user_from_db
+from lottery_backend.async_database import get_async_session
+from lottery_backend.async_database import save_user
 from lottery_backend.db_models.user import UserOutput
+from lottery_backend.exceptions import InvalidTokenException
+from lottery_backend.password_hashing import run_password_task
+from lottery_backend.settings import settings
+from lottery_backend.tokens import create_access_token
+from lottery_backend.tokens import revoke_access_token
+from lottery_backend.tokens import verify_access_token
 
 LOGGER = structlog.get_logger()
 URL_PREFIX = "/auth"
@@ -35,15 +42,12 @@ router = APIRouter(prefix=URL_PREFIX)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{URL_PREFIX}/token")
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)
-) -> UserOutput:
+def get_current_user(token: str = Depends(oauth2_scheme)) -> UserOutput:
     """
-    Returns the currently logged in user details
+    Returns the currently logged in user details by verifying the signed token, no DB query is needed
 
     Args:
         token: oauth token provided when a user logs in
-        session: a unique session for a logged in user
 
     Returns:
         user details containing the username and id (primary key in the DB Table)
@@ -51,23 +55,21 @@ def get_current_user(
     Raises:
          HttpException if user is not logged in
     """
-    user = fetch_user_from_db(username=token, session=session)
-    if user:
-        LOGGER.info("The logged in user information is returned!")
-        return UserOutput.from_orm(user)
-    else:
-        LOGGER.error(f"User '{token}' is not logged in!")
+    try:
+        return verify_access_token(token)
+    except InvalidTokenException as exc:
+        LOGGER.error(f"User is not logged in: {exc}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User is not logged in",
             headers={"WWW-Authenticate": "Bearer"},
-        )
+        ) from exc
 
 
 @router.post("/token")
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> typing.Dict[str, typing.Any]:
     """
     Endpoint to implement login functionality
@@ -79,13 +81,40 @@ async def login(
 
     Returns:
 
-        the dictionary containing username and token type if user password is verified, exception otherwise
+        the dictionary containing the signed access token and token type if user password is verified,
+        exception otherwise
     """
-    user = fetch_user_from_db(username=form_data.username, session=session)
-    if user and user.verify_password(form_data.password):
-        return {"access_token": user.username, "token_type": "bearer"}
+    user = await fetch_user_from_db(username=form_data.username, session=session)
+    current_hash = user.password_hash if user else None
+    if user and await run_password_task(user.verify_password, form_data.password):
+        if user.password_hash != current_hash:
+            LOGGER.info(f"Password of the user '{user.username}' is rehashed with the configured bcrypt cost")
+            await save_user(user, session)
+        return {
+            "access_token": create_access_token(UserOutput.from_orm(user)),
+            "token_type": "bearer",
+            "expires_in": settings.access_token_ttl,
+        }
     else:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect username or password",
         )
+
+
+@router.post("/logout")
+async def logout(token: str = Depends(oauth2_scheme)) -> typing.Dict[str, str]:
+    """
+    Endpoint to revoke the access token of the logged in user
+
+    Args:
+
+        token: oauth token provided when a user logs in
+
+    Returns:
+
+        operation result with some detail message
+    """
+    get_current_user(token)  # only a valid token can be revoked
+    revoke_access_token(token)
+    return {"result": "successful", "message": "User is logged out"}
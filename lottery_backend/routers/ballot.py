@@ -15,24 +15,49 @@ Implementation of Lottery Ballot related endpoints
 # -----------------------------------------------------------------------------#
 """
 import datetime
+import itertools
+import json
+import secrets
 import typing
 
 import structlog
 from fastapi import APIRouter
 from fastapi import Depends
 from fastapi import HTTPException
-from sqlmodel import Session
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette import status
 
-from lottery_backend.database import add_ballot_for_user
-from lottery_backend.database import check_ballot_existence
-from lottery_backend.database import clear_ballots_on_date
-from lottery_backend.database import get_ballots_for_date
-from lottery_backend.database import get_session
+from lottery_backend.async_database import add_ballot_for_user
+from lottery_backend.async_database import add_ballots_for_user
+from lottery_backend.async_database import clear_ballots_on_date
+from lottery_backend.async_database import get_async_session
+from lottery_backend.async_database import get_ballot_page
+from lottery_backend.async_database import get_ballots_for_date
+from lottery_backend.async_database import get_draw_result
+from lottery_backend.async_database import get_existing_ballots
+from lottery_backend.async_database import get_user_ballot_page
+from lottery_backend.ballot_buffer import ballot_buffer
+from lottery_backend.cache import winner_cache
+from lottery_backend.database import stream_ballots_for_date
 from lottery_backend.db_models.user import User
+from lottery_backend.db_models.user_ballot import BALLOT_LENGTH
+from lottery_backend.db_models.user_ballot import BallotSubmission
+from lottery_backend.db_models.user_ballot import format_ballot
+from lottery_backend.exceptions import BallotAlreadyExistsException
+from lottery_backend.exceptions import ConcurrentSubmissionException
 from lottery_backend.routers.auth import get_current_user
 
-BALLOT_LENGTH = 16
+MAX_BATCH_SIZE = 5000
+MAX_QUICK_PICK_COUNT = 50000
+MAX_BATCH_INSERT_ATTEMPTS = 3  # a batch is retried when it races with concurrent submissions
+MAX_PAGE_SIZE = 10000
+DEFAULT_USER_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 1000  # ballots written to the response at once while streaming
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
 LOGGER = structlog.get_logger()
 router = APIRouter(prefix="/ballot")
 
@@ -41,7 +66,7 @@ router = APIRouter(prefix="/ballot")
 async def submit_ballot(
     ballot: str,
     date: datetime.date,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: User = Depends(get_current_user),
 ) -> typing.Dict[str, str]:
     """
@@ -60,16 +85,26 @@ async def submit_ballot(
     """
     _control_input_params_validity(ballot, date)
 
-    if check_ballot_existence(ballot, date, session):
-        error_message = f"There is already a ballot:'{ballot}' for the day:'{date}'"
-        LOGGER.error(error_message)
+    try:
+        if ballot_buffer.is_running:  # acknowledged once the batch the ballot is grouped into is committed
+            await ballot_buffer.submit(user_id=user.id, ballot=ballot, date=date)
+            new_user_ballot = True
+        else:
+            new_user_ballot = await add_ballot_for_user(
+                user_id=user.id, ballot=ballot, date=date, session=session
+            )
+    except BallotAlreadyExistsException as exc:
+        LOGGER.error(str(exc))
         raise HTTPException(
             status_code=status.HTTP_412_PRECONDITION_FAILED,
-            detail=error_message,
-        )
-    new_user_ballot = add_ballot_for_user(
-        user_id=user.id, ballot=ballot, date=date, session=session
-    )
+            detail=str(exc),
+        ) from exc
+    except ConcurrentSubmissionException as exc:
+        LOGGER.error(str(exc))
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Ballot could not be submitted due to concurrent submissions. Please try again!",
+        ) from exc
     if not new_user_ballot:
         error_message = f"An unknown error occurred while adding the ballot:'{ballot}' for lottery day:'{date}'"
         LOGGER.error(error_message)
@@ -83,33 +118,164 @@ async def submit_ballot(
     }
 
 
+@router.post("/submit-batch")
+async def submit_ballot_batch(
+    submissions: typing.List[BallotSubmission],
+    session: AsyncSession = Depends(get_async_session),
+    user: User = Depends(get_current_user),
+) -> typing.Dict[str, typing.Any]:
+    """
+    Enables the user to submit many ballots, each for a specific date, within a single request
+
+    Args:
+
+        submissions: list of ballot & date pairs to be included in the lottery
+        session: a unique session for DB connection
+        user: logged in user details
+
+    Returns:
+
+        overall operation result together with the result of each submitted ballot
+    """
+    if len(submissions) > MAX_BATCH_SIZE:
+        error_message = f"At most {MAX_BATCH_SIZE} ballots can be submitted at once, got {len(submissions)}!"
+        LOGGER.error(error_message)
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=error_message,
+        )
+
+    results: typing.List[typing.Dict[str, str]] = []
+    candidates: typing.Dict[typing.Tuple[str, datetime.date], int] = {}
+    for index, submission in enumerate(submissions):
+        key = (submission.ballot, submission.date)
+        error_messages = _get_input_params_errors(submission.ballot, submission.date)
+        if key in candidates:
+            error_messages.append(
+                f"Ballot:'{submission.ballot}' is submitted more than once for the day:'{submission.date}'",
+            )
+        results.append(_get_batch_result(submission, error_messages))
+        if not error_messages:
+            candidates[key] = index
+
+    inserted_count = await _insert_batch_candidates(submissions, candidates, results, user, session)
+    return {
+        "result": "successful" if inserted_count == len(submissions) else "failed",
+        "message": f"{inserted_count} out of {len(submissions)} ballots are successfully submitted",
+        "ballots": results,
+    }
+
+
+@router.post("/quick-pick")
+async def quick_pick(
+    count: int,
+    date: datetime.date,
+    session: AsyncSession = Depends(get_async_session),
+    user: User = Depends(get_current_user),
+) -> typing.Dict[str, typing.Any]:
+    """
+    Enables the user to submit randomly generated ballots for a specific date, which are unique within the day
+
+    Args:
+
+        count: number of ballots to generate, at most 50000
+        date: a specific day for which the ballots will be added to
+        session: a unique session for DB connection
+        user: logged in user details
+
+    Returns:
+
+        operation result with the generated ballots
+    """
+    error_messages: typing.List[str] = []
+    if not 0 < count <= MAX_QUICK_PICK_COUNT:
+        error_messages.append(f"Count:'{count}' should be a positive number up to {MAX_QUICK_PICK_COUNT}!")
+    if _is_date_past(date):
+        error_messages.append(f"A ballot cannot be submitted for a past date:'{date}'!")
+    if error_messages:
+        LOGGER.error(error_messages)
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=error_messages,
+        )
+
+    ballots = await _insert_quick_picks(count, date, user, session)
+    return {
+        "result": "successful",
+        "message": f"{count} ballots are generated and submitted for the lottery day:'{date}'",
+        "ballots": sorted(ballots),
+    }
+
+
 @router.get("/list")
 async def ballot_list(
     date: datetime.date,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: User = Depends(get_current_user),
-) -> typing.List[str]:
+    after: typing.Optional[str] = None,
+    limit: typing.Optional[int] = None,
+    output: typing.Literal["json", "ndjson", "csv"] = "json",
+) -> typing.Any:
     """
-    Enables the user to list the registered ballots on a certain day
+    Enables the user to list the registered ballots on a certain day, ordered by ballot when paginated or streamed.
+    Without "limit" & "after", all the ballots of the day are returned at once.
 
     Args:
 
         date: a specific day for which the winner ballot is asked
         session: a unique session for DB connection
         user: logged in user details
+        after: the last ballot of the previous page, the listing starts right after it
+        limit: max number of ballots to return, at most 10000 for the "json" output
+        output: "json" returns a list, "ndjson" & "csv" stream the ballots line by line with constant memory
+
+    Returns:
+
+          list of ballots, or a streaming response of them
+    """
+    _control_list_params_validity(after, limit, output)
+    if output in STREAM_MEDIA_TYPES:
+        return StreamingResponse(
+            _generate_ballot_lines(date, after, limit, output),
+            media_type=STREAM_MEDIA_TYPES[output],
+        )
+    if after is None and limit is None:
+        return await get_ballots_for_date(date=date, session=session)
+    return await get_ballot_page(date=date, after=after, limit=limit or MAX_PAGE_SIZE, session=session)
+
+
+@router.get("/mine")
+async def my_ballots(
+    date: datetime.date,
+    session: AsyncSession = Depends(get_async_session),
+    user: User = Depends(get_current_user),
+    after: typing.Optional[str] = None,
+    limit: int = DEFAULT_USER_PAGE_SIZE,
+) -> typing.List[str]:
+    """
+    Enables the user to list their own ballots on a certain day, page by page in ascending order
+
+    Args:
+
+        date: a specific day for which the ballots are listed
+        session: a unique session for DB connection
+        user: logged in user details
+        after: the last ballot of the previous page, the listing starts right after it
+        limit: max number of ballots to return, at most 10000
 
     Returns:
 
           list of ballots
     """
-    return get_ballots_for_date(date=date, session=session)
+    _control_list_params_validity(after, limit, "json")
+    return await get_user_ballot_page(user_id=user.id, date=date, after=after, limit=limit, session=session)
 
 
 # @router.post("/clear")
 async def remove_on_date(
     date: datetime.date,
     exception_ballot: typing.Optional[str] = None,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: User = Depends(get_current_user),
 ) -> None:
     """
@@ -126,13 +292,13 @@ async def remove_on_date(
 
           list of ballots
     """
-    clear_ballots_on_date(date, exception_ballot, session)
+    await clear_ballots_on_date(date, exception_ballot, session=session)
 
 
 @router.get("/winner")
 async def winner_ballot(
     date: datetime.date,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     user: User = Depends(get_current_user),  # noqa: WPS404
 ) -> typing.Dict[str, str]:
     """
@@ -157,16 +323,16 @@ async def winner_ballot(
             status_code=status.HTTP_412_PRECONDITION_FAILED,
             detail=error_message,
         )
-    winner = _get_winner_ballot(date, session)
+    winner = await _get_winner_ballot(date, session)
     return {
         "result": "successful",
         "message": f"The winner ballot for the day:'{date}' is '{winner}'",
     }
 
 
-def _get_winner_ballot(date: datetime.date, session: Session) -> str:
+async def _get_winner_ballot(date: datetime.date, session: AsyncSession) -> str:
     """
-    Fetches the ballot list from DB and checks if there is only one ballot which is winner
+    Returns the winner ballot of the closed date from the cache, fetching it from DB on a cache miss
 
     Args:
         date: a specific day for which the winner ballot is asked
@@ -178,22 +344,230 @@ def _get_winner_ballot(date: datetime.date, session: Session) -> str:
     Raises:
          HttpException if there is no winner ballot
     """
-    ballots = get_ballots_for_date(date=date, session=session)
-    if not ballots:
-        error_message = f"No ballot submitted for the given date:'{date}'. So, lottery event didn't take place!"
+    return await winner_cache.get_or_load_async(date, lambda: _fetch_winner_ballot(date, session))
+
+
+async def _fetch_winner_ballot(date: datetime.date, session: AsyncSession) -> str:
+    """
+    Fetches the draw result of the date from DB with a single primary key lookup
+
+    Args:
+        date: a specific day for which the winner ballot is asked
+        session: a unique session for DB connection
+
+    Returns:
+        winner ballot as string
+
+    Raises:
+         HttpException if there is no winner ballot
+    """
+    draw_result = await get_draw_result(date=date, session=session)
+    if not draw_result:
+        error_message = (
+            f"There is no winner for the given date:'{date}'. "
+            "Either no ballot is submitted or lottery event didn't take place!"
+        )
         LOGGER.warning(error_message)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=error_message,
         )
-    elif len(ballots) > 1:
-        error_message = f"Lottery event didn't take place for date:'{date}'! An unknown issue has occurred!"
-        LOGGER.error(error_message)
+    return draw_result.ballot
+
+
+async def _insert_batch_candidates(
+    submissions: typing.List[BallotSubmission],
+    candidates: typing.Dict[typing.Tuple[str, datetime.date], int],
+    results: typing.List[typing.Dict[str, str]],
+    user: User,
+    session: AsyncSession,
+) -> int:
+    """
+    Drops the already existing ballots from the candidates and inserts the rest in one transaction.
+    If another submission wins the race in between, the transaction is rolled back and the procedure is repeated.
+
+    Args:
+        submissions: all ballot & date pairs submitted by the user
+        candidates: valid ballot & date pairs mapped to their index in the submissions
+        results: result entries of the submissions, updated for the already existing ballots
+        user: logged in user details
+        session: a unique session for DB connection
+
+    Returns:
+        number of the inserted ballots
+
+    Raises:
+        HttpException if the ballots cannot be inserted due to continuous concurrent submissions
+    """
+    for attempt in range(MAX_BATCH_INSERT_ATTEMPTS):
+        # the ballot filters miss the ballots inserted by other processes, a retry checks all of them via the DB
+        for ballot, date in await get_existing_ballots(list(candidates), session, use_filter=attempt == 0):
+            index = candidates.pop((ballot, date))
+            results[index] = _get_batch_result(
+                submissions[index], [f"There is already a ballot:'{ballot}' for the day:'{date}'"],
+            )
+        try:
+            return await add_ballots_for_user(user_id=user.id, ballots=list(candidates), session=session)
+        except BallotAlreadyExistsException:
+            LOGGER.warning("Batch submission collided with concurrent submissions, retrying...")
+    error_message = "Ballots could not be submitted due to concurrent submissions. Please try again!"
+    LOGGER.error(error_message)
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=error_message,
+    )
+
+
+def _generate_ballot_lines(
+    date: datetime.date,
+    after: typing.Optional[str],
+    limit: typing.Optional[int],
+    output: str,
+) -> typing.Iterator[str]:
+    """
+    Generates the lines of the streamed ballot list in chunks, from a server-side cursor of the ballot column.
+    It is iterated in a worker thread by the StreamingResponse, so the DB calls do not block the event loop.
+
+    Args:
+        date: a specific day for which the ballots are listed
+        after: ballot to start after, None to start from the first ballot
+        limit: max number of ballots to stream, None for all
+        output: "ndjson" for a JSON string per line, "csv" for a "ballot" column with a header
+
+    Yields:
+        chunks of lines
+    """
+    if output == "csv":
+        yield "ballot\n"
+    ballots = stream_ballots_for_date(date=date, after=after)
+    if limit is not None:
+        ballots = itertools.islice(ballots, limit)
+    format_line = json.dumps if output == "ndjson" else str
+    while True:
+        chunk = [f"{format_line(ballot)}\n" for ballot in itertools.islice(ballots, STREAM_CHUNK_SIZE)]
+        if not chunk:
+            return
+        yield "".join(chunk)
+
+
+def _control_list_params_validity(after: typing.Optional[str], limit: typing.Optional[int], output: str) -> None:
+    """
+    Controls the validity of the pagination parameters for ballot_list endpoint
+
+    Args:
+        after: the last ballot of the previous page
+        limit: max number of ballots to return
+        output: format of the list
+
+    Raises:
+        HttpException if input parameter(s) are invalid
+    """
+    error_messages: typing.List[str] = []
+    if after is not None and not _check_ballot_validity(after):
+        error_messages.append(f"Ballot:'{after}' to list after should be a 16-digit string!")
+    if limit is not None and limit < 1:
+        error_messages.append(f"Limit:'{limit}' should be a positive number!")
+    elif limit is not None and limit > MAX_PAGE_SIZE and output not in STREAM_MEDIA_TYPES:
+        error_messages.append(f"At most {MAX_PAGE_SIZE} ballots can be listed at once, use a streaming output!")
+    if error_messages:
+        LOGGER.error(error_messages)
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=error_message,
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=error_messages,
         )
-    return ballots[0]
+
+
+async def _insert_quick_picks(
+    count: int,
+    date: datetime.date,
+    user: User,
+    session: AsyncSession,
+) -> typing.Set[str]:
+    """
+    Generates the ballots and inserts them in one transaction, the unique (date, ballot) index rejects any collision.
+    Colliding with an existing ballot among 10^16 is so unlikely that the existing ballots are not queried upfront,
+    only when the insert fails: the colliding ballots are found with set-based queries and replaced by new ones.
+
+    Args:
+        count: number of ballots to generate
+        date: a specific day for which the ballots will be added to
+        user: logged in user details
+        session: a unique session for DB connection
+
+    Returns:
+        the inserted ballots
+
+    Raises:
+        HttpException if the ballots cannot be inserted due to continuous concurrent submissions
+    """
+    ballots = _generate_ballots(count, excluded=set())
+    rejected: typing.Set[str] = set()
+    for _ in range(MAX_BATCH_INSERT_ATTEMPTS):
+        try:
+            await add_ballots_for_user(user_id=user.id, ballots=[(ballot, date) for ballot in ballots], session=session)
+        except BallotAlreadyExistsException:
+            LOGGER.warning("Some of the quick-picked ballots already exist, replacing them...")
+        else:
+            return ballots
+        candidates = ballots
+        while candidates:
+            existing_ballots = await get_existing_ballots([(ballot, date) for ballot in candidates], session)
+            collisions = {ballot for ballot, _ in existing_ballots}
+            rejected |= collisions
+            ballots -= collisions
+            candidates = _generate_ballots(len(collisions), excluded=ballots | rejected)
+            ballots |= candidates
+    error_message = "Ballots could not be generated due to concurrent submissions. Please try again!"
+    LOGGER.error(error_message)
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=error_message,
+    )
+
+
+def _generate_ballots(count: int, excluded: typing.Set[str]) -> typing.Set[str]:
+    """
+    Generates distinct ballots with a cryptographically secure random number generator
+
+    Args:
+        count: number of ballots to generate
+        excluded: ballots which should not be generated
+
+    Returns:
+        the generated 16-digit strings
+    """
+    ballots: typing.Set[str] = set()
+    while len(ballots) < count:
+        ballot = format_ballot(secrets.randbelow(10 ** BALLOT_LENGTH))
+        if ballot not in excluded:
+            ballots.add(ballot)
+    return ballots
+
+
+def _get_batch_result(submission: BallotSubmission, error_messages: typing.List[str]) -> typing.Dict[str, str]:
+    """
+    Builds the result entry of a single ballot within a batch submission
+
+    Args:
+        submission: ballot & date pair submitted by the user
+        error_messages: reasons why the ballot is rejected, empty if it is accepted
+
+    Returns:
+        result of the ballot submission with some detail message
+    """
+    if error_messages:
+        return {
+            "ballot": submission.ballot,
+            "date": str(submission.date),
+            "result": "failed",
+            "message": " ".join(error_messages),
+        }
+    return {
+        "ballot": submission.ballot,
+        "date": str(submission.date),
+        "result": "successful",
+        "message": f"Ballot:'{submission.ballot}' is successfully submitted for the lottery day:'{submission.date}'",
+    }
 
 
 def _control_input_params_validity(ballot: str, date: datetime.date) -> None:
@@ -207,23 +581,34 @@ def _control_input_params_validity(ballot: str, date: datetime.date) -> None:
     Raises:
         HttpException if input parameter(s) are invalid
     """
-    validity_failed = False
+    error_messages = _get_input_params_errors(ballot, date)
+    if error_messages:
+        LOGGER.error(error_messages)
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=error_messages,
+        )
+
+
+def _get_input_params_errors(ballot: str, date: datetime.date) -> typing.List[str]:
+    """
+    Collects the reasons why the provided ballot cannot be submitted for the provided date
+
+    Args:
+        ballot: a 16-digit string representing a ballot for a lottery
+        date: specific day for lottery
+
+    Returns:
+        list of error messages, empty if the input parameters are valid
+    """
     error_messages: typing.List[str] = []
     if not _check_ballot_validity(ballot):
-        validity_failed = True
         error_messages.append(
             f"Ballot:'{ballot}' does not conform with the expected format. It should be a 16-digit string!",
         )
     if _is_date_past(date):
-        validity_failed = True
         error_messages.append(f"A ballot cannot be submitted for a past date:'{date}'!")
-
-    if validity_failed:
-        LOGGER.error(error_messages)
-        raise HTTPException(
-            status_code=status.HTTP_412_PRECONDITION_FAILED,
-            detail=error_messages,
-        )
+    return error_messages
 
 
 def _check_ballot_validity(ballot: str) -> bool:
@@ -236,7 +621,7 @@ def _check_ballot_validity(ballot: str) -> bool:
     Returns:
         True if provided string is a 16-digit number, False otherwise
     """
-    if len(ballot) == BALLOT_LENGTH and ballot.isdigit():
+    if len(ballot) == BALLOT_LENGTH and ballot.isascii() and ballot.isdigit():  # e.g. "²" is a non-ASCII digit
         LOGGER.info(f"Ballot:'{ballot}' is valid.")
         return True
     LOGGER.warning(f"Ballot:'{ballot}' is invalid!")
@@ -20,13 +20,15 @@ import structlog
 from fastapi import APIRouter
 from fastapi import Depends
 from fastapi import HTTPException
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette import status
 
-from lottery_backend.database import add_new_user
-from lottery_backend.database import fetch_user_from_db
-from lottery_backend.database import get_session
+from lottery_backend.async_database import add_new_user
+from lottery_backend.async_database import fetch_user_from_db
+from lottery_backend.async_database import get_async_session
 from lottery_backend.db_models.user import UserOutput
+from lottery_backend.db_models.user import hash_password
+from lottery_backend.password_hashing import run_password_task
 
 LOGGER = structlog.get_logger()
 router = APIRouter(prefix="/user")
@@ -39,7 +41,7 @@ async def register(  # noqa: WPS211
     full_name: str,
     email_address: typing.Optional[str] = None,
     phone_number: typing.Optional[str] = None,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ) -> UserOutput:
     """
     Adds a new user to the database.
@@ -57,15 +59,15 @@ async def register(  # noqa: WPS211
 
         a newly created user object
     """
-    user = fetch_user_from_db(username=username, session=session)
+    user = await fetch_user_from_db(username=username, session=session)
     if user:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"There is already a user registered with username:'{username}'",
         )
-    new_user = add_new_user(
+    new_user = await add_new_user(
         username,
-        password,
+        await run_password_task(hash_password, password),
         full_name,
         email_address,
         phone_number,
@@ -0,0 +1,154 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Implementation of the event-driven scheduler of the daily jobs.
+Instead of polling, the scheduler sleeps on an event until its next job is due or it is stopped,
+so it wakes up only to run a job, to re-check the wall clock or to exit.
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import datetime
+import threading
+import typing
+
+import structlog
+
+LOGGER = structlog.get_logger()
+MAX_WAIT_TIME = 3600  # seconds, the wall clock is re-checked at least hourly in case it is adjusted while waiting
+
+
+class DailyJob:
+    """A job run every day at a given wall-clock time"""
+
+    def __init__(self, at: datetime.time, job_func: typing.Callable[[], None], now: datetime.datetime) -> None:
+        """
+        Initializes the DailyJob object
+
+        Args:
+            at: wall-clock time of the day to run the job
+            job_func: function to run
+            now: current time, the job is first due at its next occurrence after it
+        """
+        self.at = at
+        self.job_func = job_func
+        self.next_run = self._get_next_run(now)
+
+    def run(self, now: datetime.datetime) -> None:
+        """
+        Runs the job and schedules it for its next occurrence
+
+        Args:
+            now: current time
+        """
+        self.job_func()
+        self.next_run = self._get_next_run(max(now, self.next_run))
+
+    def _get_next_run(self, after: datetime.datetime) -> datetime.datetime:
+        """
+        Computes the first occurrence of the job strictly after the given time
+
+        Args:
+            after: a point in time
+
+        Returns:
+            date & time the job is due next
+        """
+        next_run = datetime.datetime.combine(after.date(), self.at)
+        if next_run <= after:
+            next_run += datetime.timedelta(days=1)
+        return next_run
+
+
+class DailyScheduler:
+    """Scheduler owning its daily jobs, it runs them in the calling thread until it is stopped"""
+
+    def __init__(self, clock: typing.Callable[[], datetime.datetime] = datetime.datetime.now) -> None:
+        """
+        Initializes the DailyScheduler object
+
+        Args:
+            clock: wall-clock time source, replaced by the tests to drive the time deterministically
+        """
+        self.clock = clock
+        self.jobs: typing.List[DailyJob] = []
+        self._wakeup = threading.Event()
+        self._stop_requested = False
+
+    @property
+    def stop_requested(self) -> bool:
+        """Whether the scheduler is asked to exit"""
+        return self._stop_requested
+
+    def every_day_at(self, at: datetime.time, job_func: typing.Callable[[], None]) -> DailyJob:
+        """
+        Schedules the function to run every day at the given time
+
+        Args:
+            at: wall-clock time of the day to run the function
+            job_func: function to run
+
+        Returns:
+            the scheduled job
+        """
+        job = DailyJob(at, job_func, self.clock())
+        self.jobs.append(job)
+        self.wake()  # the new job may be due before the one being waited for
+        return job
+
+    def get_next_run(self) -> typing.Optional[datetime.datetime]:
+        """
+        Returns the time the next job is due, None if there is no job
+        """
+        return min((job.next_run for job in self.jobs), default=None)
+
+    def run_pending(self) -> int:
+        """
+        Runs the jobs which are due
+
+        Returns:
+            number of the jobs run
+        """
+        now = self.clock()
+        due_jobs = [job for job in self.jobs if job.next_run <= now]
+        for job in due_jobs:
+            job.run(now)
+        return len(due_jobs)
+
+    def wake(self) -> None:
+        """
+        Interrupts the current wait so that the due jobs are re-evaluated, e.g. after the clock is moved
+        """
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        """
+        Asks the scheduler to exit and interrupts its current wait
+        """
+        self._stop_requested = True
+        self.wake()
+
+    def run(self) -> None:
+        """
+        Waits until the next job is due and runs it, repeatedly until the scheduler is stopped
+        """
+        while True:
+            self._wakeup.clear()  # the wake-ups so far are handled by the following checks
+            if self._stop_requested:
+                break
+            self.run_pending()
+            next_run = self.get_next_run()
+            timeout = MAX_WAIT_TIME
+            if next_run:
+                timeout = min(max((next_run - self.clock()).total_seconds(), 0), MAX_WAIT_TIME)
+            LOGGER.debug(f"Scheduler waits {timeout:.0f}s for its next job due at {next_run}")
+            self._wakeup.wait(timeout)
+        self.jobs.clear()  # cancels/removes any scheduled job
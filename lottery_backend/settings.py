@@ -0,0 +1,83 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Implementation of the application settings which can be overridden via environment variables
+prefixed with "LOTTERY_" (e.g. LOTTERY_PURGE_CHUNK_SIZE=10000) or via a ".env" file
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import secrets
+import typing
+from pathlib import Path
+
+from pydantic import BaseSettings
+
+
+class Settings(BaseSettings):
+    """Configuration of the lottery backend service"""
+
+    # SQLite DB to connect, e.g. "sqlite:////var/lib/lottery/lottery.db", by default a file within the package
+    database_url: str = f"sqlite:///{Path(__file__).parents[0] / 'lottery.db'}"
+    # logs every generated SQL statement synchronously, for debugging only
+    database_echo: bool = False
+    # connections kept open per engine and the extra ones opened under load, a pool size of 0 disables pooling
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    # PRAGMAs run on every new SQLite connection, see https://www.sqlite.org/pragma.html
+    sqlite_journal_mode: typing.Literal["delete", "truncate", "persist", "memory", "wal", "off"] = "wal"
+    sqlite_synchronous: typing.Literal["off", "normal", "full", "extra"] = "normal"
+    sqlite_cache_size: int = -64000  # negative values are in KiB, i.e. 64 MiB of page cache per connection
+    sqlite_mmap_size: int = 256 * 1024 * 1024  # bytes of the DB file read via memory mapping, 0 disables it
+    sqlite_busy_timeout: int = 5000  # milliseconds a connection waits for a lock before failing
+
+    # queues the single ballot submissions and commits them in batches, every flush interval (seconds) or batch size
+    ballot_buffer_enabled: bool = False
+    ballot_buffer_flush_interval: float = 0.01
+    ballot_buffer_max_batch_size: int = 1000
+    # Bloom filters of the open lottery days answering most of the duplicate checks without querying the DB,
+    # each is sized for the capacity (ballots per day) at the false positive rate, ~1.2 MB for 1M ballots at 1%
+    ballot_filter_enabled: bool = True
+    ballot_filter_capacity: int = 1000000
+    ballot_filter_false_positive_rate: float = 0.01
+    # number of ballots deleted per transaction while clearing a lottery day, 0 deletes all in one statement
+    purge_chunk_size: int = 50000
+    # the purge after a draw shrinks its chunks to hold the write lock shorter than the ceiling (seconds),
+    # bounding the extra latency of the concurrent submissions (0 disables it), and pauses between the chunks,
+    # long enough for the submissions sleeping in the SQLite busy handler (up to 100ms per retry) to get the lock
+    draw_purge_latency_ceiling: float = 0.05
+    draw_purge_pause: float = 0.05
+    # winner selection of the draw: "offset" (constant memory), "reservoir" (streaming) or "list" (loads all ballots)
+    draw_strategy: typing.Literal["offset", "reservoir", "list"] = "offset"
+    # threads drawing the past lottery days missed while the service was down, each day is drawn independently
+    draw_catch_up_workers: int = 4
+    # draws the lottery days in this process, the production server disables it in its workers & draws in its main one
+    draw_enabled: bool = True
+    # seconds a worker holds the lease of a day it draws, so a single worker among the processes draws each day
+    draw_lease_ttl: int = 15 * 60
+    # number of lottery days whose winners are kept in memory and for how many seconds
+    winner_cache_size: int = 1024
+    winner_cache_ttl: float = 24 * 60 * 60
+    # key to sign the access tokens, must be set explicitly to share the tokens among processes and restarts
+    secret_key: str = secrets.token_urlsafe(32)
+    # seconds an access token stays valid after login
+    access_token_ttl: int = 60 * 60
+    # bcrypt cost factor, passwords hashed with another cost are rehashed on the next login
+    bcrypt_rounds: int = 12
+    # threads hashing & verifying the passwords off the event loop, 0 runs them on the event loop
+    password_hashing_workers: int = 2
+
+    class Config:
+        env_prefix = "LOTTERY_"
+        env_file = ".env"
+
+
+settings = Settings()
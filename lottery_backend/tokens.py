@@ -0,0 +1,160 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Implementation of stateless access tokens signed with HMAC-SHA256.
+A token carries the user details and its expiry, so it is verified without any DB query.
+The revoked tokens are kept in the memory of the process, so another worker process accepts them until their expiry.
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+import typing
+
+from lottery_backend.db_models.user import UserOutput
+from lottery_backend.exceptions import InvalidTokenException
+from lottery_backend.settings import settings
+
+# token id => expiry of the revoked tokens, kept only until they would expire anyway
+_revoked_tokens: typing.Dict[str, float] = {}
+_revoked_tokens_lock = threading.Lock()
+
+
+def create_access_token(user: UserOutput, ttl: typing.Optional[int] = None) -> str:
+    """
+    Issues a signed access token for the user
+
+    Args:
+        user: details of the logged in user
+        ttl: seconds the token stays valid, taken from settings if omitted
+
+    Returns:
+        the token as "<base64 payload>.<base64 signature>"
+    """
+    payload = {
+        "sub": user.id,
+        "name": user.username,
+        "full_name": user.full_name,
+        "exp": int(time.time()) + (ttl if ttl is not None else settings.access_token_ttl),
+        "jti": secrets.token_urlsafe(8),
+    }
+    encoded_payload = _encode(json.dumps(payload, separators=(",", ":")).encode())
+    return f"{encoded_payload}.{_sign(encoded_payload)}"
+
+
+def verify_access_token(token: str) -> UserOutput:
+    """
+    Verifies the signature, the expiry and the revocation of the token purely in memory
+
+    Args:
+        token: access token issued by create_access_token
+
+    Returns:
+        details of the user the token is issued for
+
+    Raises:
+        InvalidTokenException if the token is malformed, tampered, expired or revoked
+    """
+    payload = _get_payload(token)
+    if payload["exp"] <= time.time():
+        raise InvalidTokenException("Access token is expired")
+    if payload["jti"] in _revoked_tokens:
+        raise InvalidTokenException("Access token is revoked")
+    return UserOutput(id=payload["sub"], username=payload["name"], full_name=payload["full_name"])
+
+
+def revoke_access_token(token: str) -> None:
+    """
+    Revokes the token so that it is rejected until its expiry
+
+    Args:
+        token: access token issued by create_access_token
+
+    Raises:
+        InvalidTokenException if the token is malformed or tampered
+    """
+    payload = _get_payload(token)
+    now = time.time()
+    with _revoked_tokens_lock:
+        for token_id, expiry in list(_revoked_tokens.items()):  # expired tokens are rejected anyway
+            if expiry <= now:
+                del _revoked_tokens[token_id]
+        _revoked_tokens[payload["jti"]] = payload["exp"]
+
+
+def _get_payload(token: str) -> typing.Dict[str, typing.Any]:
+    """
+    Checks the signature of the token and decodes its payload
+
+    Args:
+        token: access token issued by create_access_token
+
+    Returns:
+        claims of the token
+
+    Raises:
+        InvalidTokenException if the token is malformed or tampered
+    """
+    encoded_payload, _, signature = token.partition(".")
+    # compared as bytes, compare_digest rejects the strings with non-ASCII characters by raising TypeError
+    if not hmac.compare_digest(_sign(encoded_payload).encode(), signature.encode("utf-8", "surrogateescape")):
+        raise InvalidTokenException("Access token signature is invalid")
+    try:
+        return json.loads(_decode(encoded_payload))
+    except (ValueError, binascii.Error) as exc:
+        raise InvalidTokenException("Access token is malformed") from exc
+
+
+def _sign(encoded_payload: str) -> str:
+    """
+    Calculates the HMAC-SHA256 signature of the encoded payload
+
+    Args:
+        encoded_payload: base64 encoded payload of the token
+
+    Returns:
+        base64 encoded signature
+    """
+    digest = hmac.new(settings.secret_key.encode(), encoded_payload.encode(), hashlib.sha256).digest()
+    return _encode(digest)
+
+
+def _encode(raw: bytes) -> str:
+    """
+    Encodes the bytes as URL-safe base64 without padding
+
+    Args:
+        raw: bytes to encode
+
+    Returns:
+        encoded string
+    """
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _decode(encoded: str) -> bytes:
+    """
+    Decodes the URL-safe base64 string without padding
+
+    Args:
+        encoded: string to decode
+
+    Returns:
+        decoded bytes
+    """
+    return base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
@@ -49,6 +49,7 @@ setup(
     license="",
     test_suite="test",
     install_requires=[
+        "aiosqlite==0.19.0",
         "annotated-types==0.5.0",
         "anyio==3.7.1",
         "bcrypt==4.0.1",
@@ -73,7 +74,6 @@ setup(
         "python-dotenv==1.0.0",
         "python-multipart==0.0.6",
         "PyYAML==6.0.1",
-        "schedule==1.2.0",
         "sniffio==1.3.0",
         "SQLAlchemy==1.4.41",
         "sqlalchemy2-stubs==0.0.2a35",
@@ -89,6 +89,9 @@ setup(
     setup_requires=[],
     tests_require=[],
     extras_require={
+        "server": [
+            "uvloop==0.17.0; sys_platform != 'win32'",
+        ],
         "dev": [
             "astroid==2.15.6",
             "black==23.7.0",
@@ -0,0 +1,166 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Compares the synchronous and the asynchronous DB layers under concurrent requests.
+Concurrent coroutines query/submit ballots while a heartbeat coroutine measures
+how long the event loop is blocked, as any other request on the worker would experience it.
+Run it via "python -m test.benchmarks.bench_async_database [ballot_count] [concurrent_requests]"
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import asyncio
+import datetime
+import itertools
+import logging
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import typing
+from pathlib import Path
+
+import structlog
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session
+from sqlmodel import create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from lottery_backend import async_database
+from lottery_backend import database
+from lottery_backend.migrations import initialize_database
+
+DEFAULT_BALLOT_COUNT = 100000
+DEFAULT_CONCURRENT_REQUESTS = 20
+HEARTBEAT_INTERVAL = 0.005  # seconds
+WRITE_LOCK_DURATION = 1  # seconds
+
+
+async def _heartbeat(stop: asyncio.Event, delays: typing.List[float]) -> None:
+    """
+    Wakes up periodically and records how late each wake up is, i.e. how long the event loop was blocked
+
+    Args:
+        stop: set when the measurement is over
+        delays: list to append the delays in milliseconds
+    """
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        delays.append((time.perf_counter() - start - HEARTBEAT_INTERVAL) * 1000)
+
+
+async def measure(
+    request: typing.Callable[[], typing.Awaitable[None]],
+    concurrent_requests: int,
+) -> typing.Tuple[float, typing.List[float]]:
+    """
+    Runs concurrent requests together with the heartbeat
+
+    Args:
+        request: coroutine function doing a single DB request
+        concurrent_requests: number of concurrent requests
+
+    Returns:
+        total duration in seconds and the event loop delays in milliseconds
+    """
+    stop = asyncio.Event()
+    delays: typing.List[float] = []
+    heartbeat = asyncio.create_task(_heartbeat(stop, delays))
+    start = time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(concurrent_requests)))
+    duration = time.perf_counter() - start
+    stop.set()
+    await heartbeat
+    return duration, delays
+
+
+def _hold_write_lock(db_path: Path, locked: threading.Event) -> None:
+    """
+    Holds the write lock of the DB for a while, as the midnight purge of a busy day does
+
+    Args:
+        db_path: path of the SQLite file
+        locked: set once the lock is acquired
+    """
+    connection = sqlite3.connect(db_path)
+    connection.execute("BEGIN IMMEDIATE")
+    locked.set()
+    time.sleep(WRITE_LOCK_DURATION)
+    connection.rollback()
+    connection.close()
+
+
+async def run_benchmark(ballot_count: int, concurrent_requests: int) -> None:
+    """
+    Prints the throughput and the event loop blocking of both DB layers for point lookups
+    and for submissions waiting on a held write lock
+
+    Args:
+        ballot_count: number of ballots on the queried day
+        concurrent_requests: number of concurrent requests
+    """
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    date = datetime.date.today()
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = Path(directory) / "benchmark.db"
+        engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+        initialize_database(engine)
+        with Session(engine) as session:
+            ballots = [(f"{index:016d}", date) for index in range(ballot_count)]
+            database.add_ballots_for_user(1, ballots, session=session)
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        counter = itertools.count(ballot_count)
+
+        async def lookup_with_sync_layer() -> None:
+            with Session(engine) as session:  # what the endpoints did before: a blocking call in a coroutine
+                database.check_ballot_existence(f"{next(counter):016d}", date, session=session)
+
+        async def lookup_with_async_layer() -> None:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                await async_database.check_ballot_existence(f"{next(counter):016d}", date, session=session)
+
+        async def submit_with_sync_layer() -> None:
+            with Session(engine) as session:
+                database.add_ballot_for_user(1, f"{next(counter):016d}", date, session=session)
+
+        async def submit_with_async_layer() -> None:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                await async_database.add_ballot_for_user(1, f"{next(counter):016d}", date, session=session)
+
+        scenarios = (
+            ("lookups, sync layer", lookup_with_sync_layer, False),
+            ("lookups, async layer", lookup_with_async_layer, False),
+            ("submits during write lock, sync layer", submit_with_sync_layer, True),
+            ("submits during write lock, async layer", submit_with_async_layer, True),
+        )
+        for scenario, request, lock_db in scenarios:
+            if lock_db:
+                locked = threading.Event()
+                threading.Thread(target=_hold_write_lock, args=(db_path, locked)).start()
+                locked.wait()
+            duration, delays = await measure(request, concurrent_requests)
+            print(
+                f"{scenario:<39}: {concurrent_requests / duration:.0f} requests/s, "
+                f"event loop blocked max={max(delays):.1f}ms in {len(delays)} heartbeats",
+            )
+        await async_engine.dispose()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        run_benchmark(
+            int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BALLOT_COUNT,
+            int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_CONCURRENT_REQUESTS,
+        ),
+    )
@@ -0,0 +1,85 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Compares the throughput of concurrent single ballot submissions committed one by one
+with the ones grouped into batches by the ballot buffer.
+Run it via "python -m test.benchmarks.bench_ballot_buffer [ballot_count]"
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import asyncio
+import datetime
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import structlog
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from lottery_backend import database
+from lottery_backend.ballot_buffer import BallotBuffer
+from lottery_backend.db_models.user import UserOutput
+from lottery_backend.migrations import initialize_database
+from lottery_backend.routers import ballot
+from lottery_backend.settings import Settings
+
+DEFAULT_BALLOT_COUNT = 2000
+FLUSH_INTERVAL = 0.01  # seconds
+MAX_BATCH_SIZE = 1000
+
+
+async def run_benchmark(ballot_count: int) -> None:
+    """
+    Submits the same amount of ballots concurrently with & without the buffer, then prints the throughput of both
+
+    Args:
+        ballot_count: number of ballots to submit in each mode
+    """
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    user = UserOutput(id=1, username="benchmark", full_name="Benchmark User")
+    date = datetime.date.today() + datetime.timedelta(days=1)
+    with tempfile.TemporaryDirectory() as directory:
+        profile = Settings(database_url=f"sqlite:///{Path(directory) / 'benchmark.db'}")
+        database.engine = database.create_database_engine(profile)  # used by the writer thread of the buffer
+        initialize_database(database.engine)
+        async_engine = create_async_engine(
+            database.get_async_database_url(profile), **database.get_engine_options(profile, AsyncAdaptedQueuePool),
+        )
+        database.register_sqlite_pragmas(async_engine.sync_engine, profile)
+
+        async def submit(index: int) -> None:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                await ballot.submit_ballot(f"{index:016d}", date, session, user)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(submit(index) for index in range(ballot_count)))
+        direct_duration = time.perf_counter() - start
+
+        ballot.ballot_buffer = BallotBuffer(flush_interval=FLUSH_INTERVAL, max_batch_size=MAX_BATCH_SIZE)
+        ballot.ballot_buffer.start()
+        start = time.perf_counter()
+        await asyncio.gather(*(submit(index) for index in range(ballot_count, 2 * ballot_count)))
+        buffered_duration = time.perf_counter() - start
+        ballot.ballot_buffer.stop()
+        await async_engine.dispose()
+        database.engine.dispose()
+
+    for mode, duration in (("commit per submit", direct_duration), ("buffered submits", buffered_duration)):
+        print(f"{mode:<17}: {ballot_count} ballots in {duration:.3f}s => {ballot_count / duration:.0f} ballots/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BALLOT_COUNT))
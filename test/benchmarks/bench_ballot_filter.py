@@ -0,0 +1,94 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Measures the duplicate checks of new ballots on a day holding millions of ballots,
+via the DB only and via the ballot filter of the day, together with the memory & false positive rate of the filter.
+Run it via "python -m test.benchmarks.bench_ballot_filter [ballot_count]"
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import datetime
+import logging
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import structlog
+
+from lottery_backend import database
+from lottery_backend.ballot_filter import ballot_filters
+from lottery_backend.db_models.user_ballot import format_ballot
+from lottery_backend.migrations import initialize_database
+from lottery_backend.settings import Settings
+
+DEFAULT_BALLOT_COUNT = 1000000
+CHECK_COUNT = 200
+BATCH_SIZE = 100
+
+
+def _measure(batches: list, use_filter: bool) -> float:
+    """
+    Checks the existence of the batches of new ballots
+
+    Args:
+        batches: lists of (ballot, date) pairs
+        use_filter: whether the ballot filter is consulted first
+
+    Returns:
+        average duration of a batch in milliseconds
+    """
+    start = time.perf_counter()
+    for batch in batches:
+        assert not database.get_existing_ballots(batch, use_filter=use_filter)
+    return (time.perf_counter() - start) * 1000 / len(batches)
+
+
+def run_benchmark(ballot_count: int) -> None:
+    """
+    Prints the average duration of a duplicate check of a batch with & without the filter
+
+    Args:
+        ballot_count: number of ballots stored on the day
+    """
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    date = datetime.date.today()
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = Path(directory) / "benchmark.db"
+        database.engine = database.create_database_engine(Settings(database_url=f"sqlite:///{db_path}"))
+        initialize_database(database.engine)
+        connection = sqlite3.connect(db_path)
+        rows = ((1, index * 2, str(date)) for index in range(ballot_count))  # the odd ballots are never submitted
+        connection.executemany("INSERT INTO userballot (user_id, ballot, date) VALUES (?, ?, ?)", rows)
+        connection.commit()
+        connection.close()
+
+        start = time.perf_counter()
+        ballot_filters.track(date, database.stream_ballots_for_date(date))
+        print(f"filter load  : {(time.perf_counter() - start) * 1000:8.2f}ms for {ballot_count} ballots")
+        batches = [
+            [(format_ballot(random.randrange(ballot_count) * 2 + 1), date) for _ in range(BATCH_SIZE)]
+            for _ in range(CHECK_COUNT)
+        ]
+        print(f"DB only      : {_measure(batches, use_filter=False):8.2f}ms per batch of {BATCH_SIZE} new ballots")
+        print(f"with filter  : {_measure(batches, use_filter=True):8.2f}ms per batch of {BATCH_SIZE} new ballots")
+        stats = ballot_filters.stats()
+        print(f"filter memory: {stats['size_in_bytes'] / 2 ** 20:8.2f}MB")
+        print(f"false positives: {stats['false_positive_rate']:.4f} observed, "
+              f"{stats['days'][str(date)]['estimated_false_positive_rate']:.4f} estimated")
+        database.engine.dispose()
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BALLOT_COUNT)
@@ -0,0 +1,123 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Compares the peak memory and the duration of listing the ballots of a day: the legacy listing of ORM objects
+serialised into a single JSON body, the list of the ballot column and the streamed NDJSON lines,
+for growing ballot counts so that the flat memory of the streaming is visible.
+Run it via "python -m test.benchmarks.bench_ballot_list [ballot_count ...]"
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import datetime
+import json
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+import typing
+from pathlib import Path
+
+import structlog
+from sqlmodel import Session
+from sqlmodel import select
+
+from lottery_backend import database
+from lottery_backend.db_models.user_ballot import UserBallot
+from lottery_backend.migrations import initialize_database
+from lottery_backend.routers.ballot import _generate_ballot_lines
+from lottery_backend.settings import Settings
+
+DEFAULT_BALLOT_COUNTS = (100000, 400000)
+
+
+def list_orm_objects(date: datetime.date) -> None:
+    """
+    Lists the ballots as the endpoint did before: ORM objects, a list of their ballots and a single JSON body
+
+    Args:
+        date: lottery day to list
+    """
+    with Session(database.engine) as session:
+        user_ballots = session.exec(select(UserBallot).where(UserBallot.date == date)).all()
+        json.dumps([user_ballot.ballot for user_ballot in user_ballots])
+
+
+def list_ballot_column(date: datetime.date) -> None:
+    """
+    Lists the ballots as the "json" output does: a list of the ballot column serialised into a single JSON body
+
+    Args:
+        date: lottery day to list
+    """
+    json.dumps(database.get_ballots_for_date(date))
+
+
+def stream_ballot_lines(date: datetime.date) -> None:
+    """
+    Consumes the lines of the "ndjson" output as the StreamingResponse sends them
+
+    Args:
+        date: lottery day to list
+    """
+    for _ in _generate_ballot_lines(date, after=None, limit=None, output="ndjson"):
+        pass  # noqa: WPS420 each chunk is sent & released
+
+
+def measure(action: typing.Callable[[datetime.date], None], date: datetime.date) -> typing.Tuple[float, float]:
+    """
+    Measures the duration and the peak memory allocated by the action
+
+    Args:
+        action: listing function
+        date: lottery day to list
+
+    Returns:
+        duration in seconds and peak memory in MiB
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    action(date)
+    duration = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duration, peak / 2 ** 20
+
+
+def run_benchmark(ballot_counts: typing.Sequence[int]) -> None:
+    """
+    Prints the peak memory & the duration of each listing mode for each ballot count
+
+    Args:
+        ballot_counts: number of ballots on the listed day
+    """
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    date = datetime.date.today()
+    for ballot_count in ballot_counts:
+        with tempfile.TemporaryDirectory() as directory:
+            database.engine = database.create_database_engine(
+                Settings(database_url=f"sqlite:///{Path(directory) / 'benchmark.db'}"),
+            )
+            initialize_database(database.engine)
+            database.add_ballots_for_user(1, [(f"{index:016d}", date) for index in range(ballot_count)])
+            for mode, action in (
+                ("ORM objects", list_orm_objects),
+                ("ballot column", list_ballot_column),
+                ("NDJSON stream", stream_ballot_lines),
+            ):
+                duration, peak = measure(action, date)
+                print(f"{ballot_count:>8} ballots, {mode:<13}: peak memory {peak:7.1f}MiB in {duration:.2f}s")
+            database.engine.dispose()
+
+
+if __name__ == "__main__":
+    run_benchmark([int(count) for count in sys.argv[1:]] or DEFAULT_BALLOT_COUNTS)
@@ -0,0 +1,172 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Compares the legacy UserBallot table storing the ballots as 16-digit strings with the one storing them
+as 64-bit integers on a single lottery day with millions of ballots: size of the table & the (date, ballot) index
+(requires SQLite built with the dbstat virtual table) and the timings of the queries run on the ballots of a day.
+Run it via "python -m test.benchmarks.bench_ballot_storage [ballot_count]"
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import typing
+from pathlib import Path
+
+from lottery_backend.db_models.user_ballot import format_ballot
+
+DEFAULT_BALLOT_COUNT = 2000000
+LOOKUP_COUNT = 10000
+DATE = "2023-09-01"
+SCHEMAS = {
+    "VARCHAR": str,
+    "BIGINT": int,
+}
+
+
+def _create_database(db_path: Path, column_type: str, ballots: typing.List[int]) -> sqlite3.Connection:
+    """
+    Creates the UserBallot table with the given ballot column type and fills it with the ballots of a single day
+
+    Args:
+        db_path: path of the SQLite file
+        column_type: SQL type of the ballot column
+        ballots: ballot numbers to insert
+
+    Returns:
+        connection to the DB
+    """
+    to_column_value = SCHEMAS[column_type]
+    connection = sqlite3.connect(db_path)
+    connection.execute(
+        f"CREATE TABLE userballot (id INTEGER NOT NULL, user_id INTEGER NOT NULL, ballot {column_type} NOT NULL, "
+        "date DATE NOT NULL, PRIMARY KEY (id))",
+    )
+    connection.execute("CREATE UNIQUE INDEX ix_userballot_date_ballot ON userballot (date, ballot)")
+    connection.executemany(
+        "INSERT INTO userballot (user_id, ballot, date) VALUES (1, ?, ?)",
+        ((to_column_value(format_ballot(ballot)), DATE) for ballot in ballots),
+    )
+    connection.commit()
+    return connection
+
+
+def _get_sizes(connection: sqlite3.Connection) -> typing.Dict[str, int]:
+    """
+    Measures the bytes used by the table and the index
+
+    Args:
+        connection: connection to the DB
+
+    Returns:
+        bytes per table/index name
+    """
+    rows = connection.execute(
+        "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN ('userballot', 'ix_userballot_date_ballot') GROUP BY name",
+    )
+    return dict(rows)
+
+
+def _time(action: typing.Callable[[], typing.Any]) -> float:
+    """
+    Measures the duration of the action
+
+    Args:
+        action: function to run
+
+    Returns:
+        duration in milliseconds
+    """
+    start = time.perf_counter()
+    action()
+    return (time.perf_counter() - start) * 1000
+
+
+def _measure_queries(
+    connection: sqlite3.Connection,
+    column_type: str,
+    lookups: typing.List[int],
+    winner: int,
+    ballot_count: int,
+) -> typing.Dict[str, float]:
+    """
+    Runs the queries of the application on the ballots of the day
+
+    Args:
+        connection: connection to the DB
+        column_type: SQL type of the ballot column
+        lookups: ballot numbers to look up, half of them exist
+        winner: ballot kept while the day is cleared
+        ballot_count: number of ballots on the day
+
+    Returns:
+        duration in milliseconds per query
+    """
+    to_column_value = SCHEMAS[column_type]
+    lookup_values = [to_column_value(format_ballot(ballot)) for ballot in lookups]
+    winner_value = to_column_value(format_ballot(winner))
+    timings = {
+        "count": _time(
+            lambda: connection.execute("SELECT COUNT(*) FROM userballot WHERE date = ?", (DATE,)).fetchone(),
+        ),
+        f"{len(lookups)} lookups": _time(
+            lambda: [
+                connection.execute(
+                    "SELECT 1 FROM userballot WHERE date = ? AND ballot = ?", (DATE, ballot),
+                ).fetchone()
+                for ballot in lookup_values
+            ],
+        ),
+        "offset draw": _time(
+            lambda: connection.execute(
+                "SELECT ballot FROM userballot WHERE date = ? ORDER BY ballot LIMIT 1 OFFSET ?",
+                (DATE, ballot_count // 2),
+            ).fetchone(),
+        ),
+    }
+    timings["purge"] = _time(
+        lambda: connection.execute("DELETE FROM userballot WHERE date = ? AND ballot != ?", (DATE, winner_value)),
+    )
+    connection.commit()
+    return timings
+
+
+def run_benchmark(ballot_count: int) -> None:
+    """
+    Prints the sizes and the query timings of both ballot column types
+
+    Args:
+        ballot_count: number of ballots on the lottery day
+    """
+    ballots = random.sample(range(10 ** 16), ballot_count)
+    lookup_count = min(LOOKUP_COUNT // 2, ballot_count)  # half of the lookups hit a ballot of the day
+    lookups = random.sample(ballots, lookup_count) + random.sample(range(10 ** 16), lookup_count)
+    with tempfile.TemporaryDirectory() as directory:
+        for column_type in SCHEMAS:
+            connection = _create_database(Path(directory) / f"{column_type}.db", column_type, ballots)
+            try:
+                sizes = _get_sizes(connection)
+            except sqlite3.OperationalError:
+                sizes = {}  # SQLite is built without dbstat
+            timings = _measure_queries(connection, column_type, lookups, ballots[0], ballot_count)
+            connection.close()
+            size_summary = ", ".join(f"{name}={size / 2 ** 20:.1f}MiB" for name, size in sizes.items())
+            timing_summary = ", ".join(f"{name}={duration:.0f}ms" for name, duration in timings.items())
+            print(f"{column_type:<7} ballots ({ballot_count} on a day): {size_summary}")
+            print(f"{column_type:<7} queries: {timing_summary}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BALLOT_COUNT)
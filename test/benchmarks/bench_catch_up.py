@@ -0,0 +1,93 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Measures catching up the draws of the days missed during an outage, with one and with several worker threads.
+Run it via "python -m test.benchmarks.bench_catch_up [day_count] [ballots_per_day]"
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import datetime
+import logging
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import structlog
+
+from lottery_backend import database
+from lottery_backend import lottery_processor
+from lottery_backend.lottery_processor import LotteryProcessor
+from lottery_backend.migrations import initialize_database
+from lottery_backend.settings import Settings
+
+DEFAULT_DAY_COUNT = 14
+DEFAULT_BALLOTS_PER_DAY = 100000
+WORKER_COUNTS = (1, 2, 4)
+
+
+def _measure(day_count: int, ballots_per_day: int, workers: int) -> float:
+    """
+    Seeds the missed days into a new DB and draws them
+
+    Args:
+        day_count: number of missed days
+        ballots_per_day: number of ballots of each day
+        workers: number of threads drawing the days
+
+    Returns:
+        duration of the catch-up in seconds
+    """
+    today = datetime.date.today()
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = Path(directory) / "benchmark.db"
+        database.engine = database.create_database_engine(Settings(database_url=f"sqlite:///{db_path}"))
+        initialize_database(database.engine)
+        connection = sqlite3.connect(db_path)
+        rows = (
+            (1, index, str(today - datetime.timedelta(days=day)))
+            for day in range(1, day_count + 1)
+            for index in range(ballots_per_day)
+        )
+        connection.executemany("INSERT INTO userballot (user_id, ballot, date) VALUES (?, ?, ?)", rows)
+        connection.commit()
+        connection.close()
+
+        lottery_processor.settings.draw_catch_up_workers = workers
+        start = time.perf_counter()
+        drawn_dates = LotteryProcessor().catch_up_missed_draws()
+        duration = time.perf_counter() - start
+        assert len(drawn_dates) == day_count
+        database.engine.dispose()
+    return duration
+
+
+def run_benchmark(day_count: int, ballots_per_day: int) -> None:
+    """
+    Prints the duration of the catch-up for each number of workers
+
+    Args:
+        day_count: number of missed days
+        ballots_per_day: number of ballots of each day
+    """
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    for workers in WORKER_COUNTS:
+        duration = _measure(day_count, ballots_per_day, workers)
+        print(f"{workers} worker(s): {duration:8.2f}s for {day_count} days of {ballots_per_day} ballots")
+
+
+if __name__ == "__main__":
+    run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_DAY_COUNT,
+        int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_BALLOTS_PER_DAY,
+    )
@@ -0,0 +1,100 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Measures the latency of the ballot submissions running while a day holding millions of ballots is drawn,
+with the purge deleting fixed chunks back to back and with the purge throttled by the latency ceiling.
+Run it via "python -m test.benchmarks.bench_draw_purge [ballot_count]"
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import datetime
+import logging
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import structlog
+
+from lottery_backend import database
+from lottery_backend.db_models.user_ballot import format_ballot
+from lottery_backend.lottery_processor import LotteryProcessor
+from lottery_backend.migrations import initialize_database
+from lottery_backend.settings import Settings
+from lottery_backend.settings import settings
+
+DEFAULT_BALLOT_COUNT = 1000000
+PROFILES = {
+    "unthrottled": {"draw_purge_latency_ceiling": 0, "draw_purge_pause": 0},
+    "throttled": {"draw_purge_latency_ceiling": 0.05, "draw_purge_pause": 0.05},
+}
+
+
+def _measure(ballot_count: int) -> None:
+    """
+    Seeds yesterday's ballots into a new DB, draws yesterday and submits today's ballots meanwhile
+
+    Args:
+        ballot_count: number of ballots of yesterday
+    """
+    today = datetime.date.today()
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = Path(directory) / "benchmark.db"
+        database.engine = database.create_database_engine(Settings(database_url=f"sqlite:///{db_path}"))
+        initialize_database(database.engine)
+        connection = sqlite3.connect(db_path)
+        rows = ((1, index, str(today - datetime.timedelta(days=1))) for index in range(ballot_count))
+        connection.executemany("INSERT INTO userballot (user_id, ballot, date) VALUES (?, ?, ?)", rows)
+        connection.commit()
+        connection.close()
+
+        lottery_proc = LotteryProcessor()
+        draw = threading.Thread(target=lottery_proc._draw_lottery)
+        draw.start()
+        latencies = []
+        while draw.is_alive():
+            start = time.perf_counter()
+            database.add_ballot_for_user(2, format_ballot(len(latencies)), today)
+            latencies.append((time.perf_counter() - start) * 1000)
+        draw.join()
+        database.engine.dispose()
+
+    metrics = lottery_proc.last_draw_metrics.as_dict()
+    percentiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"draw {metrics['duration']:6.2f}s (purge lock wait {metrics['phases']['purge']['lock_wait']:.2f}s), "
+        f"{len(latencies)} submissions: p50 {percentiles[49]:6.2f}ms, p99 {percentiles[98]:7.2f}ms, "
+        f"max {max(latencies):7.2f}ms",
+    )
+
+
+def run_benchmark(ballot_count: int) -> None:
+    """
+    Prints the latencies of the submissions during the draw for each purge profile
+
+    Args:
+        ballot_count: number of ballots of the drawn day
+    """
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    settings.ballot_filter_enabled = False
+    for name, profile in PROFILES.items():
+        for key, value in profile.items():
+            setattr(settings, key, value)
+        print(f"{name:12}: ", end="")
+        _measure(ballot_count)
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BALLOT_COUNT)
@@ -0,0 +1,160 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Compares the submit throughput of the legacy engine (SQL echo, rollback journal, synchronous=FULL,
+a new connection per session) with the production engine profile of the settings,
+while concurrent readers query the same lottery day.
+Run it via "python -m test.benchmarks.bench_engine_profile [duration_seconds] [reader_count]"
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import contextlib
+import datetime
+import itertools
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import typing
+from pathlib import Path
+
+import structlog
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from lottery_backend import database
+from lottery_backend.migrations import initialize_database
+from lottery_backend.settings import Settings
+
+DEFAULT_DURATION = 5  # seconds per profile
+DEFAULT_READER_COUNT = 4
+WRITER_COUNT = 2
+PRELOADED_BALLOT_COUNT = 20000
+LEGACY_PROFILE = {
+    "database_echo": True,
+    "database_pool_size": 0,
+    "sqlite_journal_mode": "delete",
+    "sqlite_synchronous": "full",
+    "sqlite_cache_size": -2000,  # SQLite's default
+    "sqlite_mmap_size": 0,
+}
+
+
+def _submit(engine: Engine, date: datetime.date, counter: typing.Iterator[int], stop: threading.Event) -> int:
+    """
+    Submits single ballots, one transaction each, until stopped
+
+    Args:
+        engine: DB engine under test
+        date: lottery day of the ballots
+        counter: source of unique ballot numbers shared among the writers
+        stop: set when the measurement is over
+
+    Returns:
+        number of the submitted ballots
+    """
+    submitted = 0
+    while not stop.is_set():
+        with Session(engine) as session:
+            database.add_ballot_for_user(1, f"{next(counter):016d}", date, session=session)
+        submitted += 1
+    return submitted
+
+
+def _read(engine: Engine, date: datetime.date, stop: threading.Event) -> int:
+    """
+    Counts the ballots of the day and looks one up until stopped, as the list/winner requests would
+
+    Args:
+        engine: DB engine under test
+        date: lottery day of the ballots
+        stop: set when the measurement is over
+
+    Returns:
+        number of the completed reads
+    """
+    reads = 0
+    while not stop.is_set():
+        with Session(engine) as session:
+            database.count_ballots_for_date(date, session=session)
+            database.check_ballot_existence(f"{reads % PRELOADED_BALLOT_COUNT:016d}", date, session=session)
+        reads += 1
+    return reads
+
+
+def measure(engine: Engine, date: datetime.date, duration: float, reader_count: int) -> typing.Tuple[int, int]:
+    """
+    Runs the writer and the reader threads on the engine for the given duration
+
+    Args:
+        engine: DB engine under test
+        date: lottery day of the ballots
+        duration: seconds to run the threads
+        reader_count: number of the reader threads
+
+    Returns:
+        number of the submitted ballots and number of the completed reads
+    """
+    stop = threading.Event()
+    counter = itertools.count(PRELOADED_BALLOT_COUNT)
+    submitted: typing.List[int] = []
+    reads: typing.List[int] = []
+    threads = [
+        threading.Thread(target=lambda: submitted.append(_submit(engine, date, counter, stop)))
+        for _ in range(WRITER_COUNT)
+    ]
+    threads += [threading.Thread(target=lambda: reads.append(_read(engine, date, stop))) for _ in range(reader_count)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(submitted), sum(reads)
+
+
+def run_benchmark(duration: float, reader_count: int) -> None:
+    """
+    Prints the submit & read throughput of the legacy and the production engine profiles
+
+    Args:
+        duration: seconds to run each profile
+        reader_count: number of the reader threads
+    """
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    date = datetime.date.today() + datetime.timedelta(days=1)
+    for name, overrides in (("legacy", LEGACY_PROFILE), ("production", {})):
+        with tempfile.TemporaryDirectory() as directory:
+            profile = Settings(database_url=f"sqlite:///{Path(directory) / 'benchmark.db'}", **overrides)
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                # the echoed SQL is formatted & written as in production, but not printed on the terminal
+                engine = database.create_database_engine(profile)
+                initialize_database(engine)
+                with Session(engine) as session:
+                    ballots = [(f"{index:016d}", date) for index in range(PRELOADED_BALLOT_COUNT)]
+                    database.add_ballots_for_user(1, ballots, session=session)
+                submitted, reads = measure(engine, date, duration, reader_count)
+            engine.dispose()
+            logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)  # echo is not reverted by dispose
+        print(
+            f"{name:<10} profile: {submitted / duration:.0f} submits/s, "
+            f"{reads / duration:.0f} reads/s with {WRITER_COUNT} writers & {reader_count} readers",
+        )
+
+
+if __name__ == "__main__":
+    run_benchmark(
+        float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_DURATION,
+        int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_READER_COUNT,
+    )
@@ -0,0 +1,141 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Measures the latency of /ballot/list while logins are in flight, once with bcrypt running on the event loop
+and once with bcrypt running in the password hashing thread pool.
+Run it via "python -m test.benchmarks.bench_login_latency [list_request_count]"
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import asyncio
+import datetime
+import logging
+import statistics
+import sys
+import tempfile
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+import structlog
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from lottery_backend import database
+from lottery_backend import password_hashing
+from lottery_backend.async_database import get_async_session
+from lottery_backend.database import add_new_user
+from lottery_backend.db_models.user import UserOutput
+from lottery_backend.db_models.user import hash_password
+from lottery_backend.lottery import app
+from lottery_backend.migrations import initialize_database
+from lottery_backend.settings import Settings
+from lottery_backend.settings import settings
+from lottery_backend.tokens import create_access_token
+
+DEFAULT_LIST_REQUEST_COUNT = 200
+CONCURRENT_LOGINS = 4
+USERNAME = "benchmark"
+PASSWORD = "benchmark-password"
+
+
+async def _keep_logging_in(client: httpx.AsyncClient, stop: asyncio.Event) -> None:
+    """
+    Logs in repeatedly until asked to stop
+
+    Args:
+        client: in-process ASGI client
+        stop: set when the measurement is over
+    """
+    while not stop.is_set():
+        response = await client.post("/auth/token", data={"username": USERNAME, "password": PASSWORD})
+        response.raise_for_status()
+
+
+async def measure_list_latency(client: httpx.AsyncClient, token: str, request_count: int) -> typing.List[float]:
+    """
+    Sends /ballot/list requests one after another while concurrent logins are in flight
+
+    Args:
+        client: in-process ASGI client
+        token: access token of the user
+        request_count: number of /ballot/list requests
+
+    Returns:
+        latency of each /ballot/list request in milliseconds
+    """
+    stop = asyncio.Event()
+    logins = [asyncio.create_task(_keep_logging_in(client, stop)) for _ in range(CONCURRENT_LOGINS)]
+    await asyncio.sleep(0.1)  # let the logins start
+    latencies = []
+    for _ in range(request_count):
+        start = time.perf_counter()
+        response = await client.get(
+            "/ballot/list", params={"date": str(datetime.date.today())}, headers={"Authorization": f"Bearer {token}"},
+        )
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    stop.set()
+    await asyncio.gather(*logins)
+    return latencies
+
+
+async def run_benchmark(request_count: int) -> None:
+    """
+    Prints p50/p99 latency of /ballot/list with bcrypt on the event loop and in the thread pool
+
+    Args:
+        request_count: number of /ballot/list requests per mode
+    """
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    with tempfile.TemporaryDirectory() as directory:
+        profile = Settings(database_url=f"sqlite:///{Path(directory) / 'benchmark.db'}")
+        engine = database.create_database_engine(profile)
+        initialize_database(engine)
+        with Session(engine) as session:
+            user = add_new_user(USERNAME, hash_password(PASSWORD), "Benchmark User", session=session)
+            token = create_access_token(UserOutput.from_orm(user))
+
+        async_engine = create_async_engine(
+            database.get_async_database_url(profile), **database.get_engine_options(profile, AsyncAdaptedQueuePool),
+        )
+        database.register_sqlite_pragmas(async_engine.sync_engine, profile)
+
+        async def get_benchmark_session() -> typing.AsyncIterator[AsyncSession]:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                yield session
+
+        app.dependency_overrides[get_async_session] = get_benchmark_session
+        modes = (
+            ("bcrypt on event loop", None),
+            ("bcrypt in thread pool", ThreadPoolExecutor(max_workers=max(settings.password_hashing_workers, 1))),
+        )
+        async with httpx.AsyncClient(app=app, base_url="http://benchmark") as client:
+            for mode, executor in modes:
+                password_hashing._executor = executor  # noqa: WPS437
+                latencies = await measure_list_latency(client, token, request_count)
+                percentiles = statistics.quantiles(latencies, n=100)
+                print(
+                    f"{mode:<22}: /ballot/list p50={percentiles[49]:.1f}ms p99={percentiles[98]:.1f}ms "
+                    f"(bcrypt rounds={settings.bcrypt_rounds}, concurrent logins={CONCURRENT_LOGINS})",
+                )
+        app.dependency_overrides.clear()
+        await async_engine.dispose()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LIST_REQUEST_COUNT))
@@ -0,0 +1,76 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Measures the latency of the quick-pick endpoint for growing ballot counts on a day already holding ballots.
+Run it via "python -m test.benchmarks.bench_quick_pick [existing_ballot_count]"
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import asyncio
+import datetime
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import structlog
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from lottery_backend import database
+from lottery_backend.db_models.user import UserOutput
+from lottery_backend.migrations import initialize_database
+from lottery_backend.routers.ballot import MAX_QUICK_PICK_COUNT
+from lottery_backend.routers.ballot import quick_pick
+from lottery_backend.settings import Settings
+
+DEFAULT_EXISTING_BALLOT_COUNT = 1000000
+QUICK_PICK_COUNTS = (1000, 10000, MAX_QUICK_PICK_COUNT)
+
+
+async def run_benchmark(existing_ballot_count: int) -> None:
+    """
+    Prints the duration of a quick-pick request for each ballot count
+
+    Args:
+        existing_ballot_count: number of ballots on the day before the quick-picks
+    """
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    user = UserOutput(id=1, username="benchmark", full_name="Benchmark User")
+    date = datetime.date.today() + datetime.timedelta(days=1)
+    with tempfile.TemporaryDirectory() as directory:
+        profile = Settings(database_url=f"sqlite:///{Path(directory) / 'benchmark.db'}")
+        engine = database.create_database_engine(profile)
+        initialize_database(engine)
+        with Session(engine) as session:  # ballots of the other users spread over the range
+            ballots = [(2, f"{index * 9999991:016d}", date) for index in range(existing_ballot_count)]
+            database.add_ballots(ballots, session=session)
+        async_engine = create_async_engine(
+            database.get_async_database_url(profile), **database.get_engine_options(profile, AsyncAdaptedQueuePool),
+        )
+        database.register_sqlite_pragmas(async_engine.sync_engine, profile)
+
+        for count in QUICK_PICK_COUNTS:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                start = time.perf_counter()
+                await quick_pick(count, date, session, user)
+                duration = time.perf_counter() - start
+            print(f"quick-pick of {count:>5} ballots among {existing_ballot_count} ones: {duration * 1000:.0f}ms")
+        await async_engine.dispose()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_EXISTING_BALLOT_COUNT))
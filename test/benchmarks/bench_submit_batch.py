@@ -0,0 +1,83 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Compares the throughput of the single ballot submission with the batch submission.
+Run it via "python -m test.benchmarks.bench_submit_batch [ballot_count]"
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import asyncio
+import datetime
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import structlog
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from lottery_backend import database
+from lottery_backend.db_models.user import UserOutput
+from lottery_backend.db_models.user_ballot import BallotSubmission
+from lottery_backend.migrations import initialize_database
+from lottery_backend.routers.ballot import submit_ballot
+from lottery_backend.routers.ballot import submit_ballot_batch
+from lottery_backend.settings import Settings
+
+DEFAULT_BALLOT_COUNT = 2000
+
+
+async def run_benchmark(ballot_count: int) -> None:
+    """
+    Submits the same amount of ballots one by one and as a batch, then prints the throughput of both
+
+    Args:
+        ballot_count: number of ballots to submit in each mode
+    """
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    user = UserOutput(id=1, username="benchmark", full_name="Benchmark User")
+    date = datetime.date.today() + datetime.timedelta(days=1)
+    with tempfile.TemporaryDirectory() as directory:
+        profile = Settings(database_url=f"sqlite:///{Path(directory) / 'benchmark.db'}")
+        engine = database.create_database_engine(profile)
+        initialize_database(engine)
+        async_engine = create_async_engine(
+            database.get_async_database_url(profile), **database.get_engine_options(profile, AsyncAdaptedQueuePool),
+        )
+        database.register_sqlite_pragmas(async_engine.sync_engine, profile)
+
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            start = time.perf_counter()
+            for index in range(ballot_count):
+                await submit_ballot(f"{index:016d}", date, session, user)
+            single_duration = time.perf_counter() - start
+
+        submissions = [
+            BallotSubmission(ballot=f"{index:016d}", date=date) for index in range(ballot_count, 2 * ballot_count)
+        ]
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            start = time.perf_counter()
+            response = await submit_ballot_batch(submissions, session, user)
+            batch_duration = time.perf_counter() - start
+            assert response["result"] == "successful", response["message"]
+        await async_engine.dispose()
+        engine.dispose()
+
+    for mode, duration in (("single submit", single_duration), ("batch submit", batch_duration)):
+        print(f"{mode:<13}: {ballot_count} ballots in {duration:.3f}s => {ballot_count / duration:.0f} ballots/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BALLOT_COUNT))
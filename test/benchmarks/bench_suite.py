@@ -0,0 +1,388 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Repeatable load test of the API and the draw, run locally without network on a synthetic DB:
+seeds the users and millions of ballots, times the draw of yesterday end to end, then drives
+/auth/token, /ballot/submit, /ballot/list and /ballot/winner concurrently through an in-process ASGI client.
+The results are emitted as JSON (throughput and p50/p95/p99 of each endpoint) to be compared among commits.
+Run it via "python -m test.benchmarks.bench_suite --help"
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import logging
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+from pathlib import Path
+
+import httpx
+import structlog
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from lottery_backend import database
+from lottery_backend.async_database import get_async_session
+from lottery_backend.db_models.user import UserOutput
+from lottery_backend.db_models.user import hash_password
+from lottery_backend.db_models.user_ballot import BALLOT_LENGTH
+from lottery_backend.db_models.user_ballot import format_ballot
+from lottery_backend.lottery import app
+from lottery_backend.lottery_processor import LotteryProcessor
+from lottery_backend.migrations import initialize_database
+from lottery_backend.settings import Settings
+from lottery_backend.tokens import create_access_token
+
+PASSWORD = "benchmark-password"
+BALLOT_MULTIPLIER = 2862933555777941757  # coprime with 10^16, so the index -> ballot mapping is a permutation
+SEED_CHUNK_SIZE = 100000
+Latencies = typing.List[float]
+
+
+def synthetic_ballot(index: int) -> int:
+    """
+    Maps an index to a unique ballot number scattered over the whole ballot range
+
+    Args:
+        index: position of the ballot, below 10^16
+
+    Returns:
+        the ballot number
+    """
+    return index * BALLOT_MULTIPLIER % 10 ** BALLOT_LENGTH
+
+
+def seed_database(db_path: Path, user_count: int, ballots_per_day: int, dates: typing.List[datetime.date]) -> float:
+    """
+    Fills the DB with the users and the ballots of each day through raw executemany statements
+
+    Args:
+        db_path: path of the SQLite file, already initialized
+        user_count: number of users, named user0, user1...
+        ballots_per_day: number of ballots of each day, spread evenly among the users
+        dates: lottery days to fill
+
+    Returns:
+        duration of the seeding in seconds
+    """
+    start = time.perf_counter()
+    password_hash = hash_password(PASSWORD)  # shared by all the users, bcrypt is too slow to run per user
+    connection = sqlite3.connect(db_path)
+    connection.executemany(
+        "INSERT INTO user (id, username, password_hash, full_name) VALUES (?, ?, ?, ?)",
+        ((index + 1, f"user{index}", password_hash, f"User {index}") for index in range(user_count)),
+    )
+    for date in dates:
+        rows = ((index % user_count + 1, synthetic_ballot(index), str(date)) for index in range(ballots_per_day))
+        while True:
+            chunk = list(itertools.islice(rows, SEED_CHUNK_SIZE))
+            if not chunk:
+                break
+            connection.executemany("INSERT INTO userballot (user_id, ballot, date) VALUES (?, ?, ?)", chunk)
+        connection.commit()
+    connection.close()
+    return time.perf_counter() - start
+
+
+def summarize(latencies: Latencies, errors: int, wall_time: float) -> typing.Dict[str, typing.Any]:
+    """
+    Computes the throughput and the latency percentiles of a workload
+
+    Args:
+        latencies: latency of each request in milliseconds
+        errors: number of the requests which did not succeed
+        wall_time: seconds from the first request to the last response
+
+    Returns:
+        requests, errors, throughput and p50/p95/p99/max latencies
+    """
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": len(latencies) / wall_time if wall_time else 0,
+        "p50_ms": percentiles[49],
+        "p95_ms": percentiles[94],
+        "p99_ms": percentiles[98],
+        "max_ms": max(latencies, default=0),
+    }
+
+
+class Workload:
+    """Requests of an endpoint sent by a number of concurrent clients"""
+
+    def __init__(
+        self,
+        name: str,
+        build_request: typing.Callable[[int], typing.Dict[str, typing.Any]],
+        request_count: int,
+        concurrency: int,
+    ) -> None:
+        """
+        Initializes the Workload object
+
+        Args:
+            name: method & path of the endpoint, e.g. "POST /ballot/submit"
+            build_request: returns the keyword arguments of httpx.AsyncClient.request for the n-th request
+            request_count: total number of requests
+            concurrency: number of clients sending the requests one after another
+        """
+        self.name = name
+        self.method, self.url = name.split(" ")
+        self.build_request = build_request
+        self.request_count = request_count
+        self.concurrency = concurrency
+
+    async def run(self, client: httpx.AsyncClient) -> typing.Dict[str, typing.Any]:
+        """
+        Sends the requests and measures them
+
+        Args:
+            client: in-process ASGI client
+
+        Returns:
+            summary of the latencies
+        """
+        counter = itertools.count()
+        latencies: Latencies = []
+        errors = 0
+
+        async def send_requests() -> None:
+            nonlocal errors
+            while (index := next(counter)) < self.request_count:
+                start = time.perf_counter()
+                response = await client.request(self.method, self.url, **self.build_request(index))
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += response.is_error
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send_requests() for _ in range(self.concurrency)))
+        return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def build_workloads(args: argparse.Namespace, today: datetime.date) -> typing.List[Workload]:
+    """
+    Builds the workloads of the endpoints
+
+    Args:
+        args: command line arguments
+        today: the open lottery day
+
+    Returns:
+        the workloads to run concurrently
+    """
+    yesterday = today - datetime.timedelta(days=1)
+    tokens = [
+        create_access_token(UserOutput(id=index + 1, username=f"user{index}", full_name=f"User {index}"))
+        for index in range(args.users)
+    ]
+    random_generator = random.Random(args.random_seed)
+
+    def auth_header() -> typing.Dict[str, str]:
+        return {"Authorization": f"Bearer {random_generator.choice(tokens)}"}
+
+    def login(index: int) -> typing.Dict[str, typing.Any]:
+        return {"data": {"username": f"user{index % args.users}", "password": PASSWORD}}
+
+    def submit(index: int) -> typing.Dict[str, typing.Any]:
+        ballot = format_ballot(synthetic_ballot(args.ballots + index))  # never seeded, so never a duplicate
+        return {"params": {"ballot": ballot, "date": str(today)}, "headers": auth_header()}
+
+    def list_page(index: int) -> typing.Dict[str, typing.Any]:
+        after = format_ballot(random_generator.randrange(10 ** BALLOT_LENGTH))
+        params = {"date": str(today), "after": after, "limit": args.page_size}
+        return {"params": params, "headers": auth_header()}
+
+    def winner(index: int) -> typing.Dict[str, typing.Any]:
+        return {"params": {"date": str(yesterday)}, "headers": auth_header()}
+
+    return [
+        Workload("POST /auth/token", login, args.login_requests, args.concurrency),
+        Workload("POST /ballot/submit", submit, args.requests, args.concurrency),
+        Workload("GET /ballot/list", list_page, args.requests, args.concurrency),
+        Workload("GET /ballot/winner", winner, args.requests, args.concurrency),
+    ]
+
+
+def time_draw(today: datetime.date) -> typing.Dict[str, typing.Any]:
+    """
+    Draws yesterday as the midnight job does and measures it end to end
+
+    Args:
+        today: the day following the drawn one
+
+    Returns:
+        duration of the draw in seconds and the metrics of its phases
+    """
+    lottery_proc = LotteryProcessor(clock=lambda: datetime.datetime.combine(today, datetime.time()))
+    start = time.perf_counter()
+    lottery_proc._draw_lottery()  # noqa: WPS437 the scheduled job itself
+    duration = time.perf_counter() - start
+    if not lottery_proc.last_draw_metrics:
+        raise RuntimeError("Yesterday could not be drawn, see the logs")
+    return {"duration": duration, "phases": lottery_proc.last_draw_metrics.as_dict()["phases"]}
+
+
+async def run_suite(args: argparse.Namespace) -> typing.Dict[str, typing.Any]:
+    """
+    Seeds a temporary DB, times the draw and runs the endpoint workloads concurrently
+
+    Args:
+        args: command line arguments
+
+    Returns:
+        the results
+    """
+    today = datetime.date.today()
+    with tempfile.TemporaryDirectory() as directory:
+        profile = Settings(database_url=f"sqlite:///{Path(directory) / 'benchmark.db'}")
+        database.engine = database.create_database_engine(profile)
+        initialize_database(database.engine)
+        seed_duration = seed_database(
+            Path(directory) / "benchmark.db", args.users, args.ballots, [today - datetime.timedelta(days=1), today],
+        )
+        async_engine = create_async_engine(
+            database.get_async_database_url(profile),
+            **database.get_engine_options(profile, AsyncAdaptedQueuePool),
+        )
+        database.register_sqlite_pragmas(async_engine.sync_engine, profile)
+
+        async def get_benchmark_session() -> typing.AsyncIterator[AsyncSession]:
+            async with AsyncSession(async_engine, expire_on_commit=False) as session:
+                yield session
+
+        app.dependency_overrides[get_async_session] = get_benchmark_session
+        draw = time_draw(today)
+        workloads = build_workloads(args, today)
+        async with httpx.AsyncClient(app=app, base_url="http://benchmark") as client:
+            results = await asyncio.gather(*(workload.run(client) for workload in workloads))
+        app.dependency_overrides.clear()
+        await async_engine.dispose()
+        database.engine.dispose()
+
+    return {
+        "environment": get_environment(),
+        "config": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        "seed": {"users": args.users, "ballots": args.ballots * 2, "duration": seed_duration},
+        "draw": draw,
+        "endpoints": {workload.name: result for workload, result in zip(workloads, results)},
+    }
+
+
+def get_environment() -> typing.Dict[str, typing.Any]:
+    """
+    Describes where the results are measured
+
+    Returns:
+        the commit, the time and the versions of Python & SQLite
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "measured_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+
+
+def compare(results: typing.Dict[str, typing.Any], baseline: typing.Dict[str, typing.Any]) -> typing.List[str]:
+    """
+    Compares the results with the ones of another run, e.g. of the previous commit
+
+    Args:
+        results: results of this run
+        baseline: results of the other run
+
+    Returns:
+        a line per endpoint with the relative change of its throughput & p99, and one for the draw
+    """
+    lines = []
+    for name, result in results["endpoints"].items():
+        base = baseline["endpoints"].get(name)
+        if not base:
+            continue
+        throughput_change = _get_change(result["requests_per_second"], base["requests_per_second"])
+        p99_change = _get_change(result["p99_ms"], base["p99_ms"])
+        lines.append(f"{name:<20} throughput {throughput_change:+7.1%}  p99 {p99_change:+7.1%}")
+    draw_change = _get_change(results["draw"]["duration"], baseline["draw"]["duration"])
+    lines.append(f"{'draw':<20} duration   {draw_change:+7.1%}")
+    return lines
+
+
+def _get_change(value: float, base: float) -> float:
+    """
+    Returns the relative change of the value compared to the base, 0 if the base is 0
+    """
+    return value / base - 1 if base else 0
+
+
+def parse_args(argv: typing.Optional[typing.List[str]] = None) -> argparse.Namespace:
+    """
+    Parses the command line arguments
+
+    Args:
+        argv: arguments, taken from sys.argv if omitted
+
+    Returns:
+        the parsed arguments
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("Description  :")[1].split("# ---")[0].strip())
+    parser.add_argument("--users", type=int, default=1000, help="number of seeded users")
+    parser.add_argument("--ballots", type=int, default=1000000, help="number of seeded ballots of each day")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint, except /auth/token")
+    parser.add_argument("--login-requests", type=int, default=50, help="requests of /auth/token, each runs bcrypt")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients per endpoint")
+    parser.add_argument("--page-size", type=int, default=100, help="limit of the /ballot/list requests")
+    parser.add_argument("--random-seed", type=int, default=0, help="seed of the randomized request parameters")
+    parser.add_argument("--output", type=Path, help="file to write the JSON results to, stdout if omitted")
+    parser.add_argument("--baseline", type=Path, help="JSON results of another run to compare with")
+    return parser.parse_args(argv)
+
+
+def main(argv: typing.Optional[typing.List[str]] = None) -> None:
+    """
+    Runs the suite and emits the results
+
+    Args:
+        argv: command line arguments, taken from sys.argv if omitted
+    """
+    args = parse_args(argv)
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    results = asyncio.run(run_suite(args))
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+    if args.baseline:
+        print("\n".join(compare(results, json.loads(args.baseline.read_text()))), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Measures listing the ballots of a user on a day holding millions of ballots of the other users,
+with and without the (user_id, date, ballot) index.
+Run it via "python -m test.benchmarks.bench_user_ballots [ballot_count]"
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import datetime
+import logging
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import structlog
+
+from lottery_backend import database
+from lottery_backend.migrations import initialize_database
+from lottery_backend.settings import Settings
+
+DEFAULT_BALLOT_COUNT = 2000000
+USER_BALLOT_COUNT = 100
+USER_ID = 1
+OTHER_USER_COUNT = 10000
+PAGE_SIZE = 20
+
+
+def _measure(date: datetime.date, repeat: int) -> float:
+    """
+    Pages through the ballots of the user
+
+    Args:
+        date: lottery day to list
+        repeat: number of times to list all the pages
+
+    Returns:
+        average duration of a page in milliseconds
+    """
+    page_count = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        after = None
+        while True:
+            page = database.get_user_ballot_page(USER_ID, date, after=after, limit=PAGE_SIZE)
+            page_count += 1
+            if not page:
+                break
+            after = page[-1]
+    return (time.perf_counter() - start) * 1000 / page_count
+
+
+def run_benchmark(ballot_count: int) -> None:
+    """
+    Prints the average duration of a page of the ballots of a user with & without the index
+
+    Args:
+        ballot_count: number of ballots of the other users on the day
+    """
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    date = datetime.date.today()
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = Path(directory) / "benchmark.db"
+        database.engine = database.create_database_engine(Settings(database_url=f"sqlite:///{db_path}"))
+        initialize_database(database.engine)
+        connection = sqlite3.connect(db_path)
+        user_interval = ballot_count // USER_BALLOT_COUNT  # the user's ballots are spread among the other users'
+        rows = (
+            (USER_ID if index % user_interval == 0 else 2 + index % OTHER_USER_COUNT, index, str(date))
+            for index in range(ballot_count)
+        )
+        connection.executemany("INSERT INTO userballot (user_id, ballot, date) VALUES (?, ?, ?)", rows)
+        connection.commit()
+
+        print(f"with index   : {_measure(date, repeat=20):8.2f}ms per page of {PAGE_SIZE} ballots")
+        connection.execute("DROP INDEX ix_userballot_user_id_date_ballot")
+        connection.commit()
+        database.engine.dispose()  # the statements are prepared again without the index
+        print(f"without index: {_measure(date, repeat=1):8.2f}ms per page of {PAGE_SIZE} ballots")
+        connection.close()
+        database.engine.dispose()
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BALLOT_COUNT)
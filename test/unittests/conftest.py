@@ -14,11 +14,20 @@ Enablers to test the code
 #                                                                              #
 # -----------------------------------------------------------------------------#
 """
+import datetime
+
 import pytest
-from sqlmodel import SQLModel, Session, select
+import pytest_asyncio
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from lottery_backend.async_database import async_engine
+from lottery_backend.ballot_filter import ballot_filters
+from lottery_backend.cache import winner_cache
 from lottery_backend.database import engine
+from lottery_backend.db_models.draw_result import DrawResult
 from lottery_backend.db_models.user import User
+from lottery_backend.migrations import initialize_database
 
 DEFAULT_USER = "ayk"
 DEFAULT_PASS = "12345"
@@ -26,12 +35,67 @@ DEFAULT_NAME = "Ali Yavuz Kahveci"
 DEFAULT_BALLOT = "1234567891234567"
 
 
+class FakeClock:
+    """Wall-clock time source moved forward by the tests instead of sleeping"""
+
+    def __init__(self, now: datetime.datetime) -> None:
+        """
+        Initializes the FakeClock object
+
+        Args:
+            now: initial time
+        """
+        self.now = now
+
+    def __call__(self) -> datetime.datetime:
+        """Returns the current fake time"""
+        return self.now
+
+    def advance(self, delta: datetime.timedelta) -> None:
+        """
+        Moves the time forward
+
+        Args:
+            delta: duration to move
+        """
+        self.now += delta
+
+
+@pytest.fixture(autouse=True)
+def clear_winner_cache():
+    """
+    Makes sure the winners cached by a test are not served to the next one
+    """
+    winner_cache.clear()
+    yield
+    winner_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_ballot_filters():
+    """
+    Makes sure the ballot filters loaded by a test are not used by the next one
+    """
+    ballot_filters.clear()
+    yield
+    ballot_filters.clear()
+
+
+@pytest_asyncio.fixture
+async def async_session():
+    """
+    Provides an asynchronous DB session as the API endpoints get it
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
 @pytest.fixture(autouse=True)
 def initialize_db():
     """
     Adds a default user to the DB
     """
-    SQLModel.metadata.create_all(engine)
+    initialize_database(engine)
     with Session(engine) as session:
         query = select(User).where(User.username == DEFAULT_USER)
         user = session.exec(query).first()
@@ -62,3 +126,18 @@ def remove_user(username: str):
             return
         session.delete(user)
         session.commit()
+
+
+def remove_draw_result(date: datetime.date):
+    """
+    Removes the draw result of the day from the DB
+
+    Args:
+        date: the lottery day
+    """
+    with Session(engine) as session:
+        draw_result = session.get(DrawResult, date)
+        if not draw_result:
+            return
+        session.delete(draw_result)
+        session.commit()
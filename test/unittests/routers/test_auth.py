@@ -17,51 +17,58 @@ Unit tests to test classes/functions in auth.py
 import pytest
 from fastapi import HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
+from passlib.context import CryptContext
 
-from lottery_backend.database import get_session
+from lottery_backend.database import add_new_user, fetch_user_from_db, get_session
+from lottery_backend.settings import settings
 from lottery_backend.db_models.user import UserOutput
-from test.unittests.conftest import DEFAULT_USER, DEFAULT_NAME, DEFAULT_PASS
+from lottery_backend.tokens import create_access_token, verify_access_token
+from test.unittests.conftest import DEFAULT_USER, DEFAULT_NAME, DEFAULT_PASS, remove_user
 
-from lottery_backend.routers.auth import get_current_user, login
+from lottery_backend.routers.auth import get_current_user, login, logout
 
 
 pytest_plugins = ('pytest_asyncio',)
+DEFAULT_USER_OUTPUT = UserOutput(id=1, username=DEFAULT_USER, full_name=DEFAULT_NAME)
 
 
 @pytest.mark.parametrize(
-    "username, user_object",
+    "token, user_object",
     [
-        (DEFAULT_USER, UserOutput(id=1, username=DEFAULT_USER, full_name=DEFAULT_NAME)),
-        ("NonExistingUser", None,)
+        (create_access_token(DEFAULT_USER_OUTPUT), DEFAULT_USER_OUTPUT),  # valid token
+        (DEFAULT_USER, None,),  # plain username is not a token
+        (create_access_token(DEFAULT_USER_OUTPUT) + "tampered", None,),  # invalid signature
+        (create_access_token(DEFAULT_USER_OUTPUT, ttl=-1), None,),  # expired token
+        ("abc.é", None,),  # non-ASCII signature
     ],
 )
-def test_get_current_user(username, user_object):
+def test_get_current_user(token, user_object):
     """
     Tests the logged in user
 
     Args:
-        username: name of the user
+        token: access token of the user
         user_object: expected return object
     """
     if user_object:
-        user_output = get_current_user(token=username, session=next(get_session()))
+        user_output = get_current_user(token=token)
         assert user_output.username == user_object.username
         assert user_output.full_name == user_object.full_name
     else:
         with pytest.raises(HTTPException):
-            get_current_user(token=username, session=next(get_session()))
+            get_current_user(token=token)
 
 
 @pytest.mark.parametrize(
     "username, password, response",
     [
-        (DEFAULT_USER, DEFAULT_PASS, {"access_token": DEFAULT_USER, "token_type": "bearer"}),
+        (DEFAULT_USER, DEFAULT_PASS, {"username": DEFAULT_USER, "token_type": "bearer"}),
         (DEFAULT_USER, "incorrect_pass", None,),
         ("NonExistingUser", DEFAULT_PASS, None,),
     ],
 )
 @pytest.mark.asyncio
-async def test_login(username, password, response):
+async def test_login(username, password, response, async_session):
     """
     Tests the login endpoint
 
@@ -73,13 +80,48 @@ async def test_login(username, password, response):
     if response:
         response_dict = await login(
             form_data=OAuth2PasswordRequestForm(username=username, password=password),
-            session=next(get_session()),
+            session=async_session,
         )
-        assert response_dict["access_token"] == response["access_token"]
+        assert verify_access_token(response_dict["access_token"]).username == response["username"]
         assert response_dict["token_type"] == response["token_type"]
     else:
         with pytest.raises(HTTPException):
             await login(
                 form_data=OAuth2PasswordRequestForm(username=username, password=password),
-                session=next(get_session()),
+                session=async_session,
             )
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password(async_session):
+    """
+    Tests that a password hashed with another bcrypt cost is rehashed with the configured cost on login
+    """
+    username = "OutdatedHashUser"
+    remove_user(username)  # in case previous execution is interrupted before deleting the user
+    outdated_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash(DEFAULT_PASS)
+    add_new_user(username, outdated_hash, DEFAULT_NAME, session=next(get_session()))
+
+    await login(
+        form_data=OAuth2PasswordRequestForm(username=username, password=DEFAULT_PASS),
+        session=async_session,
+    )
+    new_hash = fetch_user_from_db(username, session=next(get_session())).password_hash
+    assert new_hash != outdated_hash
+    assert new_hash.startswith(f"$2b${settings.bcrypt_rounds:02d}$")
+    remove_user(username)
+
+
+@pytest.mark.asyncio
+async def test_logout():
+    """
+    Tests that the token is rejected after logging out
+    """
+    token = create_access_token(DEFAULT_USER_OUTPUT)
+    assert get_current_user(token=token).username == DEFAULT_USER
+    response = await logout(token=token)
+    assert response["result"] == "successful"
+    with pytest.raises(HTTPException):
+        get_current_user(token=token)
+    with pytest.raises(HTTPException):
+        await logout(token=token)
@@ -19,10 +19,15 @@ import datetime
 import pytest
 from fastapi import HTTPException
 
-from lottery_backend.database import fetch_user_from_db, add_ballot_for_user, get_session, clear_ballots_on_date
+from lottery_backend.ballot_buffer import BallotBuffer
+from lottery_backend.database import fetch_user_from_db, add_ballot_for_user, clear_ballots_on_date, \
+    get_ballots_for_date, add_draw_result, count_ballots_for_date
+from lottery_backend.db_models.user_ballot import BallotSubmission
+from lottery_backend.exceptions import BallotAlreadyExistsException
 from lottery_backend.routers.ballot import _check_ballot_validity, _is_date_past, _control_input_params_validity, \
-    _get_winner_ballot, winner_ballot, ballot_list, submit_ballot
-from test.unittests.conftest import DEFAULT_BALLOT, DEFAULT_USER
+    _get_winner_ballot, winner_ballot, ballot_list, submit_ballot, submit_ballot_batch, MAX_BATCH_SIZE, \
+    MAX_PAGE_SIZE, STREAM_MEDIA_TYPES, my_ballots, quick_pick, MAX_QUICK_PICK_COUNT
+from test.unittests.conftest import DEFAULT_BALLOT, DEFAULT_USER, remove_draw_result
 
 pytest_plugins = ('pytest_asyncio',)
 
@@ -37,7 +42,7 @@ pytest_plugins = ('pytest_asyncio',)
     ],
 )
 @pytest.mark.asyncio
-async def test_submit_ballot(ballot, date, exception_raised):
+async def test_submit_ballot(ballot, date, exception_raised, async_session):
     """
     Tests the endpoint submit_ballot
 
@@ -51,13 +56,139 @@ async def test_submit_ballot(ballot, date, exception_raised):
     assert user  # make sure there is user
     if exception_raised:
         with pytest.raises(HTTPException):
-            await submit_ballot(ballot, date, next(get_session()), user)
+            await submit_ballot(ballot, date, async_session, user)
     else:
-        response = await submit_ballot(ballot, date, next(get_session()), user)
+        response = await submit_ballot(ballot, date, async_session, user)
         assert response["result"] == "successful"
     clear_ballots_on_date(date)  # clear the DB
 
 
+@pytest.mark.asyncio
+async def test_submit_ballot_duplicate(async_session):
+    """
+    Tests that submitting an already existing ballot is rejected by the unique index
+    """
+    date = datetime.date.today() + datetime.timedelta(days=1)
+    clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    response = await submit_ballot(DEFAULT_BALLOT, date, async_session, user)
+    assert response["result"] == "successful"
+    with pytest.raises(HTTPException) as exc_info:
+        await submit_ballot(DEFAULT_BALLOT, date, async_session, user)
+    assert exc_info.value.status_code == 412
+    assert get_ballots_for_date(date) == [DEFAULT_BALLOT]
+    clear_ballots_on_date(date)  # clear the DB
+
+
+@pytest.mark.asyncio
+async def test_submit_ballot_buffered(monkeypatch, async_session):
+    """
+    Tests that the submissions go through the ballot buffer when it is running
+    """
+    date = datetime.date.today() + datetime.timedelta(days=1)
+    clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    buffer = BallotBuffer(flush_interval=0.01, max_batch_size=100)
+    monkeypatch.setattr("lottery_backend.routers.ballot.ballot_buffer", buffer)
+    buffer.start()
+    response = await submit_ballot(DEFAULT_BALLOT, date, async_session, user)
+    assert response["result"] == "successful"
+    assert get_ballots_for_date(date) == [DEFAULT_BALLOT]  # committed before the response
+    with pytest.raises(HTTPException) as exc_info:
+        await submit_ballot(DEFAULT_BALLOT, date, async_session, user)
+    assert exc_info.value.status_code == 412
+
+    def collide(ballots, session):
+        """Fails as if another process inserted one of the ballots right before"""
+        raise BallotAlreadyExistsException("collision")
+
+    monkeypatch.setattr("lottery_backend.ballot_buffer.add_ballots", collide)
+    with pytest.raises(HTTPException) as exc_info:  # not a duplicate, the submission can be retried
+        await submit_ballot("9876543211234567", date, async_session, user)
+    assert exc_info.value.status_code == 409
+    buffer.stop()
+    clear_ballots_on_date(date)  # clear the DB
+
+
+@pytest.mark.asyncio
+async def test_quick_pick(async_session):
+    """
+    Tests the endpoint quick_pick generating distinct 16-digit ballots
+    """
+    date = datetime.date.today() + datetime.timedelta(days=1)
+    clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    response = await quick_pick(1000, date, async_session, user)
+    assert response["result"] == "successful"
+    assert len(set(response["ballots"])) == 1000
+    assert all(_check_ballot_validity(ballot) for ballot in response["ballots"])
+    assert sorted(get_ballots_for_date(date)) == response["ballots"]
+    clear_ballots_on_date(date)  # clear the DB
+
+    past_date = datetime.date.today() - datetime.timedelta(days=1)
+    for count, quick_pick_date in ((0, date), (MAX_QUICK_PICK_COUNT + 1, date), (1, past_date)):
+        with pytest.raises(HTTPException) as exc_info:
+            await quick_pick(count, quick_pick_date, async_session, user)
+        assert exc_info.value.status_code == 412
+
+
+@pytest.mark.asyncio
+async def test_quick_pick_collisions(monkeypatch, async_session):
+    """
+    Tests that the generated ballots colliding with each other or with the existing ballots are replaced
+
+    Args:
+        monkeypatch: fixture to make the random number generator repeat itself
+    """
+    date = datetime.date.today() + datetime.timedelta(days=1)
+    clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    add_ballot_for_user(user.id, "0000000000000002", date)
+    random_numbers = iter([1, 1, 2, 3, 2, 4])
+    monkeypatch.setattr("lottery_backend.routers.ballot.secrets.randbelow", lambda upper_bound: next(random_numbers))
+
+    response = await quick_pick(3, date, async_session, user)
+    assert response["ballots"] == ["0000000000000001", "0000000000000003", "0000000000000004"]
+    assert len(get_ballots_for_date(date)) == 4
+    clear_ballots_on_date(date)  # clear the DB
+
+
+@pytest.mark.asyncio
+async def test_submit_ballot_batch(async_session):
+    """
+    Tests the endpoint submit_ballot_batch reporting the result of each ballot
+    """
+    date = datetime.date.today() + datetime.timedelta(days=1)
+    clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    add_ballot_for_user(user.id, "9876543211234567", date)
+    submissions = [
+        BallotSubmission(ballot=DEFAULT_BALLOT, date=date),  # valid ballot & date
+        BallotSubmission(ballot=DEFAULT_BALLOT, date=date),  # duplicate within the request
+        BallotSubmission(ballot="9876543211234567", date=date),  # already existing ballot
+        BallotSubmission(ballot="123456789", date=date),  # invalid ballot
+        BallotSubmission(ballot="1234567890987654", date=datetime.date.today() - datetime.timedelta(days=1)),
+        BallotSubmission(ballot="1928374654637281", date=date),  # valid ballot & date
+    ]
+    response = await submit_ballot_batch(submissions, async_session, user)
+    assert response["result"] == "failed"
+    assert [result["result"] for result in response["ballots"]] == [
+        "successful", "failed", "failed", "failed", "failed", "successful",
+    ]
+    assert sorted(get_ballots_for_date(date)) == sorted([DEFAULT_BALLOT, "9876543211234567", "1928374654637281"])
+    clear_ballots_on_date(date)  # clear the DB
+
+    with pytest.raises(HTTPException):
+        await submit_ballot_batch(
+            [BallotSubmission(ballot=DEFAULT_BALLOT, date=date)] * (MAX_BATCH_SIZE + 1), async_session, user,
+        )
+
+
 @pytest.mark.parametrize(
     "date, expected_ballot_count",
     [
@@ -67,7 +198,7 @@ async def test_submit_ballot(ballot, date, exception_raised):
     ],
 )
 @pytest.mark.asyncio
-async def test_ballot_list(date, expected_ballot_count):
+async def test_ballot_list(date, expected_ballot_count, async_session):
     """
     Tests the endpoint ballot_list
 
@@ -77,11 +208,97 @@ async def test_ballot_list(date, expected_ballot_count):
     """
     clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
     prepare_ballots_on_date(date)
-    ballots = await ballot_list(date, next(get_session()))
+    ballots = await ballot_list(date, async_session)
     assert len(ballots) == expected_ballot_count
     clear_ballots_on_date(date)  # clear the DB
 
 
+@pytest.mark.asyncio
+async def test_ballot_list_paginated(async_session):
+    """
+    Tests listing the ballots page by page, each page starting after the last ballot of the previous one
+    """
+    date = datetime.date.today() - datetime.timedelta(days=3)
+    clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+    prepare_ballots_on_date(date)
+    first_page = await ballot_list(date, async_session, None, after=None, limit=2)
+    assert first_page == [DEFAULT_BALLOT, "9876543211234567"]
+    assert await ballot_list(date, async_session, None, after=first_page[-1], limit=2) == ["9876543217654321"]
+    assert await ballot_list(date, async_session, None, after="9876543217654321", limit=2) == []
+
+    for after, limit in (("123", None), (None, 0), (None, MAX_PAGE_SIZE + 1)):
+        with pytest.raises(HTTPException) as exc_info:
+            await ballot_list(date, async_session, None, after=after, limit=limit)
+        assert exc_info.value.status_code == 412
+    clear_ballots_on_date(date)  # clear the DB
+
+
+@pytest.mark.asyncio
+async def test_ballot_list_without_page(async_session, monkeypatch):
+    """
+    Tests that listing the ballots without "limit" & "after" returns the whole day, not a truncated page
+    """
+    monkeypatch.setattr("lottery_backend.routers.ballot.MAX_PAGE_SIZE", 2)
+    date = datetime.date.today() - datetime.timedelta(days=3)
+    clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+    prepare_ballots_on_date(date)
+    ballots = await ballot_list(date, async_session, None, after=None, limit=None)
+    assert sorted(ballots) == [DEFAULT_BALLOT, "9876543211234567", "9876543217654321"]
+    assert await ballot_list(date, async_session, None, after="9876543211234567", limit=None) == ["9876543217654321"]
+    clear_ballots_on_date(date)  # clear the DB
+
+
+@pytest.mark.asyncio
+async def test_my_ballots(async_session):
+    """
+    Tests the endpoint my_ballots listing only the ballots of the logged in user
+    """
+    date = datetime.date.today() - datetime.timedelta(days=3)
+    clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    add_ballot_for_user(user.id, DEFAULT_BALLOT, date)
+    add_ballot_for_user(user.id, "9876543211234567", date)
+    add_ballot_for_user(user.id + 1, "9876543217654321", date)  # ballot of another user
+
+    assert await my_ballots(date, async_session, user) == [DEFAULT_BALLOT, "9876543211234567"]
+    assert await my_ballots(date, async_session, user, after=DEFAULT_BALLOT, limit=1) == ["9876543211234567"]
+    with pytest.raises(HTTPException) as exc_info:
+        await my_ballots(date, async_session, user, limit=MAX_PAGE_SIZE + 1)
+    assert exc_info.value.status_code == 412
+    clear_ballots_on_date(date)  # clear the DB
+
+
+@pytest.mark.parametrize(
+    "output, after, limit, expected_body",
+    [
+        ("ndjson", None, None, f'"{DEFAULT_BALLOT}"\n"9876543211234567"\n"9876543217654321"\n'),
+        ("csv", None, None, f"ballot\n{DEFAULT_BALLOT}\n9876543211234567\n9876543217654321\n"),
+        ("csv", DEFAULT_BALLOT, 1, "ballot\n9876543211234567\n"),
+    ],
+)
+@pytest.mark.asyncio
+async def test_ballot_list_streamed(monkeypatch, output, after, limit, expected_body, async_session):
+    """
+    Tests streaming the ballots line by line
+
+    Args:
+        monkeypatch: fixture to stream the ballots in small chunks
+        output: format of the streamed lines
+        after: ballot to start after
+        limit: max number of ballots to stream
+        expected_body: expected content of the response
+    """
+    monkeypatch.setattr("lottery_backend.routers.ballot.STREAM_CHUNK_SIZE", 2)
+    date = datetime.date.today() - datetime.timedelta(days=3)
+    clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+    prepare_ballots_on_date(date)
+    response = await ballot_list(date, async_session, None, after=after, limit=limit, output=output)
+    assert response.media_type == STREAM_MEDIA_TYPES[output]
+    assert "".join([chunk async for chunk in response.body_iterator]) == expected_body
+    clear_ballots_on_date(date)  # clear the DB
+
+
 @pytest.mark.parametrize(
     "date, winner",
     [
@@ -90,7 +307,7 @@ async def test_ballot_list(date, expected_ballot_count):
     ],
 )
 @pytest.mark.asyncio
-async def test_winner_ballot(date, winner):
+async def test_winner_ballot(date, winner, async_session):
     """
     Tests the endpoint winner_ballot
 
@@ -100,25 +317,30 @@ async def test_winner_ballot(date, winner):
     """
     if winner:  # expecting a happy path
         clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+        remove_draw_result(date)
         prepare_ballots_on_date(date)
-        response = await winner_ballot(date, next(get_session()))
+        add_draw_result(date, winner, count_ballots_for_date(date))
+        response = await winner_ballot(date, async_session)
         assert response["result"] == "successful"
+        assert winner in response["message"]
         clear_ballots_on_date(date)  # clear the DB
+        remove_draw_result(date)
     else:
         with pytest.raises(HTTPException):
-            await winner_ballot(date, next(get_session()))
+            await winner_ballot(date, async_session)
 
 
 
 @pytest.mark.parametrize(
     "date, expected_ballot",
     [
-        (datetime.date.today() - datetime.timedelta(days=1), DEFAULT_BALLOT),  # one ballot on date
+        (datetime.date.today() - datetime.timedelta(days=1), DEFAULT_BALLOT),  # drawn date
         (datetime.date.today() - datetime.timedelta(days=2), None),  # no ballot on date
-        (datetime.date.today() - datetime.timedelta(days=3), None),  # multiple ballots on date
+        (datetime.date.today() - datetime.timedelta(days=3), None),  # multiple ballots on date, not drawn yet
     ],
 )
-def test_get_winner_ballot(date, expected_ballot):
+@pytest.mark.asyncio
+async def test_get_winner_ballot(date, expected_ballot, async_session):
     """
     Tests getting the winner ballot
 
@@ -127,14 +349,17 @@ def test_get_winner_ballot(date, expected_ballot):
          expected_ballot: expected ballot as the winner
     """
     clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+    remove_draw_result(date)
     prepare_ballots_on_date(date)
     if expected_ballot:
-        assert _get_winner_ballot(date, next(get_session())) == expected_ballot
+        add_draw_result(date, expected_ballot, count_ballots_for_date(date))
+        assert await _get_winner_ballot(date, async_session) == expected_ballot
     else:
         with pytest.raises(HTTPException):
-            _get_winner_ballot(date, next(get_session()))
+            await _get_winner_ballot(date, async_session)
             assert False  # make sure code does not reach here!
     clear_ballots_on_date(date)  # clear the DB
+    remove_draw_result(date)
 
 
 @pytest.mark.parametrize(
@@ -168,6 +393,7 @@ def test_control_input_params_validity(ballot, date, exception_raised):
         (DEFAULT_BALLOT, True),  # valid ballot
         ("123456789", False),  # invalid ballot: length should be 16
         ("123456789AB34567", False),  # invalid ballot: should contain only digits
+        ("123456789\u00b234567", False),  # invalid ballot: should contain only ASCII digits
     ],
 )
 def test_check_ballot_validity(ballot, expected_return):
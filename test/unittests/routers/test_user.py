@@ -17,7 +17,6 @@ Unit tests to test classes/functions in user.py
 import pytest
 from fastapi import HTTPException
 
-from lottery_backend.database import get_session
 from lottery_backend.db_models.user import UserOutput
 from lottery_backend.routers.user import register
 from test.unittests.conftest import DEFAULT_USER, DEFAULT_NAME, remove_user
@@ -33,7 +32,7 @@ pytest_plugins = ('pytest_asyncio',)
     ],
 )
 @pytest.mark.asyncio
-async def test_register(username, user_object):
+async def test_register(username, user_object, async_session):
     """
     Tests registering users into db
 
@@ -43,10 +42,10 @@ async def test_register(username, user_object):
     """
     if user_object:
         remove_user(username)  # in case revious execution is interrupted before deleting the user
-        created_user = await register(username, "password", DEFAULT_NAME, "email@email", "123456", next(get_session()))
+        created_user = await register(username, "password", DEFAULT_NAME, "email@email", "123456", async_session)
         assert created_user.username == user_object.username
         assert created_user.full_name == user_object.full_name
         remove_user(username)
     else:
         with pytest.raises(HTTPException):
-            await register(username, "password", DEFAULT_NAME, "email@email", "123456", next(get_session()))
+            await register(username, "password", DEFAULT_NAME, "email@email", "123456", async_session)
@@ -0,0 +1,169 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Unit tests to test classes/functions in ballot_buffer.py
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import asyncio
+import datetime
+
+import pytest
+
+from lottery_backend import ballot_buffer as ballot_buffer_module
+from lottery_backend.ballot_buffer import BallotBuffer
+from lottery_backend.database import add_ballots, clear_ballots_on_date, fetch_user_from_db, get_ballots_for_date, \
+    get_draw_result
+from lottery_backend.exceptions import BallotAlreadyExistsException
+from lottery_backend.exceptions import ConcurrentSubmissionException
+from lottery_backend.lottery_processor import LotteryProcessor
+from test.unittests.conftest import DEFAULT_BALLOT, DEFAULT_USER, remove_draw_result
+
+pytest_plugins = ('pytest_asyncio',)
+
+TEST_DATE = datetime.date.today() - datetime.timedelta(days=10)
+
+
+@pytest.fixture
+def buffer():
+    """
+    Provides a running buffer and clears the ballots it writes
+    """
+    clear_ballots_on_date(TEST_DATE)  # clear the DB in case a previous run is interrupted!
+    ballot_buffer = BallotBuffer(flush_interval=0.05, max_batch_size=100)
+    ballot_buffer.start()
+    yield ballot_buffer
+    ballot_buffer.stop()
+    clear_ballots_on_date(TEST_DATE)  # clear the DB
+
+
+@pytest.fixture
+def user():
+    """
+    Provides the default user
+    """
+    default_user = fetch_user_from_db(DEFAULT_USER)
+    assert default_user  # make sure there is user
+    return default_user
+
+
+@pytest.mark.asyncio
+async def test_submissions_are_grouped(monkeypatch, buffer, user):
+    """
+    Tests that concurrent submissions are written in a single transaction and acknowledged once it is committed
+
+    Args:
+        monkeypatch: fixture to record the written batches
+        buffer: running ballot buffer
+        user: owner of the ballots
+    """
+    batch_sizes = []
+
+    def record_batch(ballots, session):
+        batch_sizes.append(len(ballots))
+        return add_ballots(ballots, session=session)
+
+    monkeypatch.setattr(ballot_buffer_module, "add_ballots", record_batch)
+    ballots = [f"98765432112345{index:02d}" for index in range(50)]
+    await asyncio.gather(*(buffer.submit(user.id, ballot, TEST_DATE) for ballot in ballots))
+    assert batch_sizes == [len(ballots)]
+    assert sorted(get_ballots_for_date(TEST_DATE)) == ballots  # durable once acknowledged
+
+
+@pytest.mark.asyncio
+async def test_duplicated_submissions_are_rejected(buffer, user):
+    """
+    Tests that the already existing ballots and the ones repeated within a batch are rejected individually
+
+    Args:
+        buffer: running ballot buffer
+        user: owner of the ballots
+    """
+    await buffer.submit(user.id, DEFAULT_BALLOT, TEST_DATE)
+    results = await asyncio.gather(
+        buffer.submit(user.id, DEFAULT_BALLOT, TEST_DATE),  # already exists
+        buffer.submit(user.id, "9876543211234567", TEST_DATE),
+        buffer.submit(user.id, "9876543211234567", TEST_DATE),  # repeated within the batch
+        return_exceptions=True,
+    )
+    assert isinstance(results[0], BallotAlreadyExistsException)
+    assert results[1] is None
+    assert isinstance(results[2], BallotAlreadyExistsException)
+    assert sorted(get_ballots_for_date(TEST_DATE)) == [DEFAULT_BALLOT, "9876543211234567"]
+
+
+@pytest.mark.asyncio
+async def test_colliding_batch_is_not_rejected_as_duplicate(monkeypatch, buffer, user):
+    """
+    Tests that a batch colliding with concurrent submissions on every attempt is not reported as duplicated ballots
+
+    Args:
+        monkeypatch: fixture to make every insert collide
+        buffer: running ballot buffer
+        user: owner of the ballots
+    """
+    attempts = []
+
+    def collide(ballots, session):
+        attempts.append(len(ballots))
+        raise BallotAlreadyExistsException("collision")
+
+    monkeypatch.setattr(ballot_buffer_module, "add_ballots", collide)
+    with pytest.raises(ConcurrentSubmissionException):
+        await buffer.submit(user.id, DEFAULT_BALLOT, TEST_DATE)
+    assert attempts == [1] * ballot_buffer_module.MAX_BATCH_INSERT_ATTEMPTS
+    assert get_ballots_for_date(TEST_DATE) == []
+
+
+def test_flush_and_stop_write_queued_submissions(user):
+    """
+    Tests that flushing and stopping do not wait for the flush interval and lose no submission
+
+    Args:
+        user: owner of the ballots
+    """
+    clear_ballots_on_date(TEST_DATE)  # clear the DB in case a previous run is interrupted!
+    buffer = BallotBuffer(flush_interval=60, max_batch_size=100)
+    buffer.start()
+    future = buffer.enqueue(user.id, DEFAULT_BALLOT, TEST_DATE)
+    buffer.flush()
+    assert future.done()
+    assert get_ballots_for_date(TEST_DATE) == [DEFAULT_BALLOT]
+
+    future = buffer.enqueue(user.id, "9876543211234567", TEST_DATE)
+    buffer.stop()
+    assert not buffer.is_running
+    assert future.result() is None
+    assert sorted(get_ballots_for_date(TEST_DATE)) == [DEFAULT_BALLOT, "9876543211234567"]
+    clear_ballots_on_date(TEST_DATE)  # clear the DB
+
+
+def test_draw_flushes_buffer(monkeypatch, user):
+    """
+    Tests that a ballot still queued when the day is drawn takes part in the draw
+
+    Args:
+        monkeypatch: fixture to replace the buffer of the lottery processor
+        user: owner of the ballots
+    """
+    clear_ballots_on_date(TEST_DATE)  # clear the DB in case a previous run is interrupted!
+    remove_draw_result(TEST_DATE)
+    buffer = BallotBuffer(flush_interval=60, max_batch_size=100)
+    monkeypatch.setattr("lottery_backend.lottery_processor.ballot_buffer", buffer)
+    buffer.start()
+    buffer.enqueue(user.id, DEFAULT_BALLOT, TEST_DATE)
+
+    LotteryProcessor(draw_strategy="offset").draw_lottery_for_date(TEST_DATE)
+    assert get_draw_result(TEST_DATE).ballot == DEFAULT_BALLOT
+    buffer.stop()
+    clear_ballots_on_date(TEST_DATE)  # clear the DB
+    remove_draw_result(TEST_DATE)
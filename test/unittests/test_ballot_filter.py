@@ -0,0 +1,160 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Unit tests to test classes/functions in ballot_filter.py
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import datetime
+
+import pytest
+from sqlalchemy import event
+
+from lottery_backend.ballot_filter import BloomFilter, DailyBallotFilters, ballot_filters
+from lottery_backend.database import add_ballots_for_user, clear_ballots_on_date, engine, fetch_user_from_db, \
+    get_existing_ballots
+from lottery_backend.db_models.user_ballot import BallotSubmission, format_ballot
+from lottery_backend.lottery_processor import LotteryProcessor
+from lottery_backend.routers.ballot import submit_ballot_batch
+from test.unittests.conftest import DEFAULT_BALLOT, DEFAULT_USER, remove_draw_result
+
+pytest_plugins = ('pytest_asyncio',)
+
+BALLOT_COUNT = 10000
+TEST_DATE = datetime.date.today() + datetime.timedelta(days=1)
+
+
+@pytest.fixture
+def user():
+    """
+    Provides the default user and clears the ballots of the test day
+    """
+    clear_ballots_on_date(TEST_DATE)  # clear the DB in case a previous run is interrupted!
+    default_user = fetch_user_from_db(DEFAULT_USER)
+    assert default_user  # make sure there is user
+    yield default_user
+    clear_ballots_on_date(TEST_DATE)  # clear the DB
+
+
+@pytest.fixture
+def statements():
+    """
+    Records the SQL statements executed on the DB
+    """
+    executed = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def test_bloom_filter():
+    """
+    Tests that the added ballots are always found and the absent ones rarely, at the targeted rate
+    """
+    bloom_filter = BloomFilter(capacity=BALLOT_COUNT, false_positive_rate=0.01)
+    for index in range(BALLOT_COUNT):
+        bloom_filter.add(format_ballot(index * 7))
+    assert all(format_ballot(index * 7) in bloom_filter for index in range(BALLOT_COUNT))
+    false_positives = sum(format_ballot(index * 7 + 1) in bloom_filter for index in range(BALLOT_COUNT))
+    assert false_positives < BALLOT_COUNT * 0.02
+    assert 0.005 < bloom_filter.estimate_false_positive_rate() < 0.02
+    assert bloom_filter.size_in_bytes < BALLOT_COUNT * 10 / 8 + 1  # ~9.6 bits per ballot at 1%
+
+
+def test_daily_ballot_filters():
+    """
+    Tests the lookups in the filters of the tracked days and the stats of them
+    """
+    filters = DailyBallotFilters(capacity=100, false_positive_rate=0.01)
+    untracked_date = TEST_DATE + datetime.timedelta(days=1)
+    filters.track(TEST_DATE, [DEFAULT_BALLOT])
+    filters.add([("9876543211234567", TEST_DATE), (DEFAULT_BALLOT, untracked_date)])
+
+    untracked, positives = filters.lookup(
+        [(DEFAULT_BALLOT, TEST_DATE), ("9876543211234567", TEST_DATE), ("0000000000000001", TEST_DATE),
+         (DEFAULT_BALLOT, untracked_date)],
+    )
+    assert untracked == [(DEFAULT_BALLOT, untracked_date)]
+    assert positives == [(DEFAULT_BALLOT, TEST_DATE), ("9876543211234567", TEST_DATE)]
+    stats = filters.stats()
+    assert (stats["negatives"], stats["positives"], stats["false_positives"]) == (1, 2, 0)
+    assert stats["days"][str(TEST_DATE)]["ballots"] == 2
+    assert stats["size_in_bytes"] == stats["days"][str(TEST_DATE)]["size_in_bytes"] > 0
+
+    filters.drop(TEST_DATE)
+    assert not filters.is_tracked(TEST_DATE)
+    assert filters.stats()["days"] == {}
+
+
+def test_existing_ballots_with_filter(user, statements):
+    """
+    Tests that the negative lookups do not query the DB and the false positives are counted
+
+    Args:
+        user: owner of the ballots
+        statements: executed SQL statements
+    """
+    add_ballots_for_user(user.id, [(DEFAULT_BALLOT, TEST_DATE)])
+    ballot_filters.track(TEST_DATE, [DEFAULT_BALLOT, "9876543211234567"])  # the latter is a false positive
+
+    statements.clear()
+    assert get_existing_ballots([("0000000000000001", TEST_DATE)], use_filter=True) == set()
+    assert not statements
+    assert get_existing_ballots(
+        [(DEFAULT_BALLOT, TEST_DATE), ("9876543211234567", TEST_DATE)], use_filter=True,
+    ) == {(DEFAULT_BALLOT, TEST_DATE)}
+    assert ballot_filters.stats()["false_positives"] == 1
+
+    add_ballots_for_user(user.id, [("0000000000000001", TEST_DATE)])  # inserted ballots are added to the filter
+    assert ballot_filters.lookup([("0000000000000001", TEST_DATE)])[1] == [("0000000000000001", TEST_DATE)]
+
+
+@pytest.mark.asyncio
+async def test_batch_submission_with_stale_filter(user, async_session):
+    """
+    Tests that a ballot missing in the filter, e.g. inserted by another process, is still reported as existing
+
+    Args:
+        user: owner of the ballots
+        async_session: asynchronous session for DB connection
+    """
+    add_ballots_for_user(user.id, [(DEFAULT_BALLOT, TEST_DATE)])
+    ballot_filters.track(TEST_DATE, [])
+    submissions = [
+        BallotSubmission(ballot=DEFAULT_BALLOT, date=TEST_DATE),
+        BallotSubmission(ballot="9876543211234567", date=TEST_DATE),
+    ]
+    response = await submit_ballot_batch(submissions, async_session, user)
+    assert [result["result"] for result in response["ballots"]] == ["failed", "successful"]
+
+
+def test_lottery_processor_tracks_open_days(user):
+    """
+    Tests that the open days are tracked and a day is dropped when it is drawn
+
+    Args:
+        user: owner of the ballots
+    """
+    add_ballots_for_user(user.id, [(DEFAULT_BALLOT, TEST_DATE)])
+    lottery_proc = LotteryProcessor(draw_strategy="offset")
+    lottery_proc.track_open_lottery_days()
+    assert ballot_filters.is_tracked(datetime.date.today())
+    assert ballot_filters.stats()["days"][str(TEST_DATE)]["ballots"] == 1
+
+    remove_draw_result(TEST_DATE)
+    lottery_proc.draw_lottery_for_date(TEST_DATE)
+    assert not ballot_filters.is_tracked(TEST_DATE)
+    remove_draw_result(TEST_DATE)
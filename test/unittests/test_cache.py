@@ -0,0 +1,124 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Unit tests to test classes/functions in cache.py
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from lottery_backend.cache import LRUCache
+from test.unittests.conftest import DEFAULT_BALLOT
+
+pytest_plugins = ('pytest_asyncio',)
+
+
+class FakeClock:
+    """Clock advanced manually by the tests"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hit_miss_and_ttl():
+    """
+    Tests that a loaded entry is served from the cache until its TTL expires
+    """
+    clock = FakeClock()
+    cache = LRUCache(max_size=2, ttl=10, clock=clock)
+    assert cache.get_or_load("day", lambda: DEFAULT_BALLOT) == DEFAULT_BALLOT
+    assert cache.get_or_load("day", lambda: "unexpected load") == DEFAULT_BALLOT
+    clock.now = 11
+    assert cache.get_or_load("day", lambda: "reloaded") == "reloaded"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_lru_eviction():
+    """
+    Tests that the least recently used entry is evicted beyond the size limit
+    """
+    cache = LRUCache(max_size=2, ttl=10)
+    cache.put("first", 1)
+    cache.put("second", 2)
+    assert cache.get_or_load("first", lambda: None) == 1  # first becomes the most recently used
+    cache.put("third", 3)
+    assert cache.get_or_load("second", lambda: "reloaded") == "reloaded"
+    assert cache.stats()["evictions"] == 2
+    assert cache.stats()["size"] == 2
+
+
+def test_loader_exception_is_not_cached():
+    """
+    Tests that an exception of the loader is propagated and the key is loaded again on the next call
+    """
+    cache = LRUCache(max_size=2, ttl=10)
+
+    def failing_loader():
+        raise KeyError("no winner")
+
+    with pytest.raises(KeyError):
+        cache.get_or_load("day", failing_loader)
+    assert cache.get_or_load("day", lambda: DEFAULT_BALLOT) == DEFAULT_BALLOT
+
+
+def test_concurrent_misses_are_coalesced():
+    """
+    Tests that concurrent misses of the same key call the loader only once
+    """
+    cache = LRUCache(max_size=2, ttl=10)
+    caller_count = 8
+    release = threading.Event()
+    load_calls = []
+
+    def slow_loader():
+        load_calls.append(1)
+        release.wait(timeout=5)
+        return DEFAULT_BALLOT
+
+    with ThreadPoolExecutor(max_workers=caller_count) as executor:
+        futures = [executor.submit(cache.get_or_load, "day", slow_loader) for _ in range(caller_count)]
+        while cache.stats()["misses"] < caller_count:  # wait until every caller has missed the cache
+            threading.Event().wait(0.01)
+        release.set()
+        assert [future.result() for future in futures] == [DEFAULT_BALLOT] * caller_count
+    assert len(load_calls) == 1
+    assert cache.stats()["coalesced"] == caller_count - 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_async_misses_are_coalesced():
+    """
+    Tests that concurrent misses of the same key within the event loop await a single call of the loader
+    """
+    cache = LRUCache(max_size=2, ttl=10)
+    caller_count = 8
+    load_calls = []
+
+    async def slow_loader():
+        load_calls.append(1)
+        await asyncio.sleep(0.05)
+        return DEFAULT_BALLOT
+
+    results = await asyncio.gather(*(cache.get_or_load_async("day", slow_loader) for _ in range(caller_count)))
+    assert results == [DEFAULT_BALLOT] * caller_count
+    assert len(load_calls) == 1
+    assert cache.stats()["coalesced"] == caller_count - 1
+    assert await cache.get_or_load_async("day", slow_loader) == DEFAULT_BALLOT
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,205 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Unit tests to test classes/functions in database.py
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import datetime
+import sqlite3
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import QueuePool
+
+from lottery_backend.async_database import async_engine
+from lottery_backend.database import acquire_draw_lease, add_ballots_for_user, check_ballot_existence, \
+    clear_ballots_on_date, create_database_engine, fetch_user_from_db, get_ballot_at_offset, get_ballots_for_date, \
+    get_existing_ballots, get_user_ballot_page, lock_for_write, release_draw_lease, session_scope
+from lottery_backend.settings import Settings
+from lottery_backend.settings import settings
+from test.unittests.conftest import DEFAULT_BALLOT, DEFAULT_USER
+
+pytest_plugins = ('pytest_asyncio',)
+
+TEST_DATE = datetime.date.today() - datetime.timedelta(days=10)
+
+
+@pytest.mark.parametrize(
+    "exception_ballot, chunk_size, expected_remaining",
+    [
+        (None, 0, []),  # single statement
+        (DEFAULT_BALLOT, 0, [DEFAULT_BALLOT]),  # single statement keeping the winner
+        (DEFAULT_BALLOT, 2, [DEFAULT_BALLOT]),  # chunks smaller than the ballot count
+        (DEFAULT_BALLOT, 6, [DEFAULT_BALLOT]),  # chunk size equal to the ballot count to delete
+        (None, 100, []),  # a single chunk
+    ],
+)
+def test_clear_ballots_on_date(exception_ballot, chunk_size, expected_remaining):
+    """
+    Tests clearing the ballots of a day with & without chunks
+
+    Args:
+        exception_ballot: ballot which should not be removed
+        chunk_size: max number of ballots deleted per transaction
+        expected_remaining: ballots expected to remain on the day
+    """
+    clear_ballots_on_date(TEST_DATE)  # clear the DB in case a previous run is interrupted!
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    ballots = [DEFAULT_BALLOT] + [f"98765432112345{index:02d}" for index in range(6)]
+    add_ballots_for_user(user.id, [(ballot, TEST_DATE) for ballot in ballots])
+
+    deleted_count = clear_ballots_on_date(TEST_DATE, exception_ballot, chunk_size=chunk_size)
+    assert deleted_count == len(ballots) - len(expected_remaining)
+    assert get_ballots_for_date(TEST_DATE) == expected_remaining
+    clear_ballots_on_date(TEST_DATE)  # clear the DB
+
+
+def test_ballots_stored_as_integers():
+    """
+    Tests that the ballots are stored as integers and read back as zero-padded 16-digit strings
+    """
+    clear_ballots_on_date(TEST_DATE)  # clear the DB in case a previous run is interrupted!
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    ballots = ["0000000000000007", "0000000000000010", DEFAULT_BALLOT]
+    add_ballots_for_user(user.id, [(ballot, TEST_DATE) for ballot in ballots])
+
+    with session_scope() as session:
+        stored_types = session.execute(text("SELECT DISTINCT typeof(ballot) FROM userballot")).all()
+    assert stored_types == [("integer",)]
+    assert sorted(get_ballots_for_date(TEST_DATE)) == ballots
+    assert get_ballot_at_offset(TEST_DATE, 1) == "0000000000000010"  # ordered numerically
+    assert check_ballot_existence("0000000000000007", TEST_DATE)
+    assert get_existing_ballots([("0000000000000007", TEST_DATE), ("0000000000000008", TEST_DATE)]) == {
+        ("0000000000000007", TEST_DATE),
+    }
+    clear_ballots_on_date(TEST_DATE)  # clear the DB
+
+
+def test_get_user_ballot_page():
+    """
+    Tests that the ballots of a user are paged through the (user_id, date, ballot) index
+    """
+    clear_ballots_on_date(TEST_DATE)  # clear the DB in case a previous run is interrupted!
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    user_ballots = [f"98765432112345{index:02d}" for index in range(5)]
+    add_ballots_for_user(user.id, [(ballot, TEST_DATE) for ballot in user_ballots])
+    add_ballots_for_user(user.id + 1, [(f"12345678912345{index:02d}", TEST_DATE) for index in range(5)])
+
+    assert get_user_ballot_page(user.id, TEST_DATE, after=None, limit=3) == user_ballots[:3]
+    assert get_user_ballot_page(user.id, TEST_DATE, after=user_ballots[2], limit=3) == user_ballots[3:]
+    assert get_user_ballot_page(user.id, TEST_DATE - datetime.timedelta(days=1), after=None, limit=3) == []
+    with session_scope() as session:
+        query_plan = session.execute(
+            text(
+                "EXPLAIN QUERY PLAN SELECT ballot FROM userballot WHERE user_id = :user_id AND date = :date "
+                "AND ballot > :after ORDER BY ballot LIMIT 3",
+            ),
+            {"user_id": user.id, "date": str(TEST_DATE), "after": 0},
+        ).all()
+    assert "ix_userballot_user_id_date_ballot" in query_plan[0][-1]
+    assert all("TEMP B-TREE" not in row[-1] for row in query_plan)  # no sorting, the index is in ballot order
+    clear_ballots_on_date(TEST_DATE)  # clear the DB
+
+
+def test_draw_lease():
+    """
+    Tests that the lease of a day is held by a single worker until it is released or expired
+    """
+    release_draw_lease(TEST_DATE, "worker-1")  # clear the DB in case a previous run is interrupted!
+    release_draw_lease(TEST_DATE, "worker-2")
+    assert acquire_draw_lease(TEST_DATE, "worker-1", ttl=60)
+    assert not acquire_draw_lease(TEST_DATE, "worker-2", ttl=60)
+    assert acquire_draw_lease(TEST_DATE, "worker-1", ttl=60)  # renewed by its owner
+    release_draw_lease(TEST_DATE, "worker-2")  # not held by the worker, no-op
+    assert not acquire_draw_lease(TEST_DATE, "worker-2", ttl=60)
+
+    release_draw_lease(TEST_DATE, "worker-1")
+    assert acquire_draw_lease(TEST_DATE, "worker-2", ttl=-1)  # already expired
+    assert acquire_draw_lease(TEST_DATE, "worker-1", ttl=60)  # taken over
+    assert not acquire_draw_lease(TEST_DATE, "worker-2", ttl=60)
+    release_draw_lease(TEST_DATE, "worker-1")  # clear the DB
+
+
+def test_lock_for_write():
+    """
+    Tests that the time waited for the write lock held by another connection is measured
+    """
+    lock_taken = threading.Event()
+
+    def hold_write_lock():
+        connection = sqlite3.connect(make_url(settings.database_url).database, isolation_level=None)
+        connection.execute("BEGIN IMMEDIATE")
+        lock_taken.set()
+        time.sleep(0.3)
+        connection.execute("COMMIT")
+        connection.close()
+
+    thread = threading.Thread(target=hold_write_lock)
+    thread.start()
+    assert lock_taken.wait(5)
+    with session_scope() as session:
+        assert lock_for_write(session) > 0.1
+        session.commit()
+    thread.join()
+    with session_scope() as session:
+        assert lock_for_write(session) < 0.1  # the lock is free
+        session.rollback()
+
+
+def test_create_database_engine(tmp_path):
+    """
+    Tests that the engine pools its connections and sets the configured PRAGMAs on them
+
+    Args:
+        tmp_path: temporary directory of the DB file
+    """
+    profile = Settings(
+        database_url=f"sqlite:///{tmp_path / 'profile.db'}",
+        database_pool_size=3,
+        sqlite_synchronous="full",
+        sqlite_cache_size=-1000,
+        sqlite_busy_timeout=1234,
+    )
+    engine = create_database_engine(profile)
+    assert isinstance(engine.pool, QueuePool)
+    assert not engine.echo
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 2  # FULL
+        assert connection.exec_driver_sql("PRAGMA cache_size").scalar() == -1000
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 1234
+        assert connection.exec_driver_sql("PRAGMA mmap_size").scalar() == profile.sqlite_mmap_size
+    engine.dispose()
+
+    engine = create_database_engine(profile.copy(update={"database_pool_size": 0, "sqlite_journal_mode": "delete"}))
+    assert isinstance(engine.pool, NullPool)
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "delete"
+    engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_async_engine_pragmas():
+    """
+    Tests that the PRAGMAs are set on the connections of the asynchronous engine as well
+    """
+    async with async_engine.connect() as connection:
+        assert (await connection.exec_driver_sql("PRAGMA journal_mode")).scalar() == "wal"
+        assert (await connection.exec_driver_sql("PRAGMA synchronous")).scalar() == 1  # NORMAL
@@ -14,40 +14,378 @@ Unit tests to test classes/functions in lottery_processor.py
 #                                                                              #
 # -----------------------------------------------------------------------------#
 """
-from time import sleep
+import collections
+import contextlib
+import datetime
+import multiprocessing
+import threading
+import time
+import tracemalloc
 
-import schedule
+import pytest
 
+from lottery_backend import database
 from lottery_backend import lottery_processor
-from lottery_backend.lottery_processor import LotteryProcessor
-from test.unittests.conftest import DEFAULT_BALLOT
+from lottery_backend.ballot_filter import ballot_filters
+from lottery_backend.cache import winner_cache
+from lottery_backend.database import add_ballots_for_user, clear_ballots_on_date, fetch_user_from_db, \
+    get_ballots_for_date, get_draw_result, session_scope
+from lottery_backend.lottery_processor import DRAW_STRATEGIES, LotteryProcessor
+from test.unittests.conftest import DEFAULT_BALLOT, DEFAULT_USER, FakeClock, remove_draw_result
+
+STUB_BALLOTS = [DEFAULT_BALLOT, "9876543211234567", "1928374654637281", "1111111111111111", "2222222222222222"]
+DRAW_COUNT = 5000
+WORKER_PROCESS_COUNT = 4
+CHI_SQUARE_LIMIT = 25  # chi-square with 4 degrees of freedom exceeds it with a probability below 0.01%
 
 
 def test_lottery_processor(monkeypatch):
     """
-    Tests the lottery processor class functionality and internal structures
+    Tests that the lottery processor sleeps until midnight, draws the completed day and stops without delay
 
     Args:
-        monkeypatch: To stub some functions
+        monkeypatch: To stub the draw
     """
-    def stub_get_ballots_for_date(*_args, **_kwargs):
-        """Returns mocked ballot list"""
-        return [DEFAULT_BALLOT, "9876543211234567", "1928374654637281"]
-
-    def stub_clear_ballots_on_date(*_args, **_kwargs):
-        """Stubs the DB operation"""
-        pass
+    clock = FakeClock(datetime.datetime(2023, 8, 20, 23, 59, 59))
+    lottery_proc = lottery_processor.LotteryProcessor(clock=clock)
+    assert lottery_proc.scheduler.get_next_run() == datetime.datetime(2023, 8, 21)
+    drawn_dates = []
+    drawn = threading.Event()
 
-    monkeypatch.setattr(lottery_processor, "get_ballots_for_date", stub_get_ballots_for_date)
-    monkeypatch.setattr(lottery_processor, "clear_ballots_on_date", stub_clear_ballots_on_date)
+    def stub_draw_lottery_for_date(date):
+        """Records the drawn day"""
+        drawn_dates.append(date)
+        drawn.set()
 
-    assert not schedule.get_jobs()  # there is no scheduled job
-    lottery_proc = lottery_processor.LotteryProcessor()
-    assert len(schedule.get_jobs()) == 1  # LotteryProcessor introduced a scheduled task
+    monkeypatch.setattr(lottery_proc, "draw_lottery_for_date", stub_draw_lottery_for_date)
+    monkeypatch.setattr(lottery_proc, "track_open_lottery_days", lambda: None)
+    monkeypatch.setattr(lottery_proc, "catch_up_missed_draws", lambda: [])
+    monkeypatch.setattr(lottery_proc, "resume_interrupted_purges", lambda: [])
     lottery_proc.start()
-    sleep(5)  # wait for a couple of thread iterations
+    assert not drawn.wait(0.1)  # nothing is due before midnight
+
+    clock.advance(datetime.timedelta(seconds=2))
+    lottery_proc.scheduler.wake()
+    assert drawn.wait(5)
+    assert drawn_dates == [datetime.date(2023, 8, 20)]
+    assert lottery_proc.scheduler.get_next_run() == datetime.datetime(2023, 8, 22)
+
     assert not lottery_proc.stop_requested
+    stop_time = time.perf_counter()
     lottery_proc.stop()
     assert lottery_proc.stop_requested
-    lottery_proc.join()
-    assert not schedule.get_jobs()  # the scheduled job is cancelled
+    lottery_proc.join(timeout=5)
+    assert not lottery_proc.is_alive()
+    assert time.perf_counter() - stop_time < 0.5  # the wait for the next midnight is interrupted
+    assert not lottery_proc.scheduler.jobs  # the scheduled job is cancelled
+
+
+def test_lottery_processor_without_draw(monkeypatch):
+    """
+    Tests that a processor of a worker whose draws are disabled only drops the ballot filter of the completed day
+
+    Args:
+        monkeypatch: To detect any draw
+    """
+    clock = FakeClock(datetime.datetime(2023, 8, 21))
+    lottery_proc = lottery_processor.LotteryProcessor(clock=clock, draw_enabled=False)
+    monkeypatch.setattr(lottery_proc, "draw_lottery_for_date", lambda date: pytest.fail(f"{date} is drawn"))
+    monkeypatch.setattr(lottery_proc, "catch_up_missed_draws", lambda: pytest.fail("missed days are drawn"))
+    monkeypatch.setattr(lottery_proc, "resume_interrupted_purges", lambda: pytest.fail("ballots are purged"))
+    monkeypatch.setattr(lottery_proc, "track_open_lottery_days", lambda: None)
+    ballot_filters.track(datetime.date(2023, 8, 20), [DEFAULT_BALLOT])
+
+    lottery_proc._draw_lottery()  # noqa: WPS437 the job run at midnight
+    assert not ballot_filters.is_tracked(datetime.date(2023, 8, 20))
+    lottery_proc.stop()
+    lottery_proc.run()  # exits right away without catching up the missed draws
+
+
+@pytest.mark.parametrize("strategy", sorted(DRAW_STRATEGIES))
+def test_draw_strategy_uniformity(monkeypatch, strategy):
+    """
+    Tests that each draw strategy picks the ballots as uniformly as the original list-based implementation
+
+    Args:
+        monkeypatch: To stub the DB functions
+        strategy: name of the draw strategy
+    """
+    monkeypatch.setattr(lottery_processor, "get_ballots_for_date", lambda date, session: list(STUB_BALLOTS))
+    monkeypatch.setattr(lottery_processor, "get_ballot_at_offset", lambda date, offset, session: STUB_BALLOTS[offset])
+    monkeypatch.setattr(lottery_processor, "stream_ballots_for_date", lambda date, session: iter(STUB_BALLOTS))
+
+    select_winner = DRAW_STRATEGIES[strategy]
+    counts = collections.Counter(
+        select_winner(datetime.date.today(), len(STUB_BALLOTS), None) for _ in range(DRAW_COUNT)
+    )
+    expected = DRAW_COUNT / len(STUB_BALLOTS)
+    chi_square = sum((counts[ballot] - expected) ** 2 / expected for ballot in STUB_BALLOTS)
+    assert set(counts) == set(STUB_BALLOTS)
+    assert chi_square < CHI_SQUARE_LIMIT
+
+
+@pytest.mark.parametrize("strategy", sorted(DRAW_STRATEGIES))
+def test_draw_strategy_on_db(strategy):
+    """
+    Tests that each draw strategy picks one of the ballots stored in the DB for the day
+
+    Args:
+        strategy: name of the draw strategy
+    """
+    date = datetime.date.today() - datetime.timedelta(days=10)
+    clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+    select_winner = DRAW_STRATEGIES[strategy]
+    with session_scope() as session:
+        assert select_winner(date, 0, session) is None  # no ballot on the day
+
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    add_ballots_for_user(user.id, [(ballot, date) for ballot in STUB_BALLOTS])
+    with session_scope() as session:
+        assert select_winner(date, len(STUB_BALLOTS), session) in STUB_BALLOTS
+    clear_ballots_on_date(date)  # clear the DB
+
+
+def test_draw_lottery_for_date():
+    """
+    Tests that a draw records the draw result and keeps only the winning ballot of the day
+    """
+    date = datetime.date.today() - datetime.timedelta(days=10)
+    clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+    remove_draw_result(date)
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    add_ballots_for_user(user.id, [(ballot, date) for ballot in STUB_BALLOTS])
+
+    lottery_proc = LotteryProcessor(draw_strategy="offset")
+    lottery_proc.draw_lottery_for_date(date)
+    draw_result = get_draw_result(date)
+    assert draw_result.ballot in STUB_BALLOTS
+    assert draw_result.user_id == user.id
+    assert draw_result.ballot_count == len(STUB_BALLOTS)
+    assert get_ballots_for_date(date) == [draw_result.ballot]
+    assert winner_cache.get_or_load(date, lambda: None) == draw_result.ballot  # cache is warmed by the draw
+    metrics = lottery_proc.last_draw_metrics.as_dict()
+    assert list(metrics["phases"]) == ["snapshot", "select", "persist", "purge"]
+    assert [phase["rows"] for phase in metrics["phases"].values()] == [len(STUB_BALLOTS), 1, 1, len(STUB_BALLOTS) - 1]
+    assert metrics["duration"] == pytest.approx(sum(phase["duration"] for phase in metrics["phases"].values()))
+
+    lottery_proc.draw_lottery_for_date(date)  # drawing the same day again does not change the result
+    assert get_draw_result(date).ballot == draw_result.ballot
+    clear_ballots_on_date(date)  # clear the DB
+    remove_draw_result(date)
+
+
+@pytest.mark.parametrize(
+    "latency_ceiling, expected_chunk_sizes",
+    [
+        (60, [2, 4, 8, 8, 8, 8, 8, 8]),  # chunks grow up to the max size while they are fast
+        (1e-9, [8, 4, 2] + [1] * 36),  # chunks shrink down to the min size while they are slow
+        (0, [8] * 7),  # no adaptation
+    ],
+)
+def test_purge_chunks_adapt_to_latency_ceiling(monkeypatch, latency_ceiling, expected_chunk_sizes):
+    """
+    Tests that the purge shrinks its chunks holding the write lock longer than the ceiling and grows the fast ones
+
+    Args:
+        monkeypatch: To tune the purge
+        latency_ceiling: max seconds a chunk may hold the write lock
+        expected_chunk_sizes: chunk sizes the purge is expected to use
+    """
+    date = datetime.date.today() - datetime.timedelta(days=10)
+    clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+    remove_draw_result(date)
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    add_ballots_for_user(user.id, [(f"{index:016d}", date) for index in range(50)])
+    monkeypatch.setattr(lottery_processor.settings, "purge_chunk_size", 8)
+    monkeypatch.setattr(lottery_processor.settings, "draw_purge_latency_ceiling", latency_ceiling)
+    monkeypatch.setattr(lottery_processor.settings, "draw_purge_pause", 0)
+    monkeypatch.setattr(lottery_processor, "INITIAL_PURGE_CHUNK_SIZE", 2 if latency_ceiling == 60 else 8)
+    monkeypatch.setattr(lottery_processor, "MIN_PURGE_CHUNK_SIZE", 1)
+    chunk_sizes = []
+
+    def record_chunk(date, exception_ballot, chunk_size, session):
+        chunk_sizes.append(chunk_size)
+        return database.delete_ballot_chunk(date, exception_ballot, chunk_size, session=session)
+
+    monkeypatch.setattr(lottery_processor, "delete_ballot_chunk", record_chunk)
+    lottery_proc = LotteryProcessor(draw_strategy="offset")
+    winning_ballot = lottery_proc.draw_lottery_for_date(date)
+    assert chunk_sizes == expected_chunk_sizes
+    assert get_ballots_for_date(date) == [winning_ballot]
+    assert lottery_proc.last_draw_metrics.as_dict()["phases"]["purge"]["rows"] == 49
+    clear_ballots_on_date(date)  # clear the DB
+    remove_draw_result(date)
+
+
+def test_draw_memory_is_bounded(monkeypatch):
+    """
+    Tests that consecutive draws do not accumulate memory, each draw releases its session once it is done
+
+    Args:
+        monkeypatch: To silence the SQL logs & to check the sessions opened by the draws
+    """
+    monkeypatch.setattr(database.engine, "echo", False)  # log records of the SQL are retained by pytest
+    closed_sessions = collections.Counter()
+
+    @contextlib.contextmanager
+    def checked_session_scope(session=None):
+        with session_scope(session) as scoped_session:
+            yield scoped_session
+        if session is None:  # closed on exit, without any loaded row nor transaction left
+            assert not scoped_session.identity_map
+            assert not scoped_session.in_transaction()
+            closed_sessions["draw"] += 1
+
+    monkeypatch.setattr(lottery_processor, "session_scope", checked_session_scope)
+    lottery_proc = LotteryProcessor(draw_strategy="offset")
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    date = datetime.date.today() - datetime.timedelta(days=10)
+    clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+    remove_draw_result(date)
+
+    def draw_many(count):
+        for _ in range(count):
+            add_ballots_for_user(user.id, [(ballot, date) for ballot in STUB_BALLOTS])
+            assert lottery_proc.draw_lottery_for_date(date) in STUB_BALLOTS  # loads & purges the ballots
+            clear_ballots_on_date(date)
+            remove_draw_result(date)
+
+    draw_many(200)  # warm up the connection pool and the compiled statement cache
+    tracemalloc.start()
+    snapshot = tracemalloc.take_snapshot()
+    draw_many(200)
+    growth = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(snapshot, "filename"))
+    tracemalloc.stop()
+    assert growth < 256 * 1024  # a leaked session per draw would grow far beyond it
+    assert closed_sessions["draw"] >= 400
+
+
+def test_catch_up_missed_draws(monkeypatch):
+    """
+    Tests that the past days missed while the service was down are drawn concurrently, each one independently
+
+    Args:
+        monkeypatch: To limit the worker threads and to fail one of the draws
+    """
+    today = datetime.date.today()
+    missed_dates = [today - datetime.timedelta(days=days) for days in (33, 32, 31)]
+    failing_date = today - datetime.timedelta(days=30)
+    drawn_date = today - datetime.timedelta(days=34)
+    all_dates = [drawn_date, *missed_dates, failing_date]
+    for date in all_dates:
+        clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+        remove_draw_result(date)
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    add_ballots_for_user(user.id, [(ballot, date) for date in all_dates for ballot in STUB_BALLOTS])
+    lottery_proc = LotteryProcessor(draw_strategy="offset")
+    lottery_proc.draw_lottery_for_date(drawn_date)
+    undrawn_dates = database.get_undrawn_lottery_dates(before=today)
+    assert set(missed_dates + [failing_date]) <= set(undrawn_dates)
+    assert drawn_date not in undrawn_dates
+
+    draw_lottery_for_date = lottery_proc.draw_lottery_for_date
+    threads = set()
+
+    def draw_or_fail(date):
+        threads.add(threading.current_thread().name)
+        if date == failing_date:
+            raise RuntimeError("DB is gone")
+        draw_lottery_for_date(date)
+
+    monkeypatch.setattr(lottery_processor.settings, "draw_catch_up_workers", 2)
+    monkeypatch.setattr(lottery_proc, "draw_lottery_for_date", draw_or_fail)
+    drawn_dates = lottery_proc.catch_up_missed_draws()
+    assert set(missed_dates) <= set(drawn_dates)
+    assert failing_date not in drawn_dates
+    assert all(name.startswith("draw-catch-up") for name in threads) and len(threads) <= 2
+    for date in missed_dates:
+        assert get_ballots_for_date(date) == [get_draw_result(date).ballot]
+    assert failing_date in database.get_undrawn_lottery_dates(before=today)  # retried on the next startup
+
+    for date in all_dates:
+        clear_ballots_on_date(date)  # clear the DB
+        remove_draw_result(date)
+
+
+def test_resume_interrupted_purges():
+    """
+    Tests that the losing ballots of a day whose draw is interrupted during the purge are deleted on startup
+    """
+    today = datetime.date.today()
+    interrupted_date = today - datetime.timedelta(days=36)
+    leased_date = today - datetime.timedelta(days=35)
+    for date in (interrupted_date, leased_date):
+        clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+        remove_draw_result(date)
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    add_ballots_for_user(
+        user.id, [(ballot, date) for date in (interrupted_date, leased_date) for ballot in STUB_BALLOTS],
+    )
+    for date in (interrupted_date, leased_date):
+        database.add_draw_result(date, DEFAULT_BALLOT, len(STUB_BALLOTS))  # drawn but not purged
+    assert database.acquire_draw_lease(leased_date, owner="other-worker", ttl=60)  # still being purged
+    assert {interrupted_date, leased_date} <= set(database.get_unpurged_lottery_dates(before=today))
+    assert not {interrupted_date, leased_date} & set(database.get_undrawn_lottery_dates(before=today))
+
+    lottery_proc = LotteryProcessor()
+    purged_dates = lottery_proc.resume_interrupted_purges()
+    assert interrupted_date in purged_dates and leased_date not in purged_dates
+    assert get_ballots_for_date(interrupted_date) == [DEFAULT_BALLOT]
+    assert len(get_ballots_for_date(leased_date)) == len(STUB_BALLOTS)
+
+    database.release_draw_lease(leased_date, owner="other-worker")
+    for date in (interrupted_date, leased_date):
+        clear_ballots_on_date(date)  # clear the DB
+        remove_draw_result(date)
+
+
+def _draw_in_process(date, barrier, results):
+    """
+    Draws the day in a separate worker process, right when the other workers do
+
+    Args:
+        date: lottery day to draw
+        barrier: barrier shared by the workers
+        results: queue of the winning ballots drawn by the workers
+    """
+    lottery_proc = LotteryProcessor(draw_strategy="offset")
+    barrier.wait()
+    results.put(lottery_proc.draw_lottery_for_date(date))
+
+
+def test_draw_by_multiple_processes():
+    """
+    Tests that a single worker process draws the day when several of them try at the same time
+    """
+    date = datetime.date.today() - datetime.timedelta(days=10)
+    clear_ballots_on_date(date)  # clear the DB in case a previous run is interrupted!
+    remove_draw_result(date)
+    user = fetch_user_from_db(DEFAULT_USER)
+    assert user  # make sure there is user
+    add_ballots_for_user(user.id, [(ballot, date) for ballot in STUB_BALLOTS])
+
+    context = multiprocessing.get_context("spawn")  # each worker has its own engine & connections
+    barrier = context.Barrier(WORKER_PROCESS_COUNT)
+    results = context.Queue()
+    workers = [
+        context.Process(target=_draw_in_process, args=(date, barrier, results)) for _ in range(WORKER_PROCESS_COUNT)
+    ]
+    for worker in workers:
+        worker.start()
+    winners = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    drawn = [winner for winner in winners if winner]
+    assert len(drawn) == 1  # the others skipped the day
+    assert get_draw_result(date).ballot == drawn[0]
+    assert get_ballots_for_date(date) == drawn  # the winner is not deleted by the other workers
+    clear_ballots_on_date(date)  # clear the DB
+    remove_draw_result(date)
@@ -0,0 +1,195 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Unit tests to test classes/functions in main.py
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import os
+
+import pytest
+
+from lottery_backend import lottery
+from lottery_backend import lottery_processor
+from lottery_backend import main
+from lottery_backend.settings import settings
+
+
+class StubProcessor:
+    """Records how the lottery processor of the main process is run"""
+
+    instances = []
+
+    def __init__(self) -> None:
+        """
+        Initializes the StubProcessor object
+        """
+        self.events = []
+        StubProcessor.instances.append(self)
+
+    def start(self) -> None:
+        """Records the start"""
+        self.events.append("start")
+
+    def stop(self) -> None:
+        """Records the stop request"""
+        self.events.append("stop")
+
+    def join(self) -> None:
+        """Records the wait for the exit"""
+        self.events.append("join")
+
+
+@pytest.fixture(autouse=True)
+def environment(monkeypatch):
+    """
+    Isolates the environment variables set for the workers, without any LOTTERY_ variable
+    """
+    isolated_environment = {name: value for name, value in os.environ.items() if not name.startswith("LOTTERY_")}
+    monkeypatch.setattr(os, "environ", isolated_environment)
+    return isolated_environment
+
+
+@pytest.fixture
+def uvicorn_runs(monkeypatch):
+    """
+    Records the arguments uvicorn is run with instead of serving, together with the environment of the workers
+    """
+    runs = []
+
+    def stub_run(app, **options):
+        """Records the run"""
+        runs.append((app, options, os.environ.get("LOTTERY_DRAW_ENABLED")))
+
+    monkeypatch.setattr(main.uvicorn, "run", stub_run)
+    return runs
+
+
+def test_parse_args():
+    """
+    Tests that the development server is run by default, the production one only on request
+    """
+    args = main.parse_args([])
+    assert not args.production
+    assert args.workers is None
+    assert main.parse_args(["--workers", "3", "--backlog", "128"]).backlog == 128
+
+
+def test_main_with_production_server(monkeypatch, uvicorn_runs):
+    """
+    Tests that the production server runs a worker per CPU core unless the worker count is given
+
+    Args:
+        monkeypatch: To isolate the settings changed for the workers
+        uvicorn_runs: fixture recording the uvicorn runs
+    """
+    monkeypatch.setattr(settings, "ballot_filter_enabled", settings.ballot_filter_enabled)
+    monkeypatch.setattr(lottery_processor, "LotteryProcessor", StubProcessor)
+    monkeypatch.setattr(os, "cpu_count", lambda: 3)
+
+    main.main(["--production"])
+    [(app, options, draw_enabled)] = uvicorn_runs
+    assert app == main.APP
+    assert options["workers"] == 3
+    assert not options.get("reload", False)
+    assert draw_enabled == "false"
+
+
+def test_main_with_several_workers(monkeypatch, uvicorn_runs, capsys):
+    """
+    Tests that the lottery is drawn by the main process only, around the lifetime of the workers
+
+    Args:
+        monkeypatch: To isolate the environment & settings changed for the workers
+        uvicorn_runs: fixture recording the uvicorn runs
+        capsys: fixture capturing the startup warnings
+    """
+    monkeypatch.setattr(settings, "ballot_filter_enabled", settings.ballot_filter_enabled)
+    monkeypatch.setattr(lottery_processor, "LotteryProcessor", StubProcessor)
+    StubProcessor.instances.clear()
+
+    main.main(["--workers", "4", "--timeout-keep-alive", "30", "--no-access-log"])
+    [(app, options, draw_enabled)] = uvicorn_runs
+    assert app == main.APP
+    assert options["workers"] == 4
+    assert options["timeout_keep_alive"] == 30
+    assert not options["access_log"]
+    assert options["http"] == "httptools"
+    assert draw_enabled == "false"  # the workers do not draw
+    assert os.environ["LOTTERY_SECRET_KEY"] == settings.secret_key  # shared by the workers
+    assert not settings.ballot_filter_enabled
+    assert "LOTTERY_BALLOT_BUFFER_ENABLED" not in os.environ  # kept as configured
+    assert "logged out access token is still accepted by the other workers" in capsys.readouterr().out
+    [processor] = StubProcessor.instances
+    assert processor.events == ["start", "stop", "join"]
+
+
+def test_main_with_several_workers_disables_ballot_buffer(monkeypatch, uvicorn_runs):
+    """
+    Tests that the workers do not queue ballots the draw of the main process cannot flush
+
+    Args:
+        monkeypatch: To isolate the settings changed for the workers
+        uvicorn_runs: fixture recording the uvicorn runs
+    """
+    monkeypatch.setattr(settings, "ballot_filter_enabled", settings.ballot_filter_enabled)
+    monkeypatch.setattr(settings, "ballot_buffer_enabled", True)
+    monkeypatch.setattr(lottery_processor, "LotteryProcessor", StubProcessor)
+
+    main.main(["--workers", "2"])
+    assert len(uvicorn_runs) == 1
+    assert os.environ["LOTTERY_BALLOT_BUFFER_ENABLED"] == "false"
+
+
+@pytest.mark.parametrize("argv", [["--workers", "1"], ["--production", "--workers", "1"], []])
+def test_main_with_single_process(monkeypatch, uvicorn_runs, argv):
+    """
+    Tests that a single process serves the requests and draws the lottery itself, restarted on code changes by default
+
+    Args:
+        monkeypatch: To detect a lottery processor started by the main process
+        uvicorn_runs: fixture recording the uvicorn runs
+        argv: command line arguments
+    """
+    monkeypatch.setattr(lottery_processor, "LotteryProcessor", StubProcessor)
+    StubProcessor.instances.clear()
+
+    main.main(argv)
+    [(app, options, draw_enabled)] = uvicorn_runs
+    assert app == main.APP
+    assert draw_enabled is None
+    assert options.get("reload", False) == (not argv)
+    assert not StubProcessor.instances
+
+
+def test_profile_startup(monkeypatch, uvicorn_runs, capsys):
+    """
+    Tests that the startup profile runs the startup of a worker, without drawing nor serving
+
+    Args:
+        monkeypatch: To start a lottery processor of a worker instead of the one of the application
+        uvicorn_runs: fixture recording the uvicorn runs
+        capsys: fixture capturing the printed profile
+    """
+    monkeypatch.setattr(lottery, "lottery_processor", lottery_processor.LotteryProcessor(draw_enabled=False))
+    main.main(["--profile-startup"])
+    lines = capsys.readouterr().out.splitlines()
+    step_names = [line.rsplit(maxsplit=2)[0] for line in lines if line.endswith(" ms")]  # without the log lines
+    assert step_names == [
+        *(f"import {module_name}" for module_name in main.STARTUP_PROFILE_MODULES),
+        "application startup",
+        "application shutdown",
+        "password hashing (deferred to the first login)",
+        "total",
+    ]
+    assert not lottery.lottery_processor.is_alive()
+    assert not uvicorn_runs
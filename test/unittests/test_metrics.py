@@ -0,0 +1,94 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Unit tests to test classes/functions in metrics.py
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import httpx
+import pytest
+from sqlalchemy import event
+
+from lottery_backend import metrics
+from lottery_backend.async_database import async_engine
+from lottery_backend.lottery import app
+from lottery_backend.metrics import Histogram, clear_metrics
+from test.unittests.conftest import DEFAULT_NAME, remove_user
+
+pytest_plugins = ('pytest_asyncio',)
+
+NEW_USER = "MetricsUser"
+REGISTER_LABELS = (("method", "POST"), ("route", "/user/register"))
+
+
+@pytest.fixture
+def client():
+    """
+    Provides an in-process client of the application with empty metrics
+    """
+    clear_metrics()
+    yield httpx.AsyncClient(app=app, base_url="http://test")
+    clear_metrics()
+
+
+def test_histogram_render():
+    """
+    Tests that the buckets are cumulative and the bounds are inclusive, as Prometheus expects them
+    """
+    histogram = Histogram("test_seconds", "Test histogram", (1, 10))
+    labels = (("route", "/test"),)
+    for value in (0.5, 1, 5, 20):
+        histogram.observe(labels, value)
+    assert histogram.render() == [
+        "# HELP test_seconds Test histogram",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{route="/test",le="1"} 2',
+        'test_seconds_bucket{route="/test",le="10"} 3',
+        'test_seconds_bucket{route="/test",le="+Inf"} 4',
+        'test_seconds_sum{route="/test"} 26.5',
+        'test_seconds_count{route="/test"} 4',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_request_metrics(client):
+    """
+    Tests that each request is recorded with its route template, status and the DB queries it runs
+
+    Args:
+        client: in-process client of the application
+    """
+    remove_user(NEW_USER)  # in case a previous execution is interrupted before deleting the user
+    executed = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    async with client:
+        params = {"username": NEW_USER, "password": "password", "full_name": DEFAULT_NAME}
+        assert (await client.post("/user/register", params=params)).status_code == 200
+        assert (await client.post("/user/register", params=params)).status_code == 409
+        assert (await client.get("/no/such/route")).status_code == 404
+        response = await client.get("/metrics")
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    remove_user(NEW_USER)
+
+    assert metrics.request_duration.get_count(REGISTER_LABELS) == 2
+    assert metrics.requests_total.get((*REGISTER_LABELS, ("status", "200"))) == 1
+    assert metrics.requests_total.get((*REGISTER_LABELS, ("status", "409"))) == 1
+    assert metrics.requests_total.get((("method", "GET"), ("route", "unmatched"), ("status", "404"))) == 1
+    assert metrics.request_queries.get_sum(REGISTER_LABELS) == len(executed)  # every query of the requests
+    assert metrics.request_query_duration.get_sum(REGISTER_LABELS) > 0
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'lottery_http_request_duration_seconds_count{method="POST",route="/user/register"} 2' in response.text
+    assert "# TYPE lottery_http_request_db_queries histogram" in response.text
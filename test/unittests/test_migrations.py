@@ -0,0 +1,157 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Unit tests to test classes/functions in migrations.py
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import datetime
+
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+from sqlmodel import SQLModel
+from sqlmodel import create_engine
+
+from lottery_backend import migrations
+from lottery_backend.database import get_ballots_for_date
+from lottery_backend.exceptions import SchemaMigrationException
+from lottery_backend.migrations import SCHEMA_VERSION, get_schema_version, initialize_database
+from test.unittests.conftest import DEFAULT_BALLOT
+
+
+def test_initialize_new_database(tmp_path):
+    """
+    Tests that a new DB is created with the latest schema version
+
+    Args:
+        tmp_path: temporary directory for the DB file
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    initialize_database(engine)
+    with engine.connect() as connection:
+        assert get_schema_version(connection) == SCHEMA_VERSION
+        index_names = [index["name"] for index in inspect(connection).get_indexes("userballot")]
+        assert "ix_userballot_date_ballot" in index_names
+        assert "ix_userballot_user_id_date_ballot" in index_names
+
+
+def test_migrate_existing_database(tmp_path):
+    """
+    Tests that an existing DB without the unique ballot index is migrated, its duplicated ballots are removed
+    and the ballots are converted to integers
+
+    Args:
+        tmp_path: temporary directory for the DB file
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE userballot (id INTEGER NOT NULL, user_id INTEGER NOT NULL, ballot VARCHAR NOT NULL, "
+            "date DATE NOT NULL, PRIMARY KEY (id))",
+        )
+        for ballot in (DEFAULT_BALLOT, DEFAULT_BALLOT, "9876543211234567", "0000000000000042"):
+            connection.exec_driver_sql(
+                "INSERT INTO userballot (user_id, ballot, date) VALUES (1, ?, '2023-09-01')", (ballot,),
+            )
+        connection.exec_driver_sql(  # a day drawn before the draw results were stored
+            "INSERT INTO userballot (user_id, ballot, date) VALUES (3, ?, '2023-08-31')", (DEFAULT_BALLOT,),
+        )
+
+    initialize_database(engine)
+    with engine.connect() as connection:
+        assert get_schema_version(connection) == SCHEMA_VERSION
+        assert connection.exec_driver_sql("SELECT COUNT(*) FROM userballot").scalar() == 4
+        assert connection.exec_driver_sql("SELECT DISTINCT typeof(ballot) FROM userballot").all() == [("integer",)]
+        index_names = [index["name"] for index in inspect(connection).get_indexes("userballot")]
+        assert sorted(index_names) == ["ix_userballot_date_ballot", "ix_userballot_user_id_date_ballot"]
+        draw_results = connection.exec_driver_sql("SELECT date, ballot, user_id FROM drawresult").all()
+        assert draw_results == [("2023-08-31", DEFAULT_BALLOT, 3)]
+        with pytest.raises(IntegrityError):
+            connection.exec_driver_sql(
+                "INSERT INTO userballot (user_id, ballot, date) VALUES (2, ?, '2023-09-01')", (DEFAULT_BALLOT,),
+            )
+    with Session(engine) as session:  # ballots are still 16-digit strings for the application
+        assert sorted(get_ballots_for_date(datetime.date(2023, 9, 1), session=session)) == [
+            "0000000000000042", DEFAULT_BALLOT, "9876543211234567",
+        ]
+
+
+def test_initialize_up_to_date_database(monkeypatch, tmp_path):
+    """
+    Tests that a DB of the previous schema version gets the DrawLease table,
+    and that a DB at the latest schema version is not inspected again
+
+    Args:
+        monkeypatch: To detect the schema creation
+        tmp_path: temporary directory for the DB file
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'previous.db'}")
+    initialize_database(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE drawlease")
+        connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION - 1}")
+
+    initialize_database(engine)
+    with engine.connect() as connection:
+        assert get_schema_version(connection) == SCHEMA_VERSION
+        assert inspect(connection).has_table("drawlease")
+
+    monkeypatch.setattr(SQLModel.metadata, "create_all", lambda *args, **kwargs: pytest.fail("schema is created"))
+    initialize_database(engine)
+
+
+def test_interrupted_migration(monkeypatch, tmp_path):
+    """
+    Tests that a migration failing after its DDL statements leaves the DB as it was, so the next startup migrates it,
+    and that a DB left with the legacy ballot table by an older interrupted run is refused
+
+    Args:
+        monkeypatch: To interrupt the migration of the ballots to integers
+        tmp_path: temporary directory for the DB file
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'interrupted.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE userballot (id INTEGER NOT NULL, user_id INTEGER NOT NULL, ballot VARCHAR NOT NULL, "
+            "date DATE NOT NULL, PRIMARY KEY (id))",
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO userballot (user_id, ballot, date) VALUES (1, ?, '2023-09-01')", (DEFAULT_BALLOT,),
+        )
+        connection.exec_driver_sql("PRAGMA user_version = 2")
+
+    def interrupted_migration(connection):
+        """Renames the ballot table as the migration does, then crashes"""
+        connection.exec_driver_sql("DROP INDEX IF EXISTS ix_userballot_date_ballot")
+        connection.exec_driver_sql("ALTER TABLE userballot RENAME TO userballot_legacy")
+        raise RuntimeError("interrupted")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [*migrations.MIGRATIONS[:2], interrupted_migration])
+    with pytest.raises(RuntimeError):
+        initialize_database(engine)
+    with engine.connect() as connection:
+        assert get_schema_version(connection) == 2
+        assert not inspect(connection).has_table("userballot_legacy")
+        assert connection.exec_driver_sql("SELECT ballot FROM userballot").all() == [(DEFAULT_BALLOT,)]
+
+    monkeypatch.undo()
+    initialize_database(engine)
+    with engine.connect() as connection:
+        assert get_schema_version(connection) == SCHEMA_VERSION
+        assert connection.exec_driver_sql("SELECT typeof(ballot) FROM userballot").all() == [("integer",)]
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("ALTER TABLE userballot RENAME TO userballot_legacy")
+    with pytest.raises(SchemaMigrationException):
+        initialize_database(engine)
@@ -0,0 +1,89 @@
+"""
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#                            Python script                                     #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+Description  :
+Unit tests to test classes/functions in scheduler.py
+
+# -----------------------------------------------------------------------------#
+#                                                                              #
+#       Copyright (c) 2023 , Ali Yavuz Kahveci.                                #
+#                         All rights reserved                                  #
+#                                                                              #
+# -----------------------------------------------------------------------------#
+"""
+import datetime
+import threading
+
+from lottery_backend import scheduler as scheduler_module
+from lottery_backend.scheduler import DailyScheduler
+from test.unittests.conftest import FakeClock
+
+MIDNIGHT = datetime.time(0, 0)
+
+
+def test_run_pending():
+    """
+    Tests that a daily job runs once it is due and once per day, even if the clock jumps over several days
+    """
+    clock = FakeClock(datetime.datetime(2023, 8, 20, 12, 0))
+    scheduler = DailyScheduler(clock)
+    runs = []
+    scheduler.every_day_at(MIDNIGHT, lambda: runs.append(clock()))
+    assert scheduler.get_next_run() == datetime.datetime(2023, 8, 21)
+
+    clock.advance(datetime.timedelta(hours=11, minutes=59))
+    assert scheduler.run_pending() == 0
+    clock.advance(datetime.timedelta(minutes=1))
+    assert scheduler.run_pending() == 1
+    assert scheduler.run_pending() == 0  # not run twice at the same midnight
+    assert scheduler.get_next_run() == datetime.datetime(2023, 8, 22)
+
+    clock.advance(datetime.timedelta(days=3))
+    assert scheduler.run_pending() == 1
+    assert scheduler.get_next_run() == datetime.datetime(2023, 8, 25)
+    assert len(runs) == 2
+
+
+def test_run_waits_on_event(monkeypatch):
+    """
+    Tests that the scheduler waits until the next job is due instead of polling, and stops immediately
+
+    Args:
+        monkeypatch: To record the waits of the scheduler
+    """
+    clock = FakeClock(datetime.datetime(2023, 8, 20, 23, 0))
+    scheduler = DailyScheduler(clock)
+    ran = threading.Event()
+    scheduler.every_day_at(MIDNIGHT, ran.set)
+    timeouts = []
+    waited = threading.Event()
+    wait = scheduler._wakeup.wait
+
+    def record_wait(timeout):
+        timeouts.append(timeout)
+        waited.set()
+        return wait(timeout)
+
+    monkeypatch.setattr(scheduler._wakeup, "wait", record_wait)
+    thread = threading.Thread(target=scheduler.run, daemon=True)
+    thread.start()
+    assert waited.wait(5)
+    assert timeouts == [scheduler_module.MAX_WAIT_TIME]  # an hour to midnight, capped to re-check the clock
+
+    clock.advance(datetime.timedelta(minutes=59, seconds=30))
+    waited.clear()
+    scheduler.wake()
+    assert waited.wait(5)
+    assert timeouts[-1] == 30  # sleeps exactly until midnight
+    assert not ran.is_set()
+
+    clock.advance(datetime.timedelta(seconds=30))
+    scheduler.wake()
+    assert ran.wait(5)
+    scheduler.stop()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert not scheduler.jobs